@@ -1,6 +1,10 @@
 import time
 import logging
-from benchmark.benchmark_exception import BenchmarkException
+from benchmark.benchmark_exception import BenchmarkException, BenchmarkTimeoutException
+from util.query_timeout import QueryTimeoutException, QueryWatchdog
+from util.fingerprint import ResultFingerprint
+from util.profiling import BenchmarkProfiler
+from util.result_columns import IntegerColumns
 
 
 class Benchmark:
@@ -13,6 +17,12 @@ class Benchmark:
         self.repeat_count = repeat_count
         self.title = title
         self.results = None
+        self.timeout = None
+        self.fingerprint = None
+        self._fingerprint_results = False
+        self._compact_results = False
+        self.profiler = None
+        self._prepared = False
 
     def get_repeat_count(self):
         return self.repeat_count
@@ -21,20 +31,109 @@ class Benchmark:
         """To be implemented by each benchmark child class"""
         pass
 
+    def get_adapters(self):
+        """Database adapters used by execute, overriden by children.
+        Timeouts are set on and queries cancelled through these adapters."""
+        return []
+
+    def set_timeout(self, timeout):
+        """Limits every execution to timeout seconds, None disables the limit"""
+        self.timeout = timeout
+        for adapter in self.get_adapters():
+            adapter.set_statement_timeout(timeout)
+
     def cleanup(self):
         """Optional method that can be overriden by children.
         Will be executed after each execute, but not included in timings."""
         pass
 
+    def prepare(self):
+        """Optional method that can be overriden by children, e.g. to load the data a benchmark needs.
+        Will be executed once before the first run, but not included in timings."""
+        pass
+
+    def close(self):
+        """Releases the database connections of the benchmark"""
+        for adapter in self.get_adapters():
+            adapter.close()
+
+    def rollback(self):
+        """Ends the transactions left open by a failed run, so that a retry of the same
+        benchmark does not fail on a connection in an aborted transaction"""
+        for adapter in self.get_adapters():
+            adapter.rollback()
+
+    def set_result_handler(self, result_handler, stream_results=False):
+        """Streams the rows of every query to result_handler instead of returning them.
+        stream_results fetches them from server side cursors, which bounds the memory of
+        huge results but changes the plans of PostGIS, so it is not used for timed runs."""
+        for adapter in self.get_adapters():
+            adapter.result_handler = result_handler
+            adapter.stream_results = stream_results
+
+    def enable_fingerprint(self):
+        """Computes a ResultFingerprint of each run while the rows are fetched,
+        instead of keeping the results"""
+        self._fingerprint_results = True
+        self.set_result_handler(self._handle_rows)
+
+    def enable_compact_results(self):
+        """Keeps the result of each run as IntegerColumns, filled while the rows are fetched,
+        instead of a list of tuples"""
+        self._compact_results = True
+        self.set_result_handler(self._handle_rows)
+
+    def _handle_rows(self, rows):
+        if self._fingerprint_results:
+            self.fingerprint.update(rows)
+        if self._compact_results:
+            self.results.update(rows)
+
+    def enable_profiling(self, name, mode="cprofile", trace_memory=True):
+        """Profiles every execution (but not the cleanup) with a BenchmarkProfiler;
+        the profile is written to results/profiles/<name>.* once all runs completed"""
+        self.profiler = BenchmarkProfiler(
+            name, mode=mode, trace_memory=trace_memory)
+
+    def ensure_prepared(self):
+        """Runs prepare unless it already ran, e.g. to inspect the queries of execute before run"""
+        if not self._prepared:
+            try:
+                self.prepare()
+            except Exception:
+                Benchmark._logger.exception("Exception: ")
+                raise BenchmarkException(
+                    f"Error preparing benchmark {self.title}")
+            self._prepared = True
+
     def run(self):
         """Run benchmark and record timings"""
+        self.ensure_prepared()
         for i in range(self.repeat_count):
             Benchmark._logger.info(
                 f"{self.title}: Starting run {i+1} of {self.repeat_count}")
+            # Release the result of the previous run before fetching the next one
+            self.results = None
+            if self._fingerprint_results:
+                self.fingerprint = ResultFingerprint()
+            if self._compact_results:
+                self.results = IntegerColumns()
+            watchdog = QueryWatchdog(self.get_adapters(), self.timeout)
             start = time.perf_counter()
             try:
-                self.results = self.execute()
-            except Exception:
+                with watchdog:
+                    if self.profiler is not None:
+                        with self.profiler.measure():
+                            results = self.execute()
+                    else:
+                        results = self.execute()
+                if not self._compact_results:
+                    self.results = results
+            except Exception as e:
+                if isinstance(e, QueryTimeoutException) or watchdog.fired:
+                    # Later runs would time out as well
+                    raise BenchmarkTimeoutException(
+                        f"Benchmark {self.title} exceeded the timeout of {self.timeout} seconds", self.timeout)
                 Benchmark._logger.exception("Exception: ")
                 raise BenchmarkException(
                     f"Error running benchmark {self.title}")
@@ -48,6 +147,10 @@ class Benchmark:
             Benchmark._logger.info(f"{self.title}: Cleaning up run {i+1}")
             self.cleanup()
 
+        if self.profiler is not None:
+            path = self.profiler.save()
+            Benchmark._logger.info(f"{self.title}: Profile written to {path}.*")
+
     def get_time_measurements(self):
         return self.time_measurements
 
@@ -56,3 +159,21 @@ class Benchmark:
 
     def get_results(self):
         return self.results
+
+    def get_result_count(self):
+        if self.fingerprint is not None:
+            return self.fingerprint.count
+        return len(self.results) if self.results is not None else 0
+
+
+class BenchmarkSpec:
+    """Lightweight description of a benchmark: the benchmark class (or factory) and its arguments.
+    The benchmark, and with it its database connections, is only created by create()."""
+
+    def __init__(self, factory, *args, **kwargs):
+        self.factory = factory
+        self.args = args
+        self.kwargs = kwargs
+
+    def create(self):
+        return self.factory(*self.args, **self.kwargs)
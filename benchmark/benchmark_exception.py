@@ -1,3 +1,11 @@
 class BenchmarkException(Exception):
     """Raised when there is an exception running a benchmark"""
     pass
+
+
+class BenchmarkTimeoutException(BenchmarkException):
+    """Raised when a benchmark query exceeds its timeout"""
+
+    def __init__(self, message, timeout):
+        super().__init__(message)
+        self.timeout = timeout
@@ -0,0 +1,221 @@
+"""
+Client side micro benchmarks that do not need the database containers
+"""
+import decimal
+import logging
+import os
+import numpy as np
+from pyproj import Transformer
+from benchmark.benchmark import Benchmark
+from util.coordinate_transform import transform_4326_to_3857, transform_points
+from util.misc import RowTranscoder, decimal_to_int
+from util.shapefile_reader import ShapefileReader
+
+
+def create_random_points(point_count, seed=0):
+    """(lat, lon) points spread over the continental US"""
+    random = np.random.default_rng(seed)
+    return np.column_stack((random.uniform(25, 49, point_count),
+                            random.uniform(-124, -67, point_count)))
+
+
+class TransformBenchmark(Benchmark):
+    _title = "Base class"
+
+    def __init__(self, point_count=100000, repeat_count=5):
+        super().__init__(self._title, repeat_count=repeat_count)
+        self.points = create_random_points(point_count)
+        self.point_list = [tuple(point) for point in self.points.tolist()]
+
+    def get_item_count(self):
+        return len(self.point_list)
+
+
+class TransformNewTransformer(TransformBenchmark):
+    """One point per call with a new transformer for every call, as transform_4326_to_3857 used to do"""
+    _logger = logging.getLogger(__name__)
+    _title = "New Transformer Per Point"
+
+    def execute(self):
+        results = []
+        for point in self.point_list:
+            transformer = Transformer.from_crs("epsg:4326", "epsg:3857")
+            results.append(transformer.transform(point[0], point[1]))
+        return results
+
+
+class TransformCachedTransformer(TransformBenchmark):
+    _logger = logging.getLogger(__name__)
+    _title = "Cached Transformer Per Point"
+
+    def execute(self):
+        return [transform_4326_to_3857(point) for point in self.point_list]
+
+
+class TransformVectorized(TransformBenchmark):
+    _logger = logging.getLogger(__name__)
+    _title = "Vectorized Transform"
+
+    def execute(self):
+        return transform_points(self.points)
+
+
+# Column types of the rows created by create_random_rows, repeated to the column count
+ROW_COLUMN_TYPES = ["int8", "text", "float8", "text"]
+
+
+def create_random_rows(row_count, column_count=60, seed=0):
+    """Rows shaped like the routes attributes: NUMERIC columns read as Decimal, text, floats and NULLs"""
+    random = np.random.default_rng(seed)
+    integers = random.integers(0, 100000, (row_count, column_count)).tolist()
+    floats = random.uniform(0, 1000, (row_count, column_count)).tolist()
+    rows = []
+    for row_integers, row_floats in zip(integers, floats):
+        row = []
+        for idx in range(column_count):
+            column_type = idx % len(ROW_COLUMN_TYPES)
+            if column_type == 0:
+                row.append(decimal.Decimal(row_integers[idx]))
+            elif column_type == 1:
+                row.append(f"name {row_integers[idx]}")
+            elif column_type == 2:
+                row.append(row_floats[idx])
+            else:
+                row.append(None if row_integers[idx] % 2 else "O'Hare")
+        rows.append(tuple(row))
+    return rows
+
+
+def _legacy_convert_decimals_to_ints_in_tuples(data):
+    """The tuple slicing implementation previously in util.misc"""
+    modified_data = []
+    for t in data:
+        new_t = t
+        for idx in range(len(new_t)):
+            if isinstance(t[idx], decimal.Decimal):
+                new_t = new_t[0:idx] + (int(new_t[idx]),) + new_t[idx+1:]
+        modified_data.append(new_t)
+    return modified_data
+
+
+def _legacy_tuple_to_str(tup):
+    """The string concatenation implementation previously in util.misc"""
+    output = "("
+    for val in tup:
+        if val == None:
+            output += "NULL, "
+        elif isinstance(val, str):
+            escaped_val = val.replace("'", "")
+            output += f"'{str(escaped_val)}', "
+        else:
+            output += f"{str(val)}, "
+    output = output[:-2] + ")"
+    return output
+
+
+class RowConversionBenchmark(Benchmark):
+    _title = "Base class"
+
+    def __init__(self, row_count=100000, repeat_count=5):
+        super().__init__(self._title, repeat_count=repeat_count)
+        self.rows = create_random_rows(row_count)
+        self.column_types = [ROW_COLUMN_TYPES[idx % len(ROW_COLUMN_TYPES)]
+                             for idx in range(len(self.rows[0]))]
+        self.transcoder = RowTranscoder([decimal_to_int if column_type == "int8" else None
+                                         for column_type in self.column_types])
+
+    def get_item_count(self):
+        return len(self.rows)
+
+
+class RowConversionLegacy(RowConversionBenchmark):
+    """Decimal conversion by tuple slicing followed by tuple_to_str, as the insert benchmarks used to do"""
+    _logger = logging.getLogger(__name__)
+    _title = "Legacy SQL Values"
+
+    def execute(self):
+        rows = _legacy_convert_decimals_to_ints_in_tuples(self.rows)
+        return ', '.join([_legacy_tuple_to_str(row) for row in rows])
+
+
+class RowConversionSqlValues(RowConversionBenchmark):
+    _logger = logging.getLogger(__name__)
+    _title = "Single Pass SQL Values"
+
+    def execute(self):
+        return ', '.join(self.transcoder.to_sql_values(self.rows))
+
+
+class RowConversionCopyText(RowConversionBenchmark):
+    _logger = logging.getLogger(__name__)
+    _title = "COPY Text"
+
+    def execute(self):
+        return ''.join(self.transcoder.to_copy_text(self.rows))
+
+
+class RowConversionCopyBinary(RowConversionBenchmark):
+    _logger = logging.getLogger(__name__)
+    _title = "COPY Binary"
+
+    def execute(self):
+        return b''.join(self.transcoder.to_copy_binary(self.rows, self.column_types))
+
+
+class ShapefileReadBenchmark(Benchmark):
+    """Reads every geometry and attribute of a shapefile relative to the datasets folder"""
+    _title = "Base class"
+
+    def __init__(self, source, repeat_count=5):
+        super().__init__(f"{self._title} ({os.path.basename(source)})", repeat_count=repeat_count)
+        self.source = source
+        self.path = os.path.join(os.getcwd(), "datasets", source)
+        self.feature_count = None
+
+    def prepare(self):
+        with ShapefileReader(self.path) as reader:
+            self.feature_count = len(reader)
+
+    def get_item_count(self):
+        return self.feature_count
+
+
+class ShapefileReadGdal(ShapefileReadBenchmark):
+    """Feature by feature with the GDAL bindings in the GDAL worker container.
+    The average time is the time measured in the container, without the exec and interpreter overhead."""
+    _logger = logging.getLogger(__name__)
+    _title = "GDAL"
+
+    def __init__(self, source, repeat_count=5):
+        super().__init__(source, repeat_count=repeat_count)
+        # Only this benchmark needs docker, the others run without it
+        import docker
+        from gdal.gdaldockerwrapper import GdalDockerWrapper
+        self.gdal_docker_wrapper = GdalDockerWrapper(docker.from_env())
+        self.read_times = []
+
+    def prepare(self):
+        super().prepare()
+        self.gdal_docker_wrapper.start_container()
+
+    def execute(self):
+        count, seconds = self.gdal_docker_wrapper.measure_read_time(self.source)
+        self.read_times.append(seconds)
+        return count
+
+    def get_average_time(self):
+        return sum(self.read_times) / len(self.read_times)
+
+
+class ShapefileReadMmap(ShapefileReadBenchmark):
+    """Geometry arrays and every decoded attribute column of util.shapefile_reader"""
+    _logger = logging.getLogger(__name__)
+    _title = "Memory-Mapped NumPy Reader"
+
+    def execute(self):
+        with ShapefileReader(self.path) as reader:
+            reader.bounds.sum()
+            reader.coordinates.sum()
+            for name in reader.dbf.get_field_names():
+                reader.get_column(name)
+            return len(reader)
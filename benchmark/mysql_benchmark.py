@@ -8,3 +8,6 @@ class MysqlBenchmark(Benchmark):
     def __init__(self, adapter, title, repeat_count=7):
         super().__init__(title, repeat_count=repeat_count)
         self.adapter = adapter
+
+    def get_adapters(self):
+        return [self.adapter]
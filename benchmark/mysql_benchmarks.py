@@ -3,33 +3,53 @@ Mysql benchmark classes
 """
 from mysqlutils.mysqladapter import MySQLAdapter
 from gdal.gdaldockerwrapper import GdalDockerWrapper
+from util.index_manager import MYSQL_GEOMETRY_COLUMN
 from benchmark.mysql_benchmark import MysqlBenchmark
-from util.coordinate_transform import transform_4326_to_3857
-from util.create_geometry import create_polygon, create_point, create_linestring
-from util.misc import convert_decimals_to_ints_in_tuples, convert_none_to_null_in_tuples, tuple_to_str
+from util.coordinate_transform import transform_4326_to_3857, transform_points
+from util.create_geometry import create_polygon, create_point, create_linestring, create_polygon_wkb, create_point_wkb, create_linestring_wkb
+from util.misc import RowTranscoder
 import docker
+import functools
 import logging
+import numpy as np
 
 DATABASE_NAME = "SpatialDatasets"
 GEORGIA_BOUNDING_BOX = [(30.3575, -85.6082), (34.9996, -85.6082),
                         (34.9996, -80.696), (30.3575, -80.696), (30.3575, -85.6082)]
-GEORGIA_BB_4326 = create_polygon(GEORGIA_BOUNDING_BOX)
-GEORGIA_BB_3857 = create_polygon(
-    [transform_4326_to_3857(point) for point in GEORGIA_BOUNDING_BOX])
 ATLANTA_COORDS = (33.7483, -84.3911)
-ATLANTA_LOC_4326 = create_point(ATLANTA_COORDS)
-ATLANTA_LOC_3857 = create_point(transform_4326_to_3857(ATLANTA_COORDS))
 SAMPLE_ROUTE = [(33.6290830738968, -84.4350692100728),
                 (36.1369671135132, -86.6847761162769)]
-ROUTE_4326 = create_linestring(SAMPLE_ROUTE)
-ROUTE_3857 = create_linestring(
-    [transform_4326_to_3857(point) for point in SAMPLE_ROUTE])
+
+
+@functools.lru_cache(maxsize=None)
+def get_query_geometry(name, srid):
+    """WKT literal and WKB of a query geometry.
+    Computed on first use rather than at import, since the EPSG:3857 geometries need pyproj."""
+    if name == "location":
+        point = transform_4326_to_3857(ATLANTA_COORDS) if srid == 3857 else ATLANTA_COORDS
+        return create_point(point), create_point_wkb(point)
+    points = GEORGIA_BOUNDING_BOX if name == "bounding_box" else SAMPLE_ROUTE
+    if srid == 3857:
+        points = transform_points(points).tolist()
+    if name == "bounding_box":
+        return create_polygon(points), create_polygon_wkb(points)
+    return create_linestring(points), create_linestring_wkb(points)
 
 
 def create_mysql_adapter():
     return MySQLAdapter('root', 'root-password')
 
 
+def create_query_geometry(name, use_projected_crs=True, use_wkb_parameters=False):
+    """Returns the SQL expression of a query geometry and the query parameters it needs.
+    With use_wkb_parameters the geometry is bound as a WKB parameter instead of a WKT literal."""
+    srid = 3857 if use_projected_crs else 4326
+    wkt, wkb = get_query_geometry(name, srid)
+    if use_wkb_parameters:
+        return f"ST_GeomFromWKB(%s, {srid})", (wkb,)
+    return f"ST_GeomFromText({wkt}, {srid})", None
+
+
 class LoadAirspaces(MysqlBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Load Airspaces"
@@ -41,6 +61,10 @@ class LoadAirspaces(MysqlBenchmark):
         self.gdal_docker_wrapper = GdalDockerWrapper(docker_client)
         self.with_index = with_index
 
+    def prepare(self):
+        # Container start up is not part of the load time
+        self.gdal_docker_wrapper.start_container()
+
     def execute(self):
         self.gdal_docker_wrapper.import_to_mysql(
             "airspace/Class_Airspace.shp", LoadAirspaces._table_name, create_spatial_index=self.with_index)
@@ -61,6 +85,10 @@ class LoadAirports(MysqlBenchmark):
         self.gdal_docker_wrapper = GdalDockerWrapper(docker_client)
         self.with_index = with_index
 
+    def prepare(self):
+        # Container start up is not part of the load time
+        self.gdal_docker_wrapper.start_container()
+
     def execute(self):
         self.gdal_docker_wrapper.import_to_mysql(
             "airports/Airports.shp", LoadAirports._table_name, create_spatial_index=self.with_index)
@@ -81,6 +109,10 @@ class LoadRoutes(MysqlBenchmark):
         self.gdal_docker_wrapper = GdalDockerWrapper(docker_client)
         self.with_index = with_index
 
+    def prepare(self):
+        # Container start up is not part of the load time
+        self.gdal_docker_wrapper.start_container()
+
     def execute(self):
         self.gdal_docker_wrapper.import_to_mysql(
             "routes/ATS_Route.shp", LoadRoutes._table_name, create_spatial_index=self.with_index)
@@ -90,6 +122,57 @@ class LoadRoutes(MysqlBenchmark):
             f"DROP TABLE {DATABASE_NAME}.{LoadRoutes._table_name}")
 
 
+class TunedLoad(MysqlBenchmark):
+    """Loads a dataset with the given ogr2ogr options. With index_after_load the table is imported
+    without an index and the index is built afterwards, as part of the measured time."""
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, source, table_name, index_after_load=False, group_transactions=None, repeat_count=3):
+        super().__init__(create_mysql_adapter(),
+                         f"Tuned Load {table_name}", repeat_count=repeat_count)
+        docker_client = docker.from_env()
+        self.gdal_docker_wrapper = GdalDockerWrapper(docker_client)
+        self.source = source
+        self.table_name = table_name
+        self.index_after_load = index_after_load
+        self.group_transactions = group_transactions
+        # Rows in the table after the last load, see cleanup
+        self.loaded_row_count = None
+
+    def prepare(self):
+        # Container start up is not part of the load time
+        self.gdal_docker_wrapper.start_container()
+
+    def execute(self):
+        output = self.gdal_docker_wrapper.import_to_mysql(
+            self.source, self.table_name, create_spatial_index=not self.index_after_load,
+            group_transactions=self.group_transactions)
+        if self.gdal_docker_wrapper.last_exit_code != 0:
+            raise Exception(f"ogr2ogr failed: {output}")
+        if self.index_after_load:
+            self.build_index()
+
+    def build_index(self):
+        """Without an index ogr2ogr may create the geometry column nullable and without an SRID,
+        both of which a spatial index needs, so the column is changed in the same statement"""
+        column_type = self.adapter.execute(
+            "SELECT COLUMN_TYPE FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_NAME = %s",
+            (DATABASE_NAME, self.table_name, MYSQL_GEOMETRY_COLUMN))[0][0]
+        srid = self.adapter.execute(
+            f"SELECT ST_SRID({MYSQL_GEOMETRY_COLUMN}) FROM {DATABASE_NAME}.{self.table_name} LIMIT 1")[0][0]
+        self.adapter.execute(
+            f"ALTER TABLE {DATABASE_NAME}.{self.table_name} "
+            f"MODIFY {MYSQL_GEOMETRY_COLUMN} {column_type} NOT NULL SRID {srid}, "
+            f"ADD SPATIAL INDEX {MYSQL_GEOMETRY_COLUMN} ({MYSQL_GEOMETRY_COLUMN})")
+
+    def cleanup(self):
+        self.loaded_row_count = self.adapter.execute(
+            f"SELECT COUNT(*) FROM {DATABASE_NAME}.{self.table_name}")[0][0]
+        self.adapter.execute(
+            f"DROP TABLE {DATABASE_NAME}.{self.table_name}")
+
+
 class PointEqualsPoint(MysqlBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Point Equals Point"
@@ -322,7 +405,7 @@ class RetrievePoints(MysqlBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Retrieve Points"
 
-    def __init__(self, use_projected_crs=True, subsampling_factor=1):
+    def __init__(self, use_projected_crs=True, subsampling_factor=1, use_wkb_parameters=False):
         super().__init__(create_mysql_adapter(),
                          RetrievePoints._title, repeat_count=7)
         self.dataset_suffix = ""
@@ -331,17 +414,16 @@ class RetrievePoints(MysqlBenchmark):
         self.subsampling_condition = ""
         if subsampling_factor > 1:
             self.subsampling_condition = f"MOD(A.OBJECTID, {subsampling_factor}) = 0 AND"
-        self.bounding_box = f"{GEORGIA_BB_3857}, 3857"
-        if not use_projected_crs:
-            self.bounding_box = f"{GEORGIA_BB_4326}, 4326"
+        self.bounding_box, self.bounding_box_params = create_query_geometry(
+            "bounding_box", use_projected_crs, use_wkb_parameters)
 
     def execute(self):
         cmd = f"""SELECT A.OBJECTID
                 FROM {DATABASE_NAME}.airports{self.dataset_suffix} A
-                WHERE {self.subsampling_condition} st_within(A.SHAPE, ST_GeomFromText({self.bounding_box}))
+                WHERE {self.subsampling_condition} st_within(A.SHAPE, {self.bounding_box})
                 ;"""
         RetrievePoints._logger.info(f"Query: {cmd}")
-        return self.adapter.execute(cmd)
+        return self.adapter.execute(cmd, self.bounding_box_params)
 
 
 class LongestLine(MysqlBenchmark):
@@ -394,7 +476,7 @@ class RetrieveLines(MysqlBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Retrieve Lines"
 
-    def __init__(self, use_projected_crs=True, subsampling_factor=1):
+    def __init__(self, use_projected_crs=True, subsampling_factor=1, use_wkb_parameters=False):
         super().__init__(create_mysql_adapter(),
                          RetrieveLines._title, repeat_count=7)
         self.dataset_suffix = ""
@@ -403,17 +485,16 @@ class RetrieveLines(MysqlBenchmark):
         self.subsampling_condition = ""
         if subsampling_factor > 1:
             self.subsampling_condition = f"MOD(R.OBJECTID, {subsampling_factor}) = 0 AND"
-        self.bounding_box = f"{GEORGIA_BB_3857}, 3857"
-        if not use_projected_crs:
-            self.bounding_box = f"{GEORGIA_BB_4326}, 4326"
+        self.bounding_box, self.bounding_box_params = create_query_geometry(
+            "bounding_box", use_projected_crs, use_wkb_parameters)
 
     def execute(self):
         cmd = f"""SELECT R.OBJECTID
                 FROM {DATABASE_NAME}.routes{self.dataset_suffix} R
-                WHERE {self.subsampling_condition} st_within(R.SHAPE, ST_GeomFromText({self.bounding_box}))
+                WHERE {self.subsampling_condition} st_within(R.SHAPE, {self.bounding_box})
                 ;"""
         RetrieveLines._logger.info(f"Query: {cmd}")
-        return self.adapter.execute(cmd)
+        return self.adapter.execute(cmd, self.bounding_box_params)
 
 
 class LargestArea(MysqlBenchmark):
@@ -466,7 +547,7 @@ class RetrievePolygons(MysqlBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Retrieve Polygons"
 
-    def __init__(self, use_projected_crs=True, subsampling_factor=1):
+    def __init__(self, use_projected_crs=True, subsampling_factor=1, use_wkb_parameters=False):
         super().__init__(create_mysql_adapter(),
                          RetrievePolygons._title, repeat_count=7)
         self.dataset_suffix = ""
@@ -475,24 +556,23 @@ class RetrievePolygons(MysqlBenchmark):
         self.subsampling_condition = ""
         if subsampling_factor > 1:
             self.subsampling_condition = f"MOD(AS1.OBJECTID, {subsampling_factor}) = 0 AND "
-        self.bounding_box = f"{GEORGIA_BB_3857}, 3857"
-        if not use_projected_crs:
-            self.bounding_box = f"{GEORGIA_BB_4326}, 4326"
+        self.bounding_box, self.bounding_box_params = create_query_geometry(
+            "bounding_box", use_projected_crs, use_wkb_parameters)
 
     def execute(self):
         cmd = f"""SELECT AS1.OBJECTID
                 FROM {DATABASE_NAME}.airspaces{self.dataset_suffix} AS1
-                WHERE {self.subsampling_condition} st_within(AS1.SHAPE, ST_GeomFromText({self.bounding_box}))
+                WHERE {self.subsampling_condition} st_within(AS1.SHAPE, {self.bounding_box})
                 ;"""
         RetrievePolygons._logger.info(f"Query: {cmd}")
-        return self.adapter.execute(cmd)
+        return self.adapter.execute(cmd, self.bounding_box_params)
 
 
 class PointNearPoint(MysqlBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Point Near Point"
 
-    def __init__(self, use_projected_crs=True, subsampling_factor=1):
+    def __init__(self, use_projected_crs=True, subsampling_factor=1, use_wkb_parameters=False):
         super().__init__(create_mysql_adapter(),
                          PointNearPoint._title, repeat_count=7)
         self.dataset_suffix = ""
@@ -501,24 +581,23 @@ class PointNearPoint(MysqlBenchmark):
         self.subsampling_condition = ""
         if subsampling_factor > 1:
             self.subsampling_condition = f"MOD(A.OBJECTID, {subsampling_factor}) = 0 AND "
-        self.location = f"{ATLANTA_LOC_3857}, 3857"
-        if not use_projected_crs:
-            self.location = f"{ATLANTA_LOC_4326}, 4326"
+        self.location, self.location_params = create_query_geometry(
+            "location", use_projected_crs, use_wkb_parameters)
 
     def execute(self):
         cmd = f"""SELECT A.OBJECTID
                 FROM {DATABASE_NAME}.airports{self.dataset_suffix} A
-                WHERE {self.subsampling_condition} st_distance(A.SHAPE, ST_GeomFromText({self.location}), 'metre') < 50000
+                WHERE {self.subsampling_condition} st_distance(A.SHAPE, {self.location}, 'metre') < 50000
                 ;"""
         PointNearPoint._logger.info(f"Query: {cmd}")
-        return self.adapter.execute(cmd)
+        return self.adapter.execute(cmd, self.location_params)
 
 
 class PointNearPoint2(MysqlBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Point Near Point 2"
 
-    def __init__(self, use_projected_crs=True, subsampling_factor=1):
+    def __init__(self, use_projected_crs=True, subsampling_factor=1, use_wkb_parameters=False):
         super().__init__(create_mysql_adapter(),
                          PointNearPoint2._title, repeat_count=7)
         self.dataset_suffix = ""
@@ -527,26 +606,25 @@ class PointNearPoint2(MysqlBenchmark):
         self.subsampling_condition = ""
         if subsampling_factor > 1:
             self.subsampling_condition = f"WHERE MOD(A.OBJECTID, {subsampling_factor}) = 0"
-        self.location = f"{ATLANTA_LOC_3857}, 3857"
-        if not use_projected_crs:
-            self.location = f"{ATLANTA_LOC_4326}, 4326"
+        self.location, self.location_params = create_query_geometry(
+            "location", use_projected_crs, use_wkb_parameters)
 
     def execute(self):
-        cmd = f"""SELECT A.OBJECTID, st_distance(A.SHAPE, ST_GeomFromText({self.location}), 'metre') AS dist
+        cmd = f"""SELECT A.OBJECTID, st_distance(A.SHAPE, {self.location}, 'metre') AS dist
                 FROM {DATABASE_NAME}.airports{self.dataset_suffix} A
                 {self.subsampling_condition}
                 ORDER BY dist
                 LIMIT 1
                 ;"""
         PointNearPoint2._logger.info(f"Query: {cmd}")
-        return self.adapter.execute(cmd)
+        return self.adapter.execute(cmd, self.location_params)
 
 
 class PointNearLine(MysqlBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Point Near Line"
 
-    def __init__(self, use_projected_crs=True, subsampling_factor=1):
+    def __init__(self, use_projected_crs=True, subsampling_factor=1, use_wkb_parameters=False):
         super().__init__(create_mysql_adapter(),
                          PointNearLine._title, repeat_count=7)
         self.dataset_suffix = ""
@@ -555,24 +633,23 @@ class PointNearLine(MysqlBenchmark):
         self.subsampling_condition = ""
         if subsampling_factor > 1:
             self.subsampling_condition = f"MOD(R.OBJECTID, {subsampling_factor}) = 0 AND "
-        self.location = f"{ATLANTA_LOC_3857}, 3857"
-        if not use_projected_crs:
-            self.location = f"{ATLANTA_LOC_4326}, 4326"
+        self.location, self.location_params = create_query_geometry(
+            "location", use_projected_crs, use_wkb_parameters)
 
     def execute(self):
         cmd = f"""SELECT R.OBJECTID
                 FROM {DATABASE_NAME}.routes{self.dataset_suffix} R
-                WHERE {self.subsampling_condition} st_distance(R.SHAPE, ST_GeomFromText({self.location}), 'metre') < 500000
+                WHERE {self.subsampling_condition} st_distance(R.SHAPE, {self.location}, 'metre') < 500000
                 ;"""
         PointNearLine._logger.info(f"Query: {cmd}")
-        return self.adapter.execute(cmd)
+        return self.adapter.execute(cmd, self.location_params)
 
 
 class PointNearLine2(MysqlBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Point Near Line 2"
 
-    def __init__(self, use_projected_crs=True, subsampling_factor=1):
+    def __init__(self, use_projected_crs=True, subsampling_factor=1, use_wkb_parameters=False):
         super().__init__(create_mysql_adapter(),
                          PointNearLine2._title, repeat_count=7)
         self.dataset_suffix = ""
@@ -581,26 +658,25 @@ class PointNearLine2(MysqlBenchmark):
         self.subsampling_condition = ""
         if subsampling_factor > 1:
             self.subsampling_condition = f"WHERE MOD(R.OBJECTID, {subsampling_factor}) = 0"
-        self.location = f"{ATLANTA_LOC_3857}, 3857"
-        if not use_projected_crs:
-            self.location = f"{ATLANTA_LOC_4326}, 4326"
+        self.location, self.location_params = create_query_geometry(
+            "location", use_projected_crs, use_wkb_parameters)
 
     def execute(self):
-        cmd = f"""SELECT R.OBJECTID, st_distance(R.SHAPE, ST_GeomFromText({self.location}), 'metre') AS dist
+        cmd = f"""SELECT R.OBJECTID, st_distance(R.SHAPE, {self.location}, 'metre') AS dist
                 FROM {DATABASE_NAME}.routes{self.dataset_suffix} R
                 {self.subsampling_condition}
                 ORDER BY dist
                 LIMIT 1
                 ;"""
         PointNearLine2._logger.info(f"Query: {cmd}")
-        return self.adapter.execute(cmd)
+        return self.adapter.execute(cmd, self.location_params)
 
 
 class PointNearPolygon(MysqlBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Point Near Polygon"
 
-    def __init__(self, use_projected_crs=True, subsampling_factor=1):
+    def __init__(self, use_projected_crs=True, subsampling_factor=1, use_wkb_parameters=False):
         super().__init__(create_mysql_adapter(),
                          PointNearPolygon._title, repeat_count=7)
         self.dataset_suffix = ""
@@ -609,24 +685,23 @@ class PointNearPolygon(MysqlBenchmark):
         self.subsampling_condition = ""
         if subsampling_factor > 1:
             self.subsampling_condition = f"MOD(AS1.OBJECTID, {subsampling_factor}) = 0 AND "
-        self.location = f"{ATLANTA_LOC_3857}, 3857"
-        if not use_projected_crs:
-            self.location = f"{ATLANTA_LOC_4326}, 4326"
+        self.location, self.location_params = create_query_geometry(
+            "location", use_projected_crs, use_wkb_parameters)
 
     def execute(self):
         cmd = f"""SELECT AS1.OBJECTID
                 FROM {DATABASE_NAME}.airspaces{self.dataset_suffix} AS1
-                WHERE {self.subsampling_condition} st_distance(AS1.SHAPE, ST_GeomFromText({self.location}), 'metre') < 500000
+                WHERE {self.subsampling_condition} st_distance(AS1.SHAPE, {self.location}, 'metre') < 500000
                 ;"""
         PointNearPolygon._logger.info(f"Query: {cmd}")
-        return self.adapter.execute(cmd)
+        return self.adapter.execute(cmd, self.location_params)
 
 
 class SinglePointWithinPolygon(MysqlBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Single Point Within Polygon"
 
-    def __init__(self, use_projected_crs=True, subsampling_factor=1):
+    def __init__(self, use_projected_crs=True, subsampling_factor=1, use_wkb_parameters=False):
         super().__init__(create_mysql_adapter(),
                          SinglePointWithinPolygon._title, repeat_count=7)
         self.dataset_suffix = ""
@@ -635,24 +710,23 @@ class SinglePointWithinPolygon(MysqlBenchmark):
         self.subsampling_condition = ""
         if subsampling_factor > 1:
             self.subsampling_condition = f"MOD(AS1.OBJECTID, {subsampling_factor}) = 0 AND "
-        self.location = f"{ATLANTA_LOC_3857}, 3857"
-        if not use_projected_crs:
-            self.location = f"{ATLANTA_LOC_4326}, 4326"
+        self.location, self.location_params = create_query_geometry(
+            "location", use_projected_crs, use_wkb_parameters)
 
     def execute(self):
         cmd = f"""SELECT AS1.OBJECTID
                 FROM {DATABASE_NAME}.airspaces{self.dataset_suffix} AS1
-                WHERE {self.subsampling_condition} st_contains(AS1.SHAPE, ST_GeomFromText({self.location}))
+                WHERE {self.subsampling_condition} st_contains(AS1.SHAPE, {self.location})
                 ;"""
         SinglePointWithinPolygon._logger.info(f"Query: {cmd}")
-        return self.adapter.execute(cmd)
+        return self.adapter.execute(cmd, self.location_params)
 
 
 class LineNearPolygon(MysqlBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Line Near Polygon"
 
-    def __init__(self, use_projected_crs=True, subsampling_factor=1):
+    def __init__(self, use_projected_crs=True, subsampling_factor=1, use_wkb_parameters=False):
         super().__init__(create_mysql_adapter(),
                          LineNearPolygon._title, repeat_count=7)
         self.dataset_suffix = ""
@@ -661,24 +735,23 @@ class LineNearPolygon(MysqlBenchmark):
         self.subsampling_condition = ""
         if subsampling_factor > 1:
             self.subsampling_condition = f"MOD(AS1.OBJECTID, {subsampling_factor}) = 0 AND "
-        self.line = f"{ROUTE_3857}, 3857"
-        if not use_projected_crs:
-            self.line = f"{ROUTE_4326}, 4326"
+        self.line, self.line_params = create_query_geometry(
+            "line", use_projected_crs, use_wkb_parameters)
 
     def execute(self):
         cmd = f"""SELECT AS1.OBJECTID
                 FROM {DATABASE_NAME}.airspaces{self.dataset_suffix} AS1
-                WHERE {self.subsampling_condition} st_distance(AS1.SHAPE, ST_GeomFromText({self.line}), 'metre') < 500000
+                WHERE {self.subsampling_condition} st_distance(AS1.SHAPE, {self.line}, 'metre') < 500000
                 ;"""
         LineNearPolygon._logger.info(f"Query: {cmd}")
-        return self.adapter.execute(cmd)
+        return self.adapter.execute(cmd, self.line_params)
 
 
 class SingleLineIntersectsPolygon(MysqlBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Line Intersects Polygon"
 
-    def __init__(self, use_projected_crs=True, subsampling_factor=1):
+    def __init__(self, use_projected_crs=True, subsampling_factor=1, use_wkb_parameters=False):
         super().__init__(create_mysql_adapter(),
                          SingleLineIntersectsPolygon._title, repeat_count=7)
         self.dataset_suffix = ""
@@ -687,17 +760,113 @@ class SingleLineIntersectsPolygon(MysqlBenchmark):
         self.subsampling_condition = ""
         if subsampling_factor > 1:
             self.subsampling_condition = f"MOD(AS1.OBJECTID, {subsampling_factor}) = 0 AND "
-        self.line = f"{ROUTE_3857}, 3857"
-        if not use_projected_crs:
-            self.line = f"{ROUTE_4326}, 4326"
+        self.line, self.line_params = create_query_geometry(
+            "line", use_projected_crs, use_wkb_parameters)
 
     def execute(self):
         cmd = f"""SELECT AS1.OBJECTID
                 FROM {DATABASE_NAME}.airspaces{self.dataset_suffix} AS1
-                WHERE {self.subsampling_condition} st_intersects(AS1.SHAPE, ST_GeomFromText({self.line}))
+                WHERE {self.subsampling_condition} st_intersects(AS1.SHAPE, {self.line})
                 ;"""
         SingleLineIntersectsPolygon._logger.info(f"Query: {cmd}")
-        return self.adapter.execute(cmd)
+        return self.adapter.execute(cmd, self.line_params)
+
+
+def create_lookup_geometries(shape, count, use_projected_crs=True, seed=0):
+    """WKT (without quotes) of count query geometries spread over the Georgia bounding box,
+    either points or boxes of a tenth of its width and height"""
+    random = np.random.default_rng(seed)
+    corners = np.array(GEORGIA_BOUNDING_BOX)
+    low, high = corners.min(axis=0), corners.max(axis=0)
+    size = (high - low) / 10
+    if shape == "point":
+        points = random.uniform(low, high, (count, 2))
+        if use_projected_crs:
+            points = transform_points(points)
+        return [create_point(point)[1:-1] for point in points.tolist()]
+    boxes = []
+    for x, y in random.uniform(low, high - size, (count, 2)).tolist():
+        ring = [(x, y), (x + size[0], y), (x + size[0], y + size[1]), (x, y + size[1]), (x, y)]
+        if use_projected_crs:
+            ring = transform_points(ring).tolist()
+        boxes.append(create_polygon(ring)[1:-1])
+    return boxes
+
+
+class MysqlLookupBenchmark(MysqlBenchmark):
+    """Runs the same query shape once for each of call_count query geometries, as new literal SQL
+    for every call or as a prepared statement over the binary protocol"""
+    _logger = logging.getLogger(__name__)
+    _title = None
+    _lookup_shape = None
+
+    def __init__(self, use_projected_crs=True, use_prepared_statements=False, call_count=1000):
+        super().__init__(create_mysql_adapter(), self._title, repeat_count=7)
+        self.dataset_suffix = ""
+        if use_projected_crs:
+            self.dataset_suffix = "_3857"
+        self.srid = 3857 if use_projected_crs else 4326
+        self.use_prepared_statements = use_prepared_statements
+        self.lookup_geometries = create_lookup_geometries(
+            self._lookup_shape, call_count, use_projected_crs)
+
+    def get_query(self, geometry):
+        raise NotImplementedError
+
+    def get_item_count(self):
+        return len(self.lookup_geometries)
+
+    def execute(self):
+        results = []
+        if self.use_prepared_statements:
+            # A prepared statement must not end with a semicolon
+            query = self.get_query(
+                f"ST_GeomFromText(%s, {self.srid})").rstrip().rstrip(";")
+            for wkt in self.lookup_geometries:
+                results += self.adapter.execute_prepared(query, (wkt,))
+        else:
+            for wkt in self.lookup_geometries:
+                results += self.adapter.execute(
+                    self.get_query(f"ST_GeomFromText('{wkt}', {self.srid})"))
+        return results
+
+
+class PointLookup(MysqlLookupBenchmark):
+    """SinglePointWithinPolygon with a different point for every call"""
+    _logger = logging.getLogger(__name__)
+    _title = "Point Lookup"
+    _lookup_shape = "point"
+
+    def get_query(self, geometry):
+        return f"""SELECT AS1.OBJECTID
+                FROM {DATABASE_NAME}.airspaces{self.dataset_suffix} AS1
+                WHERE st_contains(AS1.SHAPE, {geometry})
+                ;"""
+
+
+class RangeLookup(MysqlLookupBenchmark):
+    """RetrievePoints with a different box for every call"""
+    _logger = logging.getLogger(__name__)
+    _title = "Range Lookup"
+    _lookup_shape = "box"
+
+    def get_query(self, geometry):
+        return f"""SELECT A.OBJECTID
+                FROM {DATABASE_NAME}.airports{self.dataset_suffix} A
+                WHERE st_within(A.SHAPE, {geometry})
+                ;"""
+
+
+def create_insert_values(adapter, query, srid):
+    """VALUES of an INSERT of the rows of query with new OBJECTIDs from 50000.
+    The first column of query is the WKT of the geometry; the other columns are converted in a single pass
+    chosen from the cursor description."""
+    rows, description = adapter.execute_with_description(query)
+    transcoder = RowTranscoder.from_description(description[1:])
+    values = transcoder.to_sql_values(row[1:] for row in rows)
+    # Each VALUES string starts with the opening parenthesis, which comes before the OBJECTID
+    return ', '.join(f"({50000 + idx}, ST_GeomFromText('{row[0]}', {srid}), {row_values[1:]}"
+                     for idx, (row, row_values) in enumerate(zip(rows, values)))
 
 
 class InsertNewPoints(MysqlBenchmark):
@@ -712,16 +881,13 @@ class InsertNewPoints(MysqlBenchmark):
         if use_projected_crs:
             self.dataset_suffix = "_3857"
             srid = 3857
+        self.srid = srid
 
-        data_to_insert = self.adapter.execute(f"""SELECT ST_AsText(SHAPE), global_id, ident, name, latitude, longitude, elevation, icao_id, type_code, servcity, state, country, operstatus, privateuse, iapexists, dodhiflip, far91, far93, mil_code, airanal, us_high, us_low, ak_high, ak_low, us_area, pacific
+    def prepare(self):
+        self.new_tuples = create_insert_values(self.adapter, f"""SELECT ST_AsText(SHAPE), global_id, ident, name, latitude, longitude, elevation, icao_id, type_code, servcity, state, country, operstatus, privateuse, iapexists, dodhiflip, far91, far93, mil_code, airanal, us_high, us_low, ak_high, ak_low, us_area, pacific
                                                 FROM {DATABASE_NAME}.airports{self.dataset_suffix} A
                                                 WHERE A.OBJECTID <= 1000
-                                                ;""")
-        data_to_insert = convert_decimals_to_ints_in_tuples(data_to_insert)
-        # Remove OBJECTID from returned tuples
-        data_to_insert = [f"({50000+idx}, ST_GeomFromText('{t[0]}', {srid}), {tuple_to_str(t[1:])[1:]}"
-                          for idx, t in enumerate(data_to_insert)]
-        self.new_tuples = ', '.join([t for t in data_to_insert])
+                                                ;""", self.srid)
 
     def execute(self):
         cmd = f"""INSERT INTO {DATABASE_NAME}.airports{self.dataset_suffix} (objectid, SHAPE, global_id, ident, name, latitude, longitude, elevation, icao_id, type_code, servcity, state, country, operstatus, privateuse, iapexists, dodhiflip, far91, far93, mil_code, airanal, us_high, us_low, ak_high, ak_low, us_area, pacific)
@@ -754,16 +920,13 @@ class InsertNewLines(MysqlBenchmark):
         if use_projected_crs:
             self.dataset_suffix = "_3857"
             srid = 3857
+        self.srid = srid
 
-        data_to_insert = self.adapter.execute(f"""SELECT ST_AsText(SHAPE), global_id, ident, level_, wkhr_code, wkhr_rmk, maa_val, maa_uom, mea_e_val, mea_e_uom, mea_w_val, mea_w_uom, gmea_e_val, gmea_e_uom, gmea_w_val, gmea_w_uom, dmea_val, dmea_uom, moca_val, moca_uom, meagap, truetrk, magtrk, revtruetrk, revmagtrk, length_val, copdist, copnav_id, repatcstar, repatcend, direction, freq_class, status, startpt_id, endpt_id, rtport_id, enrinfo_id, widthright, widthleft, width_uom, mca1_val, mca1_uom, mca1_dir, mca2_val, mca2_uom, mca2_dir, mcapt_id, mcapt_type, tflag_code, remarks, ak_low, ak_high, us_low, us_high, type_code, us_area, pacific, nmagtrk, nrevmagtrk, shape__len
+    def prepare(self):
+        self.new_tuples = create_insert_values(self.adapter, f"""SELECT ST_AsText(SHAPE), global_id, ident, level_, wkhr_code, wkhr_rmk, maa_val, maa_uom, mea_e_val, mea_e_uom, mea_w_val, mea_w_uom, gmea_e_val, gmea_e_uom, gmea_w_val, gmea_w_uom, dmea_val, dmea_uom, moca_val, moca_uom, meagap, truetrk, magtrk, revtruetrk, revmagtrk, length_val, copdist, copnav_id, repatcstar, repatcend, direction, freq_class, status, startpt_id, endpt_id, rtport_id, enrinfo_id, widthright, widthleft, width_uom, mca1_val, mca1_uom, mca1_dir, mca2_val, mca2_uom, mca2_dir, mcapt_id, mcapt_type, tflag_code, remarks, ak_low, ak_high, us_low, us_high, type_code, us_area, pacific, nmagtrk, nrevmagtrk, shape__len
                                                 FROM {DATABASE_NAME}.routes{self.dataset_suffix} R
                                                 WHERE R.OBJECTID <= 1000
-                                                ;""")
-        data_to_insert = convert_decimals_to_ints_in_tuples(data_to_insert)
-        # Remove OBJECTID from returned tuples
-        data_to_insert = [f"({50000+idx}, ST_GeomFromText('{t[0]}', {srid}), {tuple_to_str(t[1:])[1:]}"
-                          for idx, t in enumerate(data_to_insert)]
-        self.new_tuples = ', '.join([t for t in data_to_insert])
+                                                ;""", self.srid)
 
     def execute(self):
         cmd = f"""INSERT INTO {DATABASE_NAME}.routes{self.dataset_suffix} (objectid, SHAPE, global_id, ident, level_, wkhr_code, wkhr_rmk, maa_val, maa_uom, mea_e_val, mea_e_uom, mea_w_val, mea_w_uom, gmea_e_val, gmea_e_uom, gmea_w_val, gmea_w_uom, dmea_val, dmea_uom, moca_val, moca_uom, meagap, truetrk, magtrk, revtruetrk, revmagtrk, length_val, copdist, copnav_id, repatcstar, repatcend, direction, freq_class, status, startpt_id, endpt_id, rtport_id, enrinfo_id, widthright, widthleft, width_uom, mca1_val, mca1_uom, mca1_dir, mca2_val, mca2_uom, mca2_dir, mcapt_id, mcapt_type, tflag_code, remarks, ak_low, ak_high, us_low, us_high, type_code, us_area, pacific, nmagtrk, nrevmagtrk, shape__len)
@@ -796,16 +959,13 @@ class InsertNewPolygons(MysqlBenchmark):
         if use_projected_crs:
             self.dataset_suffix = "_3857"
             srid = 3857
+        self.srid = srid
 
-        data_to_insert = self.adapter.execute(f"""SELECT ST_AsText(SHAPE), global_id, ident, icao_id, name, upper_desc, upper_val, upper_uom, upper_code, lower_desc, lower_val, lower_uom, lower_code, type_code, local_type, class, mil_code, comm_name, level_, sector, onshore, exclusion, wkhr_code, wkhr_rmk, dst, gmtoffset, cont_agent, city, state, country, adhp_id, us_high, ak_high, ak_low, us_low, us_area, pacific, shape__are, shape__len
+    def prepare(self):
+        self.new_tuples = create_insert_values(self.adapter, f"""SELECT ST_AsText(SHAPE), global_id, ident, icao_id, name, upper_desc, upper_val, upper_uom, upper_code, lower_desc, lower_val, lower_uom, lower_code, type_code, local_type, class, mil_code, comm_name, level_, sector, onshore, exclusion, wkhr_code, wkhr_rmk, dst, gmtoffset, cont_agent, city, state, country, adhp_id, us_high, ak_high, ak_low, us_low, us_area, pacific, shape__are, shape__len
                                                 FROM {DATABASE_NAME}.airspaces{self.dataset_suffix} AS1
                                                 WHERE AS1.OBJECTID <= 1000
-                                                ;""")
-        data_to_insert = convert_decimals_to_ints_in_tuples(data_to_insert)
-        # Remove OBJECTID from returned tuples
-        data_to_insert = [f"({50000+idx}, ST_GeomFromText('{t[0]}', {srid}), {tuple_to_str(t[1:])[1:]}"
-                          for idx, t in enumerate(data_to_insert)]
-        self.new_tuples = ', '.join([t for t in data_to_insert])
+                                                ;""", self.srid)
 
     def execute(self):
         cmd = f"""INSERT INTO {DATABASE_NAME}.airspaces{self.dataset_suffix} (objectid, SHAPE, global_id, ident, icao_id, name, upper_desc, upper_val, upper_uom, upper_code, lower_desc, lower_val, lower_uom, lower_code, type_code, local_type, class, mil_code, comm_name, level_, sector, onshore, exclusion, wkhr_code, wkhr_rmk, dst, gmtoffset, cont_agent, city, state, country, adhp_id, us_high, ak_high, ak_low, us_low, us_area, pacific, shape__are, shape__len)
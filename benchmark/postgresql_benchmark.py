@@ -20,6 +20,9 @@ class PostgreSQLBenchmark(Benchmark):
         self.adapter_p = PostgisAdapter(
             "postgres", "root-password", dbname=self._database, persist=True)
 
+    def get_adapters(self):
+        return [self.adapter_np, self.adapter_p]
+
     def connection(self):
         return PostgreSQLBenchmark._database
 
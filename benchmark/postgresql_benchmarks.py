@@ -1,12 +1,15 @@
 import psycopg2
 import docker
+import functools
 from benchmark.postgresql_benchmark import PostgreSQLBenchmark
 from postgis_docker_wrapper.postgisadapter import PostgisAdapter
 from gdal.gdaldockerwrapper import GdalDockerWrapper
+from util.index_manager import PostgisIndexManager
 import logging
-from util.coordinate_transform import transform_4326_to_3857
-from util.create_geometry import create_polygon, create_point, create_linestring
-from util.misc import convert_decimals_to_ints_in_tuples, convert_none_to_null_in_tuples, tuple_to_str
+import numpy as np
+from util.coordinate_transform import transform_4326_to_3857, transform_points
+from util.create_geometry import create_polygon, create_point, create_linestring, create_polygon_wkb, create_point_wkb, create_linestring_wkb
+from util.misc import RowTranscoder
 
 """
 PostgreSQL Benchmark tests
@@ -15,17 +18,41 @@ PostgreSQL Benchmark tests
 DATABASE_NAME = "spatialdatasets"
 GEORGIA_BOUNDING_BOX = [(-85.6082, 30.3575), (-85.6082, 34.9996),
                         (-80.696, 34.9996), (-80.696, 30.3575), (-85.6082, 30.3575)]
-GEORGIA_BB_4326 = create_polygon(GEORGIA_BOUNDING_BOX)
-GEORGIA_BB_3857 = create_polygon(
-    [transform_4326_to_3857(point) for point in GEORGIA_BOUNDING_BOX])
 ATLANTA_COORDS = (-84.3911, 33.7483)
-ATLANTA_LOC_4326 = create_point(ATLANTA_COORDS)
-ATLANTA_LOC_3857 = create_point(transform_4326_to_3857(ATLANTA_COORDS))
 SAMPLE_ROUTE = [(-84.4350692100728, 33.6290830738968, ),
                 (-86.6847761162769, 36.1369671135132)]
-ROUTE_4326 = create_linestring(SAMPLE_ROUTE)
-ROUTE_3857 = create_linestring(
-    [transform_4326_to_3857(point) for point in SAMPLE_ROUTE])
+
+
+@functools.lru_cache(maxsize=None)
+def get_query_geometry(name, srid):
+    """WKT literal and (E)WKB of a query geometry; geographies are always in EPSG:4326.
+    Computed on first use rather than at import, since the EPSG:3857 geometries need pyproj."""
+    # Only the projected geometries are bound as EWKB
+    ewkb_srid = srid if srid == 3857 else None
+    if name == "location":
+        point = transform_4326_to_3857(ATLANTA_COORDS) if srid == 3857 else ATLANTA_COORDS
+        return create_point(point), create_point_wkb(point, srid=ewkb_srid)
+    points = GEORGIA_BOUNDING_BOX if name == "bounding_box" else SAMPLE_ROUTE
+    if srid == 3857:
+        points = transform_points(points).tolist()
+    if name == "bounding_box":
+        return create_polygon(points), create_polygon_wkb(points, srid=ewkb_srid)
+    return create_linestring(points), create_linestring_wkb(points, srid=ewkb_srid)
+
+
+def create_query_geometry(name, use_projected_crs=True, use_wkb_parameters=False):
+    """Returns the SQL expression of a query geometry and the query parameters it needs.
+    With use_wkb_parameters the geometry is bound as an EWKB (geometry) or WKB (geography)
+    parameter instead of a WKT literal."""
+    if use_projected_crs:
+        wkt, ewkb = get_query_geometry(name, 3857)
+        if use_wkb_parameters:
+            return "ST_GeomFromEWKB(%s)", (ewkb,)
+        return f"ST_GeomFromText({wkt}, 3857)", None
+    wkt, wkb = get_query_geometry(name, 4326)
+    if use_wkb_parameters:
+        return "ST_GeogFromWKB(%s)", (wkb,)
+    return f"ST_GeogFromText({wkt})", None
 
 
 class PGLoaderBenchmark(PostgreSQLBenchmark):
@@ -39,6 +66,10 @@ class PGLoaderBenchmark(PostgreSQLBenchmark):
         self.gdal_docker_wrapper = GdalDockerWrapper(docker_client)
         self.with_index = with_index
 
+    def prepare(self):
+        # Container start up is not part of the load time
+        self.gdal_docker_wrapper.start_container()
+
     def execute(self):
         raise NotImplementedError
 
@@ -84,6 +115,51 @@ class LoadRoutes(PGLoaderBenchmark):
         LoadRoutes._logger.info("Load done")
 
 
+class TunedLoad(PGLoaderBenchmark):
+    """Loads a dataset with the given ogr2ogr options. With index_after_load the table is imported
+    without an index and the index is built afterwards, as part of the measured time."""
+    _logger = logging.getLogger(__name__)
+
+    def __init__(self, source, table_name, with_index="GIST", index_after_load=False,
+                 group_transactions=None, use_copy=None, promote_to_multi=True, repeat_count=3):
+        self._title = f"Tuned Load {table_name}"
+        self._table_name = table_name
+        super().__init__(with_index=with_index)
+        self.repeat_count = repeat_count
+        self.source = source
+        self.index_after_load = index_after_load
+        self.import_options = {"group_transactions": group_transactions,
+                               "use_copy": use_copy, "promote_to_multi": promote_to_multi}
+        self.index_manager = None
+        # Rows in the table after the last load, see cleanup
+        self.loaded_row_count = None
+
+    def prepare(self):
+        super().prepare()
+        if self.index_after_load:
+            self.index_manager = PostgisIndexManager([self._table_name])
+
+    def execute(self):
+        output = self.gdal_docker_wrapper.import_to_postgis(
+            self.source, self._table_name,
+            create_spatial_index="NONE" if self.index_after_load else self.with_index,
+            **self.import_options)
+        if self.gdal_docker_wrapper.last_exit_code != 0:
+            raise Exception(f"ogr2ogr failed: {output}")
+        if self.index_after_load:
+            self.index_manager.switch(self.with_index)
+
+    def cleanup(self):
+        self.loaded_row_count = self.adapter_p.execute(
+            f"SELECT COUNT(*) FROM {self._table_name}")[0][0]
+        super().cleanup()
+
+    def close(self):
+        super().close()
+        if self.index_manager is not None:
+            self.index_manager.close()
+
+
 class PgSubsampledBenchmark(PostgreSQLBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Base class"
@@ -326,26 +402,21 @@ class PgBoxedBenchmark(PostgreSQLBenchmark):
     _title = None
     _object_names = []
 
-    def __init__(self, use_projected_crs=True, subsampling_factor=1):
+    def __init__(self, use_projected_crs=True, subsampling_factor=1, use_wkb_parameters=False):
         super().__init__(self._title, repeat_count=7)
         self.dataset_suffix = ""
-        self.text_to_shape_function = "ST_GeogFromText"
         if use_projected_crs:
             self.dataset_suffix = "_3857"
-            self.text_to_shape_function = "ST_GeomFromText"
         self.subsampling_condition = ""
         if subsampling_factor > 1:
             for name in self._object_names:
                 self.subsampling_condition += f"MOD({name}.OBJECTID, {subsampling_factor}) = 0 AND "
-        self.bounding_box = f"{GEORGIA_BB_3857}, 3857"
-        if not use_projected_crs:
-            self.bounding_box = f"{GEORGIA_BB_4326}"
-        self.location = f"{ATLANTA_LOC_3857}, 3857"
-        if not use_projected_crs:
-            self.location = f"{ATLANTA_LOC_4326}"
-        self.line = f"{ROUTE_3857}, 3857"
-        if not use_projected_crs:
-            self.line = f"{ROUTE_4326}"
+        self.bounding_box, self.bounding_box_params = create_query_geometry(
+            "bounding_box", use_projected_crs, use_wkb_parameters)
+        self.location, self.location_params = create_query_geometry(
+            "location", use_projected_crs, use_wkb_parameters)
+        self.line, self.line_params = create_query_geometry(
+            "line", use_projected_crs, use_wkb_parameters)
 
     def execute(self):
         raise NotImplementedError
@@ -359,10 +430,10 @@ class RetrievePoints(PgBoxedBenchmark):
     def execute(self):
         cmd = f"""SELECT A.OBJECTID
                 FROM airports{self.dataset_suffix} A
-                WHERE {self.subsampling_condition} st_within(A.wkb_geometry, {self.text_to_shape_function}({self.bounding_box}))
+                WHERE {self.subsampling_condition} st_within(A.wkb_geometry, {self.bounding_box})
                 ;"""
         RetrievePoints._logger.info(f"Query: {cmd}")
-        return self.adapter_np.execute(cmd)
+        return self.adapter_np.execute(cmd, self.bounding_box_params)
 
 
 class RetrieveLines(PgBoxedBenchmark):
@@ -373,10 +444,10 @@ class RetrieveLines(PgBoxedBenchmark):
     def execute(self):
         cmd = f"""SELECT R.OBJECTID
                 FROM routes{self.dataset_suffix} R
-                WHERE {self.subsampling_condition} st_within(R.wkb_geometry, {self.text_to_shape_function}({self.bounding_box}))
+                WHERE {self.subsampling_condition} st_within(R.wkb_geometry, {self.bounding_box})
                 ;"""
         RetrieveLines._logger.info(f"Query: {cmd}")
-        return self.adapter_np.execute(cmd)
+        return self.adapter_np.execute(cmd, self.bounding_box_params)
 
 
 class RetrievePolygons(PgBoxedBenchmark):
@@ -387,10 +458,10 @@ class RetrievePolygons(PgBoxedBenchmark):
     def execute(self):
         cmd = f"""SELECT AS1.OBJECTID
                 FROM airspaces{self.dataset_suffix} AS1
-                WHERE {self.subsampling_condition} st_within(AS1.wkb_geometry, {self.text_to_shape_function}({self.bounding_box}))
+                WHERE {self.subsampling_condition} st_within(AS1.wkb_geometry, {self.bounding_box})
                 ;"""
         RetrievePolygons._logger.info(f"Query: {cmd}")
-        return self.adapter_np.execute(cmd)
+        return self.adapter_np.execute(cmd, self.bounding_box_params)
 
 
 class PointNearPoint(PgBoxedBenchmark):
@@ -401,10 +472,10 @@ class PointNearPoint(PgBoxedBenchmark):
     def execute(self):
         cmd = f"""SELECT A.OBJECTID
                 FROM airports{self.dataset_suffix} A
-                WHERE {self.subsampling_condition} st_distance(A.wkb_geometry, {self.text_to_shape_function}({self.location})) < 50000
+                WHERE {self.subsampling_condition} st_distance(A.wkb_geometry, {self.location}) < 50000
                 ;"""
         PointNearPoint._logger.info(f"Query: {cmd}")
-        return self.adapter_np.execute(cmd)
+        return self.adapter_np.execute(cmd, self.location_params)
 
 
 class PointNearPoint2(PgBoxedBenchmark):
@@ -413,14 +484,14 @@ class PointNearPoint2(PgBoxedBenchmark):
     _object_names = ["A"]
 
     def execute(self):
-        cmd = f"""SELECT A.OBJECTID, st_distance(A.wkb_geometry, {self.text_to_shape_function}({self.location})) AS dist
+        cmd = f"""SELECT A.OBJECTID, st_distance(A.wkb_geometry, {self.location}) AS dist
                 FROM airports{self.dataset_suffix} A
                 {self.subsampling_condition}
                 ORDER BY dist
                 LIMIT 1
                 ;"""
         PointNearPoint2._logger.info(f"Query: {cmd}")
-        return self.adapter_np.execute(cmd)
+        return self.adapter_np.execute(cmd, self.location_params)
 
 
 class PointNearLine(PgBoxedBenchmark):
@@ -431,10 +502,10 @@ class PointNearLine(PgBoxedBenchmark):
     def execute(self):
         cmd = f"""SELECT R.OBJECTID
                 FROM routes{self.dataset_suffix} R
-                WHERE {self.subsampling_condition} st_distance(R.wkb_geometry, {self.text_to_shape_function}({self.location})) < 500000
+                WHERE {self.subsampling_condition} st_distance(R.wkb_geometry, {self.location}) < 500000
                 ;"""
         PointNearLine._logger.info(f"Query: {cmd}")
-        return self.adapter_np.execute(cmd)
+        return self.adapter_np.execute(cmd, self.location_params)
 
 
 class PointNearLine2(PgBoxedBenchmark):
@@ -443,14 +514,14 @@ class PointNearLine2(PgBoxedBenchmark):
     _object_names = ["R"]
 
     def execute(self):
-        cmd = f"""SELECT R.OBJECTID, st_distance(R.wkb_geometry, {self.text_to_shape_function}({self.location})) AS dist
+        cmd = f"""SELECT R.OBJECTID, st_distance(R.wkb_geometry, {self.location}) AS dist
                 FROM routes{self.dataset_suffix} R
                 {self.subsampling_condition}
                 ORDER BY dist
                 LIMIT 1
                 ;"""
         PointNearLine2._logger.info(f"Query: {cmd}")
-        return self.adapter_np.execute(cmd)
+        return self.adapter_np.execute(cmd, self.location_params)
 
 
 class PointNearPolygon(PgBoxedBenchmark):
@@ -461,10 +532,10 @@ class PointNearPolygon(PgBoxedBenchmark):
     def execute(self):
         cmd = f"""SELECT AS1.OBJECTID
                 FROM airspaces{self.dataset_suffix} AS1
-                WHERE {self.subsampling_condition} st_distance(AS1.wkb_geometry, {self.text_to_shape_function}({self.location})) < 500000
+                WHERE {self.subsampling_condition} st_distance(AS1.wkb_geometry, {self.location}) < 500000
                 ;"""
         PointNearPolygon._logger.info(f"Query: {cmd}")
-        return self.adapter_np.execute(cmd)
+        return self.adapter_np.execute(cmd, self.location_params)
 
 
 class SinglePointWithinPolygon(PgBoxedBenchmark):
@@ -475,10 +546,10 @@ class SinglePointWithinPolygon(PgBoxedBenchmark):
     def execute(self):
         cmd = f"""SELECT AS1.OBJECTID
                 FROM airspaces{self.dataset_suffix} AS1
-                WHERE {self.subsampling_condition} st_contains(AS1.wkb_geometry, {self.text_to_shape_function}({self.location}))
+                WHERE {self.subsampling_condition} st_contains(AS1.wkb_geometry, {self.location})
                 ;"""
         SinglePointWithinPolygon._logger.info(f"Query: {cmd}")
-        return self.adapter_np.execute(cmd)
+        return self.adapter_np.execute(cmd, self.location_params)
 
 
 class LineNearPolygon(PgBoxedBenchmark):
@@ -489,10 +560,10 @@ class LineNearPolygon(PgBoxedBenchmark):
     def execute(self):
         cmd = f"""SELECT AS1.OBJECTID
                 FROM airspaces{self.dataset_suffix} AS1
-                WHERE {self.subsampling_condition} st_distance(AS1.wkb_geometry, {self.text_to_shape_function}({self.line})) < 500000
+                WHERE {self.subsampling_condition} st_distance(AS1.wkb_geometry, {self.line}) < 500000
                 ;"""
         LineNearPolygon._logger.info(f"Query: {cmd}")
-        return self.adapter_np.execute(cmd)
+        return self.adapter_np.execute(cmd, self.line_params)
 
 
 class SingleLineIntersectsPolygon(PgBoxedBenchmark):
@@ -503,40 +574,188 @@ class SingleLineIntersectsPolygon(PgBoxedBenchmark):
     def execute(self):
         cmd = f"""SELECT AS1.OBJECTID
                 FROM airspaces{self.dataset_suffix} AS1
-                WHERE {self.subsampling_condition} st_intersects(AS1.wkb_geometry, {self.text_to_shape_function}({self.line}))
+                WHERE {self.subsampling_condition} st_intersects(AS1.wkb_geometry, {self.line})
                 ;"""
         SingleLineIntersectsPolygon._logger.info(f"Query: {cmd}")
-        return self.adapter_np.execute(cmd)
+        return self.adapter_np.execute(cmd, self.line_params)
+
+
+def create_lookup_geometries(shape, count, use_projected_crs=True, seed=0):
+    """WKT (without quotes) of count query geometries spread over the Georgia bounding box,
+    either points or boxes of a tenth of its width and height"""
+    random = np.random.default_rng(seed)
+    corners = np.array(GEORGIA_BOUNDING_BOX)
+    low, high = corners.min(axis=0), corners.max(axis=0)
+    size = (high - low) / 10
+    if shape == "point":
+        points = random.uniform(low, high, (count, 2))
+        if use_projected_crs:
+            # transform_points expects (lat, lon) in the EPSG:4326 axis order
+            points = transform_points(points[:, ::-1])
+        return [create_point(point)[1:-1] for point in points.tolist()]
+    boxes = []
+    for x, y in random.uniform(low, high - size, (count, 2)).tolist():
+        ring = [(x, y), (x, y + size[1]), (x + size[0], y + size[1]), (x + size[0], y), (x, y)]
+        if use_projected_crs:
+            ring = transform_points(np.array(ring)[:, ::-1]).tolist()
+        boxes.append(create_polygon(ring)[1:-1])
+    return boxes
+
+
+class PgLookupBenchmark(PostgreSQLBenchmark):
+    """Runs the same query shape once for each of call_count query geometries, as new literal SQL
+    for every call or through a server side prepared statement (PREPARE/EXECUTE).
+    plan_cache_mode (auto/force_custom_plan/force_generic_plan) selects whether EXECUTE plans
+    the statement again for every call."""
+    _logger = logging.getLogger(__name__)
+    _title = None
+    _lookup_shape = None
+
+    def __init__(self, use_projected_crs=True, use_prepared_statements=False, plan_cache_mode=None,
+                 call_count=1000):
+        super().__init__(self._title, repeat_count=7)
+        self.dataset_suffix = ""
+        if use_projected_crs:
+            self.dataset_suffix = "_3857"
+        self.use_projected_crs = use_projected_crs
+        self.use_prepared_statements = use_prepared_statements
+        self.lookup_geometries = create_lookup_geometries(
+            self._lookup_shape, call_count, use_projected_crs)
+        self.statement_name = f"{type(self).__name__.lower()}_lookup"
+        self.plan_cache_mode = plan_cache_mode
+
+    def prepare(self):
+        if self.plan_cache_mode is not None:
+            self.adapter_np.execute_nontransaction(
+                f"SET plan_cache_mode = {self.plan_cache_mode}")
+        if self.use_prepared_statements:
+            self.adapter_np.prepare(self.statement_name,
+                                    self.get_query(self.geometry_expression("$1")), ["text"])
+
+    def geometry_expression(self, wkt):
+        if self.use_projected_crs:
+            return f"ST_GeomFromText({wkt}, 3857)"
+        return f"ST_GeogFromText({wkt})"
+
+    def get_query(self, geometry):
+        raise NotImplementedError
+
+    def get_item_count(self):
+        return len(self.lookup_geometries)
+
+    def execute(self):
+        results = []
+        for wkt in self.lookup_geometries:
+            if self.use_prepared_statements:
+                results += self.adapter_np.execute_prepared(
+                    self.statement_name, (wkt,))
+            else:
+                results += self.adapter_np.execute(
+                    self.get_query(self.geometry_expression(f"'{wkt}'")))
+        return results
+
+    def get_planning_time(self, sample_count=20):
+        """Average planning and execution time in seconds of a call as reported by EXPLAIN ANALYZE"""
+        planning_time = 0
+        execution_time = 0
+        for wkt in self.lookup_geometries[:sample_count]:
+            if self.use_prepared_statements:
+                query = f"EXECUTE {self.statement_name} ('{wkt}')"
+            else:
+                query = self.get_query(self.geometry_expression(f"'{wkt}'"))
+            plan = self.adapter_np.execute(
+                f"EXPLAIN (ANALYZE, FORMAT JSON) {query}")[0][0][0]
+            planning_time += plan["Planning Time"] / 1000
+            execution_time += plan["Execution Time"] / 1000
+        sample_count = min(sample_count, len(self.lookup_geometries))
+        return {"planning": planning_time / sample_count, "execution": execution_time / sample_count}
+
+
+class PointLookup(PgLookupBenchmark):
+    """SinglePointWithinPolygon with a different point for every call"""
+    _logger = logging.getLogger(__name__)
+    _title = "Point Lookup"
+    _lookup_shape = "point"
+
+    def get_query(self, geometry):
+        return f"""SELECT AS1.OBJECTID
+                FROM airspaces{self.dataset_suffix} AS1
+                WHERE st_contains(AS1.wkb_geometry, {geometry})
+                ;"""
+
+
+class RangeLookup(PgLookupBenchmark):
+    """RetrievePoints with a different box for every call"""
+    _logger = logging.getLogger(__name__)
+    _title = "Range Lookup"
+    _lookup_shape = "box"
+
+    def get_query(self, geometry):
+        return f"""SELECT A.OBJECTID
+                FROM airports{self.dataset_suffix} A
+                WHERE st_within(A.wkb_geometry, {geometry})
+                ;"""
+
+
+def create_insert_values(adapter, query, srid):
+    """VALUES of an INSERT of the rows of query with new OBJECTIDs from 50000.
+    The first column of query is the WKT of the geometry; the other columns are converted in a single pass
+    chosen from the cursor description."""
+    rows, description = adapter.execute_with_description(query)
+    transcoder = RowTranscoder.from_description(description[1:])
+    values = transcoder.to_sql_values(row[1:] for row in rows)
+    # Each VALUES string starts with the opening parenthesis, which comes before the OBJECTID
+    return ', '.join(f"({50000 + idx}, ST_GeomFromText('{row[0]}', {srid}), {row_values[1:]}"
+                     for idx, (row, row_values) in enumerate(zip(rows, values)))
+
+
+def create_copy_lines(adapter, query):
+    """COPY text lines of the rows of query with new OBJECTIDs from 50000 as first column.
+    The geometries are read as EWKB, which is also the COPY input of a geometry; the other columns
+    are converted in a single pass chosen from the cursor description."""
+    rows, description = adapter.execute_with_description(query)
+    transcoder = RowTranscoder([None] + RowTranscoder.from_description(description).converters)
+    return list(transcoder.to_copy_text((50000 + idx,) + row for idx, row in enumerate(rows)))
 
 
 class InsertNewPoints(PostgreSQLBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Insert New Points"
+    _columns = "objectid, wkb_geometry, global_id, ident, name, latitude, longitude, elevation, icao_id, type_code, servcity, state, country, operstatus, privateuse, iapexists, dodhiflip, far91, far93, mil_code, airanal, us_high, us_low, ak_high, ak_low, us_area, pacific".split(", ")
 
-    def __init__(self, use_projected_crs=True):
-        super().__init__(self._title, repeat_count=7)
+    def __init__(self, use_projected_crs=True, use_copy=False):
+        """use_copy loads the rows with COPY ... FROM STDIN instead of INSERT ... VALUES"""
+        super().__init__(f"{self._title}{' (COPY)' if use_copy else ''}", repeat_count=7)
+        self.use_copy = use_copy
         self.dataset_suffix = ""
         srid = 4326
         if use_projected_crs:
             self.dataset_suffix = "_3857"
             srid = 3857
+        self.srid = srid
+
+    def prepare(self):
         self.cleanup()
-        data_to_insert = self.adapter_np.execute(f"""SELECT ST_AsText(wkb_geometry), global_id, ident, name, latitude, longitude, elevation, icao_id, type_code, servcity, state, country, operstatus, privateuse, iapexists, dodhiflip, far91, far93, mil_code, airanal, us_high, us_low, ak_high, ak_low, us_area, pacific
+        # COPY reads the geometries as EWKB, INSERT as WKT
+        geometry = "wkb_geometry" if self.use_copy else "ST_AsText(wkb_geometry)"
+        query = f"""SELECT {geometry}, global_id, ident, name, latitude, longitude, elevation, icao_id, type_code, servcity, state, country, operstatus, privateuse, iapexists, dodhiflip, far91, far93, mil_code, airanal, us_high, us_low, ak_high, ak_low, us_area, pacific
                                                 FROM airports{self.dataset_suffix} A
                                                 WHERE A.OBJECTID <= 1000
-                                                ;""")
-        data_to_insert = convert_decimals_to_ints_in_tuples(data_to_insert)
-        # Remove OBJECTID from returned tuples
-        data_to_insert = [f"({50000+idx}, ST_GeomFromText('{t[0]}', {srid}), {tuple_to_str(t[1:])[1:]}"
-                          for idx, t in enumerate(data_to_insert)]
-        self.new_tuples = ', '.join([t for t in data_to_insert])
+                                                ;"""
+        if self.use_copy:
+            self.copy_lines = create_copy_lines(self.adapter_np, query)
+        else:
+            self.new_tuples = create_insert_values(self.adapter_np, query, self.srid)
 
     def execute(self):
-        cmd = f"""INSERT INTO airports{self.dataset_suffix} (objectid, wkb_geometry, global_id, ident, name, latitude, longitude, elevation, icao_id, type_code, servcity, state, country, operstatus, privateuse, iapexists, dodhiflip, far91, far93, mil_code, airanal, us_high, us_low, ak_high, ak_low, us_area, pacific)
+        if self.use_copy:
+            self.adapter_p.copy_rows(f"airports{self.dataset_suffix}", self._columns, self.copy_lines)
+        else:
+            cmd = f"""INSERT INTO airports{self.dataset_suffix} (objectid, wkb_geometry, global_id, ident, name, latitude, longitude, elevation, icao_id, type_code, servcity, state, country, operstatus, privateuse, iapexists, dodhiflip, far91, far93, mil_code, airanal, us_high, us_low, ak_high, ak_low, us_area, pacific)
                 VALUES {self.new_tuples}
                 ;"""
-        # InsertNewPoints._logger.info(f"Query: {cmd}")
-        self.adapter_p.execute(cmd)
+            # InsertNewPoints._logger.info(f"Query: {cmd}")
+            self.adapter_p.execute(cmd)
         self.adapter_p.connection.commit()
         return
 
@@ -553,31 +772,41 @@ class InsertNewPoints(PostgreSQLBenchmark):
 class InsertNewLines(PostgreSQLBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Insert New Lines"
+    _columns = "objectid, wkb_geometry, global_id, ident, level_, wkhr_code, wkhr_rmk, maa_val, maa_uom, mea_e_val, mea_e_uom, mea_w_val, mea_w_uom, gmea_e_val, gmea_e_uom, gmea_w_val, gmea_w_uom, dmea_val, dmea_uom, moca_val, moca_uom, meagap, truetrk, magtrk, revtruetrk, revmagtrk, length_val, copdist, copnav_id, repatcstar, repatcend, direction, freq_class, status, startpt_id, endpt_id, rtport_id, enrinfo_id, widthright, widthleft, width_uom, mca1_val, mca1_uom, mca1_dir, mca2_val, mca2_uom, mca2_dir, mcapt_id, mcapt_type, tflag_code, remarks, ak_low, ak_high, us_low, us_high, type_code, us_area, pacific, nmagtrk, nrevmagtrk, shape__len".split(", ")
 
-    def __init__(self, use_projected_crs=True):
-        super().__init__(self._title, repeat_count=7)
+    def __init__(self, use_projected_crs=True, use_copy=False):
+        """use_copy loads the rows with COPY ... FROM STDIN instead of INSERT ... VALUES"""
+        super().__init__(f"{self._title}{' (COPY)' if use_copy else ''}", repeat_count=7)
+        self.use_copy = use_copy
         self.dataset_suffix = ""
         srid = 4326
         if use_projected_crs:
             self.dataset_suffix = "_3857"
             srid = 3857
+        self.srid = srid
+
+    def prepare(self):
         self.cleanup()
-        data_to_insert = self.adapter_np.execute(f"""SELECT ST_AsText(wkb_geometry), global_id, ident, level_, wkhr_code, wkhr_rmk, maa_val, maa_uom, mea_e_val, mea_e_uom, mea_w_val, mea_w_uom, gmea_e_val, gmea_e_uom, gmea_w_val, gmea_w_uom, dmea_val, dmea_uom, moca_val, moca_uom, meagap, truetrk, magtrk, revtruetrk, revmagtrk, length_val, copdist, copnav_id, repatcstar, repatcend, direction, freq_class, status, startpt_id, endpt_id, rtport_id, enrinfo_id, widthright, widthleft, width_uom, mca1_val, mca1_uom, mca1_dir, mca2_val, mca2_uom, mca2_dir, mcapt_id, mcapt_type, tflag_code, remarks, ak_low, ak_high, us_low, us_high, type_code, us_area, pacific, nmagtrk, nrevmagtrk, shape__len
+        # COPY reads the geometries as EWKB, INSERT as WKT
+        geometry = "wkb_geometry" if self.use_copy else "ST_AsText(wkb_geometry)"
+        query = f"""SELECT {geometry}, global_id, ident, level_, wkhr_code, wkhr_rmk, maa_val, maa_uom, mea_e_val, mea_e_uom, mea_w_val, mea_w_uom, gmea_e_val, gmea_e_uom, gmea_w_val, gmea_w_uom, dmea_val, dmea_uom, moca_val, moca_uom, meagap, truetrk, magtrk, revtruetrk, revmagtrk, length_val, copdist, copnav_id, repatcstar, repatcend, direction, freq_class, status, startpt_id, endpt_id, rtport_id, enrinfo_id, widthright, widthleft, width_uom, mca1_val, mca1_uom, mca1_dir, mca2_val, mca2_uom, mca2_dir, mcapt_id, mcapt_type, tflag_code, remarks, ak_low, ak_high, us_low, us_high, type_code, us_area, pacific, nmagtrk, nrevmagtrk, shape__len
                                                 FROM routes{self.dataset_suffix} R
                                                 WHERE R.OBJECTID <= 1000
-                                                ;""")
-        data_to_insert = convert_decimals_to_ints_in_tuples(data_to_insert)
-        # Remove OBJECTID from returned tuples
-        data_to_insert = [f"({50000+idx}, ST_GeomFromText('{t[0]}', {srid}), {tuple_to_str(t[1:])[1:]}"
-                          for idx, t in enumerate(data_to_insert)]
-        self.new_tuples = ', '.join([t for t in data_to_insert])
+                                                ;"""
+        if self.use_copy:
+            self.copy_lines = create_copy_lines(self.adapter_np, query)
+        else:
+            self.new_tuples = create_insert_values(self.adapter_np, query, self.srid)
 
     def execute(self):
-        cmd = f"""INSERT INTO routes{self.dataset_suffix} (objectid, wkb_geometry, global_id, ident, level_, wkhr_code, wkhr_rmk, maa_val, maa_uom, mea_e_val, mea_e_uom, mea_w_val, mea_w_uom, gmea_e_val, gmea_e_uom, gmea_w_val, gmea_w_uom, dmea_val, dmea_uom, moca_val, moca_uom, meagap, truetrk, magtrk, revtruetrk, revmagtrk, length_val, copdist, copnav_id, repatcstar, repatcend, direction, freq_class, status, startpt_id, endpt_id, rtport_id, enrinfo_id, widthright, widthleft, width_uom, mca1_val, mca1_uom, mca1_dir, mca2_val, mca2_uom, mca2_dir, mcapt_id, mcapt_type, tflag_code, remarks, ak_low, ak_high, us_low, us_high, type_code, us_area, pacific, nmagtrk, nrevmagtrk, shape__len)
+        if self.use_copy:
+            self.adapter_p.copy_rows(f"routes{self.dataset_suffix}", self._columns, self.copy_lines)
+        else:
+            cmd = f"""INSERT INTO routes{self.dataset_suffix} (objectid, wkb_geometry, global_id, ident, level_, wkhr_code, wkhr_rmk, maa_val, maa_uom, mea_e_val, mea_e_uom, mea_w_val, mea_w_uom, gmea_e_val, gmea_e_uom, gmea_w_val, gmea_w_uom, dmea_val, dmea_uom, moca_val, moca_uom, meagap, truetrk, magtrk, revtruetrk, revmagtrk, length_val, copdist, copnav_id, repatcstar, repatcend, direction, freq_class, status, startpt_id, endpt_id, rtport_id, enrinfo_id, widthright, widthleft, width_uom, mca1_val, mca1_uom, mca1_dir, mca2_val, mca2_uom, mca2_dir, mcapt_id, mcapt_type, tflag_code, remarks, ak_low, ak_high, us_low, us_high, type_code, us_area, pacific, nmagtrk, nrevmagtrk, shape__len)
                 VALUES {self.new_tuples}
                 ;"""
-        # InsertNewLines._logger.info(f"Query: {cmd}")
-        self.adapter_p.execute(cmd)
+            # InsertNewLines._logger.info(f"Query: {cmd}")
+            self.adapter_p.execute(cmd)
         self.adapter_p.connection.commit()
         return
 
@@ -594,31 +823,41 @@ class InsertNewLines(PostgreSQLBenchmark):
 class InsertNewPolygons(PostgreSQLBenchmark):
     _logger = logging.getLogger(__name__)
     _title = "Insert New Polygons"
+    _columns = "objectid, wkb_geometry, global_id, ident, icao_id, name, upper_desc, upper_val, upper_uom, upper_code, lower_desc, lower_val, lower_uom, lower_code, type_code, local_type, class, mil_code, comm_name, level_, sector, onshore, exclusion, wkhr_code, wkhr_rmk, dst, gmtoffset, cont_agent, city, state, country, adhp_id, us_high, ak_high, ak_low, us_low, us_area, pacific, shape__are, shape__len".split(", ")
 
-    def __init__(self, use_projected_crs=True):
-        super().__init__(self._title, repeat_count=7)
+    def __init__(self, use_projected_crs=True, use_copy=False):
+        """use_copy loads the rows with COPY ... FROM STDIN instead of INSERT ... VALUES"""
+        super().__init__(f"{self._title}{' (COPY)' if use_copy else ''}", repeat_count=7)
+        self.use_copy = use_copy
         self.dataset_suffix = ""
         srid = 4326
         if use_projected_crs:
             self.dataset_suffix = "_3857"
             srid = 3857
+        self.srid = srid
+
+    def prepare(self):
         self.cleanup()
-        data_to_insert = self.adapter_np.execute(f"""SELECT ST_AsText(wkb_geometry), global_id, ident, icao_id, name, upper_desc, upper_val, upper_uom, upper_code, lower_desc, lower_val, lower_uom, lower_code, type_code, local_type, class, mil_code, comm_name, level_, sector, onshore, exclusion, wkhr_code, wkhr_rmk, dst, gmtoffset, cont_agent, city, state, country, adhp_id, us_high, ak_high, ak_low, us_low, us_area, pacific, shape__are, shape__len
+        # COPY reads the geometries as EWKB, INSERT as WKT
+        geometry = "wkb_geometry" if self.use_copy else "ST_AsText(wkb_geometry)"
+        query = f"""SELECT {geometry}, global_id, ident, icao_id, name, upper_desc, upper_val, upper_uom, upper_code, lower_desc, lower_val, lower_uom, lower_code, type_code, local_type, class, mil_code, comm_name, level_, sector, onshore, exclusion, wkhr_code, wkhr_rmk, dst, gmtoffset, cont_agent, city, state, country, adhp_id, us_high, ak_high, ak_low, us_low, us_area, pacific, shape__are, shape__len
                                                 FROM airspaces{self.dataset_suffix} AS1
                                                 WHERE AS1.OBJECTID <= 1000
-                                                ;""")
-        data_to_insert = convert_decimals_to_ints_in_tuples(data_to_insert)
-        # Remove OBJECTID from returned tuples
-        data_to_insert = [f"({50000+idx}, ST_GeomFromText('{t[0]}', {srid}), {tuple_to_str(t[1:])[1:]}"
-                          for idx, t in enumerate(data_to_insert)]
-        self.new_tuples = ', '.join([t for t in data_to_insert])
+                                                ;"""
+        if self.use_copy:
+            self.copy_lines = create_copy_lines(self.adapter_np, query)
+        else:
+            self.new_tuples = create_insert_values(self.adapter_np, query, self.srid)
 
     def execute(self):
-        cmd = f"""INSERT INTO airspaces{self.dataset_suffix} (objectid, wkb_geometry, global_id, ident, icao_id, name, upper_desc, upper_val, upper_uom, upper_code, lower_desc, lower_val, lower_uom, lower_code, type_code, local_type, class, mil_code, comm_name, level_, sector, onshore, exclusion, wkhr_code, wkhr_rmk, dst, gmtoffset, cont_agent, city, state, country, adhp_id, us_high, ak_high, ak_low, us_low, us_area, pacific, shape__are, shape__len)
+        if self.use_copy:
+            self.adapter_p.copy_rows(f"airspaces{self.dataset_suffix}", self._columns, self.copy_lines)
+        else:
+            cmd = f"""INSERT INTO airspaces{self.dataset_suffix} (objectid, wkb_geometry, global_id, ident, icao_id, name, upper_desc, upper_val, upper_uom, upper_code, lower_desc, lower_val, lower_uom, lower_code, type_code, local_type, class, mil_code, comm_name, level_, sector, onshore, exclusion, wkhr_code, wkhr_rmk, dst, gmtoffset, cont_agent, city, state, country, adhp_id, us_high, ak_high, ak_low, us_low, us_area, pacific, shape__are, shape__len)
                 VALUES {self.new_tuples}
                 ;"""
-        # InsertNewPolygons._logger.info(f"Query: {cmd}")
-        self.adapter_p.execute(cmd)
+            # InsertNewPolygons._logger.info(f"Query: {cmd}")
+            self.adapter_p.execute(cmd)
         self.adapter_p.connection.commit()
         return
 
@@ -0,0 +1,71 @@
+from benchmark import mysql_benchmarks, postgresql_benchmarks
+from benchmark.benchmark import BenchmarkSpec
+
+"""
+Benchmark suites shared by the benchmark scripts.
+Each entry is (benchmark name, query class, constructor arguments).
+"""
+
+JOIN_BENCHMARKS = [
+    ("PointEqualsPoint", "Point Join", {}),
+    ("PointIntersectsLine", "Point Join", {}),
+    ("PointWithinPolygon", "Point Join", {}),
+    ("LineIntersectsPolygon", "Line Join", {}),
+    ("LineWithinPolygon", "Line Join", {}),
+    ("LineIntersectsLine", "Line Join", {}),
+    ("PolygonEqualsPolygon", "Polygon Join", {}),
+    ("PolygonDisjointPolygon", "Polygon Join", {"subsampling_factor": 10}),
+    ("PolygonIntersectsPolygon", "Polygon Join", {}),
+    ("PolygonWithinPolygon", "Polygon Join", {}),
+]
+
+ANALYSIS_BENCHMARKS = [
+    ("RetrievePoints", "Range", {}),
+    ("LongestLine", "Aggregate", {}),
+    ("TotalLength", "Aggregate", {}),
+    ("RetrieveLines", "Range", {}),
+    ("LargestArea", "Aggregate", {}),
+    ("TotalArea", "Aggregate", {}),
+    ("RetrievePolygons", "Range", {}),
+    ("PointNearPoint", "Distance", {}),
+    ("PointNearPoint2", "Nearest Neighbour", {}),
+    ("PointNearLine", "Distance", {}),
+    ("PointNearLine2", "Nearest Neighbour", {}),
+    ("PointNearPolygon", "Distance", {}),
+    ("SinglePointWithinPolygon", "Single Geometry", {}),
+    ("LineNearPolygon", "Distance", {}),
+    ("SingleLineIntersectsPolygon", "Single Geometry", {}),
+]
+
+# Analysis benchmarks that compare the data with a query geometry (bounding box, location or route)
+QUERY_GEOMETRY_BENCHMARKS = [name for name, query_class, _ in ANALYSIS_BENCHMARKS
+                             if query_class != "Aggregate"]
+
+
+def get_suite(mode):
+    if mode == 'join':
+        return JOIN_BENCHMARKS
+    elif mode == 'analysis':
+        return ANALYSIS_BENCHMARKS
+    raise ValueError(f"Unknown benchmark mode {mode}")
+
+
+def get_query_class(name):
+    for benchmark_name, query_class, _ in JOIN_BENCHMARKS + ANALYSIS_BENCHMARKS:
+        if benchmark_name == name:
+            return query_class
+    raise ValueError(f"Unknown benchmark {name}")
+
+
+def create_benchmark(db, name, **kwargs):
+    """db is 'mysql' or 'pg'"""
+    module = mysql_benchmarks if db == 'mysql' else postgresql_benchmarks
+    for benchmark_name, _, default_kwargs in JOIN_BENCHMARKS + ANALYSIS_BENCHMARKS:
+        if benchmark_name == name:
+            return getattr(module, name)(**{**default_kwargs, **kwargs})
+    raise ValueError(f"Unknown benchmark {name}")
+
+
+def create_benchmark_spec(db, name, **kwargs):
+    """Like create_benchmark, but the benchmark is only created when the spec is run"""
+    return BenchmarkSpec(create_benchmark, db, name, **kwargs)
@@ -0,0 +1,141 @@
+import logging
+import time
+import json
+import argparse
+from benchmark import mysql_benchmarks, postgresql_benchmarks
+from mysqlutils.mysqladapter import MySQLAdapter
+from mysqlutils.asyncmysqladapter import AsyncMySQLAdapter
+from postgis_docker_wrapper.postgisadapter import PostgisAdapter
+from postgis_docker_wrapper.asyncpostgisadapter import AsyncPostgisAdapter
+from plotting.bar_chart import create_bar_chart
+from util.benchmark_helpers import init, cleanup, start_container
+from util.workload import run_thread_pool_workload, run_asyncio_workload
+
+"""
+Benchmark for driving many concurrent point lookups from one client process,
+with a thread pool of blocking adapters and with asyncio adapters
+"""
+
+parser = argparse.ArgumentParser(description='Process some integers.')
+parser.add_argument('--init', dest='init', action='store_const', const=True, default=False,
+                    help='Create schemas if necessary and load datasets')
+parser.add_argument('--cleanup', dest='cleanup', action='store_const', const=True, default=False,
+                    help='Remove docker containers and volumes')
+parser.add_argument('--no-pcs', dest='pcs', action='store_const', const=False, default=True,
+                    help='Use the datasets in the geographic coordinate system')
+parser.add_argument('--db', dest='db', action='store', default='both',
+                    help='Select DB (both/mysql/pg)')
+parser.add_argument('--queries', dest='queries', action='store', type=int, default=5000,
+                    help='Number of lookups in the workload')
+parser.add_argument('--connections', dest='connections', action='store', type=int, default=4,
+                    help='Number of database connections')
+parser.add_argument('--in-flight', dest='in_flight', action='store', type=int, default=64,
+                    help='Number of queries in flight at the same time')
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# How each kind of runner sends the queries, so that protocol differences are not mistaken for
+# differences of the dispatch model. The asyncpg statement cache is off (see AsyncPostgisAdapter.create).
+PROTOCOLS = {
+    "mysql": {"threads": "mysql.connector, literal SQL over the text protocol",
+              "asyncio": "aiomysql, literal SQL over the text protocol"},
+    "pg": {"threads": "psycopg2, literal SQL (simple query protocol), text results",
+           "asyncio": "asyncpg, unnamed statement parsed for every query (extended protocol), binary results"},
+}
+
+
+def create_workload(db):
+    """Point in polygon lookups (SinglePointWithinPolygon) with a different point for every query"""
+    suffix = "_3857" if args.pcs else ""
+    if db == 'mysql':
+        srid = 3857 if args.pcs else 4326
+        query = f"""SELECT AS1.OBJECTID
+                FROM {mysql_benchmarks.DATABASE_NAME}.airspaces{suffix} AS1
+                WHERE st_contains(AS1.SHAPE, ST_GeomFromText(%s, {srid}))"""
+        points = mysql_benchmarks.create_lookup_geometries(
+            "point", args.queries, args.pcs)
+    else:
+        geometry = "ST_GeomFromText(%s, 3857)" if args.pcs else "ST_GeogFromText(%s)"
+        query = f"""SELECT AS1.OBJECTID
+                FROM airspaces{suffix} AS1
+                WHERE st_contains(AS1.wkb_geometry, {geometry})"""
+        points = postgresql_benchmarks.create_lookup_geometries(
+            "point", args.queries, args.pcs)
+    return [(query, (wkt,)) for wkt in points]
+
+
+def create_adapter(db):
+    if db == 'mysql':
+        return MySQLAdapter('root', 'root-password')
+    return PostgisAdapter("postgres", "root-password", dbname=postgresql_benchmarks.DATABASE_NAME)
+
+
+async def create_async_adapter(db):
+    if db == 'mysql':
+        return await AsyncMySQLAdapter.create('root', 'root-password', pool_size=args.connections)
+    return await AsyncPostgisAdapter.create("postgres", "root-password", dbname=postgresql_benchmarks.DATABASE_NAME,
+                                            pool_size=args.connections)
+
+
+def main():
+    if args.init:
+        logger.info("Initing DB")
+        init(import_gcs=not args.pcs, db=args.db)
+    else:
+        logger.info("Reusing existing DB")
+        start_container(db=args.db)
+
+    dbs = ['mysql', 'pg'] if args.db == 'both' else [args.db]
+    db_group_names = {"mysql": "MySQL", "pg": "Postgis"}
+
+    results = {}
+    protocols = {}
+    for db in dbs:
+        workload = create_workload(db)
+        runners = [
+            (f"Thread Pool ({args.connections} threads)",
+             lambda: run_thread_pool_workload(lambda: create_adapter(db), workload, args.connections)),
+            (f"Thread Pool ({args.in_flight} threads)",
+             lambda: run_thread_pool_workload(lambda: create_adapter(db), workload, args.in_flight)),
+            (f"Asyncio ({args.in_flight} in flight)",
+             lambda: run_asyncio_workload(lambda: create_async_adapter(db), workload, args.in_flight)),
+        ]
+        results[db_group_names[db]] = {}
+        protocols[db_group_names[db]] = dict(
+            (runner_name, PROTOCOLS[db]["asyncio" if runner_name.startswith("Asyncio") else "threads"])
+            for runner_name, _ in runners)
+        for runner_name, run in runners:
+            logger.info(f"{db_group_names[db]}: running {runner_name}")
+            results[db_group_names[db]][runner_name] = run()
+            logger.info(
+                f"{db_group_names[db]} {runner_name}: {results[db_group_names[db]][runner_name]}")
+
+    output_file = "concurrency_benchmark"
+    if not args.pcs:
+        output_file += '_gcs'
+    with open(f"results/{output_file}.json", 'w') as file:
+        file.write(json.dumps({"connections": args.connections, "in_flight": args.in_flight,
+                               "protocols": protocols, "results": results}, indent=4))
+
+    throughput = dict((group, dict((runner_name, result["throughput"])
+                                   for runner_name, result in group_results.items()))
+                      for group, group_results in results.items())
+    create_bar_chart(throughput, "Lookups per Second With a Thread Pool and Asyncio",
+                     "Queries per Second", f"figures/{output_file}.png", fig_size=(10, 5))
+    cpu_time = dict((group, dict((runner_name, result["cpu_time"])
+                                 for runner_name, result in group_results.items()))
+                    for group, group_results in results.items())
+    create_bar_chart(cpu_time, "Client CPU Time With a Thread Pool and Asyncio",
+                     "Seconds", f"figures/{output_file}_cpu.png", fig_size=(10, 5))
+
+    if args.cleanup:
+        cleanup(db=args.db)
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    end = time.perf_counter()
+    logger.info(f"Total benchmark time: {(end-start)/60} minutes")
@@ -0,0 +1,216 @@
+import logging
+import time
+import json
+import argparse
+from benchmark.suites import get_suite, get_query_class, create_benchmark
+from benchmark.benchmark_exception import BenchmarkException
+from plotting.bar_chart import create_bar_chart
+from util.benchmark_helpers import init, cleanup, recreate_containers, expand_grid
+from util.checkpoint import Checkpoint
+
+"""
+Benchmark for database configuration parameters.
+Runs a subset of the join or analysis queries against a grid of server settings.
+"""
+
+# The first value of each parameter is the container default and is used as the baseline
+PG_GRID = {
+    "shared_buffers": ["128MB", "1GB", "4GB"],
+    "work_mem": ["4MB", "64MB", "256MB"],
+    "effective_cache_size": ["4GB", "12GB"],
+    "random_page_cost": ["4", "1.1"],
+    "jit": ["on", "off"],
+    "max_parallel_workers_per_gather": ["0", "2", "4"],
+}
+MYSQL_GRID = {
+    "innodb_buffer_pool_size": ["128M", "1G", "4G"],
+    "innodb_flush_log_at_trx_commit": ["1", "2"],
+    "join_buffer_size": ["256K", "4M", "64M"],
+}
+
+parser = argparse.ArgumentParser(description='Process some integers.')
+parser.add_argument('mode', metavar='M', type=str,
+                    choices=['join', 'analysis'],
+                    help='Constrains which benchmarks are run')
+parser.add_argument('--init', dest='init', action='store_const', const=True, default=False,
+                    help='Create schemas if necessary and load datasets')
+parser.add_argument('--cleanup', dest='cleanup', action='store_const', const=True, default=False,
+                    help='Remove docker containers and volumes')
+parser.add_argument('--db', dest='db', action='store', default='both',
+                    help='Select DB (both/mysql/pg)')
+parser.add_argument('--benchmarks', dest='benchmarks', action='store', default=None,
+                    help='Comma separated list of benchmarks to run (default: all benchmarks of the mode)')
+parser.add_argument('--strategy', dest='strategy', action='store', default='oat',
+                    choices=['oat', 'full'],
+                    help='Vary one parameter at a time (oat) or run the full cartesian grid (full)')
+parser.add_argument('--grid', dest='grid', action='store', default=None,
+                    help='JSON file with {"pg": {...}, "mysql": {...}} parameter grids')
+parser.add_argument('--repeat', dest='repeat', action='store', type=int, default=3,
+                    help='Number of runs per benchmark and configuration')
+parser.add_argument('--resume', dest='resume', action='store_const', const=True, default=False,
+                    help='Skip configurations completed by a previous interrupted sweep')
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_configuration(db, settings, benchmark_names, checkpoint):
+    keys = dict((name, f"{db}/{json.dumps(settings, sort_keys=True)}/{name}")
+                for name in benchmark_names)
+    if all(checkpoint.is_done(key) for key in keys.values()):
+        logger.info(f"Skipping {db} configuration {settings}, already completed")
+        return dict((name, checkpoint.get(key)) for name, key in keys.items())
+
+    if db == 'mysql':
+        recreate_containers(mysql_settings=settings, db=db)
+    else:
+        recreate_containers(pg_settings=settings, db=db)
+
+    times = {}
+    for name in benchmark_names:
+        if checkpoint.is_done(keys[name]):
+            times[name] = checkpoint.get(keys[name])
+            continue
+        bnchmrk = create_benchmark(db, name)
+        bnchmrk.repeat_count = args.repeat
+        try:
+            bnchmrk.run()
+            times[name] = bnchmrk.get_average_time()
+            logger.info(f"{name} with {settings}: {times[name]} seconds")
+            checkpoint.record(keys[name], times[name])
+        except BenchmarkException as e:
+            logger.warning(f"Benchmark Exception: {str(e)}")
+            times[name] = None
+            checkpoint.record_failure(keys[name], str(e))
+        finally:
+            bnchmrk.close()
+    return times
+
+
+def get_baseline_deltas(runs, class_times, grid):
+    """One-factor-at-a-time effects: for each value of each parameter, the time of the run that
+    differs from the baseline (the first run) in that parameter only, and its speedup over the baseline"""
+    baseline_settings = runs[0]["settings"]
+    baseline_time = class_times[0]
+    deltas = {}
+    for name, values in grid.items():
+        deltas[name] = {}
+        for value in values:
+            settings = {**baseline_settings, name: value}
+            level_time = next((t for run, t in zip(runs, class_times) if run["settings"] == settings), None)
+            if level_time is not None:
+                deltas[name][value] = {
+                    "time": level_time,
+                    "speedup": baseline_time / level_time if baseline_time else None,
+                }
+    return deltas
+
+
+def get_main_effects(runs, class_times, grid):
+    """Factorial main effects: for each value of each parameter, the mean time of every run with that value.
+    Only meaningful for the full grid, where every value is combined with every value of the other parameters."""
+    main_effects = {}
+    for name, values in grid.items():
+        main_effects[name] = {}
+        for value in values:
+            level_times = [t for run, t in zip(runs, class_times)
+                           if t is not None and run["settings"].get(name) == value]
+            if level_times:
+                main_effects[name][value] = sum(
+                    level_times) / len(level_times)
+    return main_effects
+
+
+def build_report(runs, grid, strategy):
+    """Summarizes the sweep for each query class: the best configuration, its speedup over the baseline,
+    and the effect of each parameter value: deltas from the baseline for a one-factor-at-a-time sweep (oat),
+    main effects for the full grid"""
+    report = {}
+    query_classes = sorted(set(get_query_class(name)
+                               for name in runs[0]["times"]))
+    for query_class in query_classes:
+        class_times = []
+        for run in runs:
+            times = [t for name, t in run["times"].items()
+                     if get_query_class(name) == query_class]
+            class_times.append(None if None in times else sum(times))
+        measured = [(t, idx)
+                    for idx, t in enumerate(class_times) if t is not None]
+        if not measured:
+            continue
+        best_time, best_idx = min(measured)
+        baseline_time = class_times[0]
+
+        report[query_class] = {
+            "best_settings": runs[best_idx]["settings"],
+            "best_time": best_time,
+            "baseline_time": baseline_time,
+            "speedup": baseline_time / best_time if baseline_time else None,
+        }
+        if strategy == 'full':
+            report[query_class]["main_effects"] = get_main_effects(runs, class_times, grid)
+        else:
+            report[query_class]["baseline_deltas"] = get_baseline_deltas(runs, class_times, grid)
+    return report
+
+
+def main():
+    grids = {"pg": PG_GRID, "mysql": MYSQL_GRID}
+    if args.grid is not None:
+        with open(args.grid, 'r') as file:
+            grids.update(json.loads(file.read()))
+
+    if args.init:
+        logger.info("Initing DB")
+        init()
+
+    benchmark_names = [name for name, _, _ in get_suite(args.mode)]
+    if args.benchmarks is not None:
+        benchmark_names = args.benchmarks.split(',')
+
+    output_file = f"config_sweep_{args.mode}_benchmark"
+    checkpoint = Checkpoint(f"{output_file}_{args.db}", resume=args.resume)
+
+    dbs = ['mysql', 'pg'] if args.db == 'both' else [args.db]
+    db_group_names = {"mysql": "MySQL", "pg": "Postgis"}
+    sweep_data = {}
+    report = {}
+    for db in dbs:
+        runs = []
+        for settings in expand_grid(grids[db], args.strategy):
+            logger.info(f"Running {db} configuration {settings}")
+            runs.append({"settings": settings,
+                         "times": run_configuration(db, settings, benchmark_names, checkpoint)})
+        sweep_data[db_group_names[db]] = runs
+        report[db_group_names[db]] = build_report(runs, grids[db], args.strategy)
+        # Leave the container with its default settings
+        recreate_containers(db=db)
+
+    with open(f"results/{output_file}.json", 'w') as file:
+        file.write(json.dumps(sweep_data, indent=4))
+    with open(f"results/{output_file}_report.json", 'w') as file:
+        file.write(json.dumps(report, indent=4))
+    checkpoint.remove()
+
+    chart_data = {}
+    for group_name, classes in report.items():
+        chart_data[f"{group_name} (Default)"] = dict(
+            (query_class, summary["baseline_time"]) for query_class, summary in classes.items())
+        chart_data[f"{group_name} (Best)"] = dict(
+            (query_class, summary["best_time"]) for query_class, summary in classes.items())
+        for query_class, summary in classes.items():
+            logger.info(
+                f"{group_name} {query_class}: best settings {summary['best_settings']} ({summary['speedup']}x)")
+    create_bar_chart(chart_data, "Time to Run Query Class With Default and Best Settings",
+                     "Seconds", f"figures/{output_file}.png", yscale='log')
+
+    if args.cleanup:
+        cleanup()
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    end = time.perf_counter()
+    logger.info(f"Total benchmark time: {(end-start)/60} minutes")
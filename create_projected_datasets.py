@@ -1,7 +1,41 @@
 import docker
 import time
 import logging
+import argparse
 from gdal.gdaldockerwrapper import GdalDockerWrapper
+from util.projection_cache import ProjectionCache
+
+"""
+Projects the datasets into each target SRS. Projections whose source files and SRS did not change
+since they were created are skipped, and the stale ones are projected in parallel.
+"""
+
+# Source layer and the name of its projected directory, which gets the SRS code as suffix
+DATASETS = [
+    ("airports/Airports.shp", "airports"),
+    ("airspace/Class_Airspace.shp", "airspace"),
+    ("routes/ATS_Route.shp", "routes"),
+]
+
+parser = argparse.ArgumentParser(description='Process some integers.')
+parser.add_argument('--srs', dest='srs', action='store', default='EPSG:3857',
+                    help='Comma separated target projections, e.g. EPSG:3857,ESRI:102009')
+parser.add_argument('--jobs', dest='jobs', action='store', type=int, default=4,
+                    help='Number of projections run at the same time')
+parser.add_argument('--force', dest='force', action='store_const', const=True, default=False,
+                    help='Project every dataset again even if the cached projection is up to date')
+args = parser.parse_args()
+
+
+def get_projections(srs_list):
+    """(source, dest, srs) tuples, e.g. airports/Airports.shp to airports_3857/Airports.shp in EPSG:3857"""
+    projections = []
+    for srs in srs_list:
+        code = srs.split(':')[-1]
+        for source, name in DATASETS:
+            file_name = source.split('/')[-1]
+            projections.append((source, f"{name}_{code}/{file_name}", srs))
+    return projections
 
 
 def main():
@@ -9,17 +43,17 @@ def main():
     logger = logging.getLogger(__name__)
     docker_client = docker.from_env()
     gdal_docker_wrapper = GdalDockerWrapper(docker_client)
+    projection_cache = ProjectionCache(gdal_docker_wrapper)
 
-    # Project airports to EPSG:3857
-    logger.info(gdal_docker_wrapper.project_dataset(
-        "airports/Airports.shp", "airports_3857/Airports.shp"))
-    # Project airspaces to EPSG:3857
-    logger.info(gdal_docker_wrapper.project_dataset(
-        "airspace/Class_Airspace.shp", "airspace_3857/Class_Airspace.shp"))
-    # Project routes to EPSG:3857
-    logger.info(gdal_docker_wrapper.project_dataset(
-        "routes/ATS_Route.shp", "routes_3857/ATS_Route.shp"))
+    projections = get_projections(args.srs.split(','))
+    projected = projection_cache.project_all(
+        projections, max_workers=args.jobs, force=args.force)
+    logger.info(
+        f"Projected {len(projected)} of {len(projections)} datasets, the others were up to date: {projected}")
 
 
 if __name__ == '__main__':
+    start = time.perf_counter()
     main()
+    end = time.perf_counter()
+    logging.getLogger(__name__).info(f"Total time: {end-start} seconds")
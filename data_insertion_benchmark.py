@@ -4,6 +4,7 @@ import json
 import argparse
 from benchmark import mysql_benchmarks, postgresql_benchmarks
 from benchmark import postgresql_benchmarks
+from benchmark.benchmark import BenchmarkSpec
 from plotting.bar_chart import create_bar_chart
 from util.benchmark_helpers import init, cleanup, start_container
 
@@ -22,6 +23,8 @@ parser.add_argument('--pg-index', dest='pg_index', action='store', default='GIST
                     help='Select postgis index (GIST/SPGIST/BRIN/NONE)')
 parser.add_argument('--mysql-noindex', dest='mysql_index', action='store_const', const=False, default=True,
                     help='Disable MySQL index')
+parser.add_argument('--copy', dest='copy', action='store_const', const=True, default=False,
+                    help='Also load the PostGIS rows with COPY ... FROM STDIN, as a separate group')
 args = parser.parse_args()
 
 logging.basicConfig(level=logging.INFO)
@@ -38,26 +41,36 @@ def main():
     postgis_group_name = f"Postgis{' (No Index)' if args.pg_index == 'NONE' else ''}"
 
     benchmarks = [
-        (mysql_group_name, "Points", mysql_benchmarks.InsertNewPoints()),
-        (postgis_group_name, "Points", postgresql_benchmarks.InsertNewPoints()),
-        (mysql_group_name, "Lines", mysql_benchmarks.InsertNewLines()),
-        (postgis_group_name, "Lines", postgresql_benchmarks.InsertNewLines()),
-        (mysql_group_name, "Polygons", mysql_benchmarks.InsertNewPolygons()),
-        (postgis_group_name, "Polygons", postgresql_benchmarks.InsertNewPolygons()),
+        (mysql_group_name, "Points", BenchmarkSpec(mysql_benchmarks.InsertNewPoints)),
+        (postgis_group_name, "Points", BenchmarkSpec(postgresql_benchmarks.InsertNewPoints)),
+        (mysql_group_name, "Lines", BenchmarkSpec(mysql_benchmarks.InsertNewLines)),
+        (postgis_group_name, "Lines", BenchmarkSpec(postgresql_benchmarks.InsertNewLines)),
+        (mysql_group_name, "Polygons", BenchmarkSpec(mysql_benchmarks.InsertNewPolygons)),
+        (postgis_group_name, "Polygons", BenchmarkSpec(postgresql_benchmarks.InsertNewPolygons)),
     ]
+    if args.copy:
+        # COPY is not comparable with the INSERT of the other groups, it gets a group of its own
+        copy_group_name = f"{postgis_group_name} (COPY)"
+        benchmarks += [
+            (copy_group_name, "Points", BenchmarkSpec(postgresql_benchmarks.InsertNewPoints, use_copy=True)),
+            (copy_group_name, "Lines", BenchmarkSpec(postgresql_benchmarks.InsertNewLines, use_copy=True)),
+            (copy_group_name, "Polygons", BenchmarkSpec(postgresql_benchmarks.InsertNewPolygons, use_copy=True)),
+        ]
 
     benchmark_data = dict([(benchmark[0], {}) for benchmark in benchmarks])
     for idx, bnchmrk in enumerate(benchmarks):
         if args.db != 'both':
-            if args.db == 'mysql' and bnchmrk[0] != "MySQL":
+            if args.db == 'mysql' and not bnchmrk[0].startswith("MySQL"):
                 continue
-            if args.db == 'pg' and bnchmrk[0] != "Postgis":
+            if args.db == 'pg' and not bnchmrk[0].startswith("Postgis"):
                 continue
         logger.info(f"Starting benchmark {idx+1}")
-        bnchmrk[2].run()
-        logger.info(f"Benchmark times: {bnchmrk[2].get_time_measurements()}")
-        logger.info(f"Benchmark average time: {bnchmrk[2].get_average_time()}")
-        benchmark_data[bnchmrk[0]][bnchmrk[1]] = bnchmrk[2].get_average_time()
+        insertion_benchmark = bnchmrk[2].create()
+        insertion_benchmark.run()
+        insertion_benchmark.close()
+        logger.info(f"Benchmark times: {insertion_benchmark.get_time_measurements()}")
+        logger.info(f"Benchmark average time: {insertion_benchmark.get_average_time()}")
+        benchmark_data[bnchmrk[0]][bnchmrk[1]] = insertion_benchmark.get_average_time()
 
     # Save raw benchmark data to file
     output_file = "data_insertion_benchmark"
@@ -0,0 +1,124 @@
+import logging
+import time
+import json
+import os
+import shlex
+import sys
+import argparse
+import subprocess
+from util.benchmark_helpers import init, cleanup, recreate_containers
+from util.experiment_planner import load_matrix, expand_matrix, plan, get_naive_reload_count
+from util.index_manager import create_index_manager, get_dataset_tables
+
+"""
+Runs an experiment matrix (backend x index type x CRS x parallelism x mode) with as few database reloads
+as possible. Runs that share a loaded state are grouped, the datasets are loaded once and only the indexes are switched
+between groups, and the benchmark scripts are run against the loaded databases without --init and --cleanup.
+"""
+
+parser = argparse.ArgumentParser(description='Process some integers.')
+parser.add_argument('--matrix', dest='matrix', action='store', default=None,
+                    help='JSON file with standalone steps, runs and plots (default: the steps of run.sh)')
+parser.add_argument('--dry-run', dest='dry_run', action='store_const', const=True, default=False,
+                    help='Only print the plan')
+parser.add_argument('--no-standalone', dest='standalone', action='store_const', const=False, default=True,
+                    help='Skip the benchmarks that manage their own containers')
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_step(command_args, log_name):
+    """Runs a script with the current Python interpreter and returns (exit code, seconds)"""
+    os.makedirs("results/logs", exist_ok=True)
+    logger.info(f"Running {' '.join(command_args)}")
+    start = time.perf_counter()
+    with open(f"results/logs/{log_name}.log", 'w') as log_file:
+        returncode = subprocess.call([sys.executable] + command_args,
+                                     stdout=log_file, stderr=subprocess.STDOUT)
+    duration = time.perf_counter() - start
+    if returncode != 0:
+        logger.warning(f"{' '.join(command_args)} failed with code {returncode}")
+    return returncode, duration
+
+
+def main():
+    matrix = load_matrix(args.matrix)
+    runs = expand_matrix(matrix["runs"])
+    steps = plan(runs)
+
+    reload_count = sum(len(reloads) for _, reloads, _ in steps)
+    switch_count = sum(len(switches) for _, _, switches in steps)
+    logger.info(
+        f"{len(runs)} runs in {len(steps)} loads: {reload_count} database loads and {switch_count} index switches "
+        f"instead of {get_naive_reload_count(runs)} database loads")
+    for idx, (load, reloads, switches) in enumerate(steps):
+        logger.info(
+            f"Load {idx}: mysql_index={load.states['mysql']} pg_index={load.states['pg']} gcs={load.import_gcs()} "
+            f"reload={','.join(reloads) or 'none'} switch_index={','.join(switches) or 'none'}")
+        for run in load.get_ordered_runs():
+            logger.info(f"    {run}")
+    if args.dry_run:
+        return
+
+    report = {"standalone": [], "runs": [], "plots": [], "loads": []}
+    if args.standalone:
+        for idx, command in enumerate(matrix["standalone"]):
+            returncode, duration = run_step(shlex.split(command), f"standalone_{idx}")
+            report["standalone"].append(
+                {"command": command, "returncode": returncode, "time": duration})
+
+    parallel = None
+    gcs_loaded = {}
+    try:
+        for idx, (load, reloads, switches) in enumerate(steps):
+            start = time.perf_counter()
+            ordered_runs = load.get_ordered_runs()
+            for backend in reloads:
+                first_run = next(run for run in ordered_runs if run.uses(backend))
+                cleanup(db=backend)
+                # MySQL is imported with its index so that it can be dropped and built in place, see MysqlIndexManager
+                init(create_spatial_index=True, import_gcs=load.import_gcs(),
+                     postgis_index=load.states["pg"] or "GIST",
+                     parallel_query_execution=first_run.parallel, db=backend)
+                gcs_loaded[backend] = load.import_gcs()
+                if backend == 'pg':
+                    parallel = first_run.parallel
+                if backend == 'mysql' and not load.states["mysql"]:
+                    switches = switches + [backend]
+            for backend in switches:
+                manager = create_index_manager(
+                    backend, get_dataset_tables(import_gcs=gcs_loaded[backend]))
+                try:
+                    manager.switch(load.states[backend])
+                finally:
+                    manager.close()
+            report["loads"].append({"reloads": reloads, "index_switches": switches,
+                                    "time": time.perf_counter() - start})
+
+            for run in ordered_runs:
+                if run.uses('pg') and parallel is not None and run.parallel != parallel:
+                    # Only the server settings change, the data volume is kept
+                    recreate_containers(parallel_query_execution=run.parallel, db='pg')
+                if run.uses('pg'):
+                    parallel = run.parallel
+                returncode, duration = run_step(run.get_args(), f"run_{len(report['runs'])}")
+                report["runs"].append({"command": str(run), "load": idx,
+                                       "returncode": returncode, "time": duration})
+    finally:
+        cleanup()
+
+    for idx, command in enumerate(matrix["plots"]):
+        returncode, duration = run_step(shlex.split(command), f"plot_{idx}")
+        report["plots"].append({"command": command, "returncode": returncode, "time": duration})
+
+    with open("results/experiment_plan.json", 'w') as file:
+        file.write(json.dumps(report, indent=4))
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    end = time.perf_counter()
+    logger.info(f"Total benchmark time: {(end-start)/60} minutes")
@@ -1,46 +1,207 @@
 import os
+import re
 from pathlib import Path
-import shutil
+import threading
+import time
 import docker
 import logging
 from docker.types import Mount
+from util import instance
+
+
+# Label of the long-lived worker containers, so a leftover one-off container with the same name is replaced
+WORKER_LABEL = "sdb.gdal_worker"
+# Commands that may run in the worker container at the same time
+MAX_CONCURRENT_COMMANDS = int(os.environ.get("SDB_GDAL_JOBS", "4"))
+# ogr2ogr driver, file extension and options of the formats datasets can be converted to.
+# FlatGeobuf needs one geometry type per layer (and gets its packed R-tree), so mixed single and
+# multi geometries are promoted as import_to_postgis does. GeoParquet needs GDAL built with Arrow (3.5+).
+DATASET_FORMATS = {
+    "GeoPackage": ("GPKG", "gpkg", "-lco FID=OBJECTID"),
+    "FlatGeobuf": ("FlatGeobuf", "fgb", "-nlt PROMOTE_TO_MULTI -lco SPATIAL_INDEX=YES"),
+    "GeoParquet": ("Parquet", "parquet", ""),
+}
+# Reads every feature of a layer with the GDAL Python bindings of the image (geometry as WKB and every field)
+# and prints the feature count and the seconds spent, excluding the start of the interpreter
+READ_SCRIPT = """
+import sys, time
+from osgeo import ogr
+start = time.perf_counter()
+layer = ogr.Open(sys.argv[1]).GetLayer()
+count = 0
+for feature in layer:
+    geometry = feature.GetGeometryRef()
+    if geometry is not None:
+        geometry.ExportToWkb()
+    for idx in range(feature.GetFieldCount()):
+        feature.GetField(idx)
+    count += 1
+print(count, time.perf_counter() - start)
+"""
 
 
 class GdalDockerWrapper:
+    """Runs GDAL commands in one warm container per instance (kept running with sleep infinity)
+    through exec_run, instead of creating and removing a container for every command"""
     _logger = logging.getLogger(__name__)
+    # Shared by all wrappers of this process, by container name
+    _command_slots = {}
+    _lock = threading.Lock()
 
-    def __init__(self, docker_client):
+    def __init__(self, docker_client, resource_limits=None):
+        """resource_limits is an optional util.docker_resources.ResourceLimits"""
         self.docker_client = docker_client
+        self.resource_limits = resource_limits if resource_limits is not None else instance.get_resource_limits()
         self.image_name = "osgeo/gdal"
-        self.container_name = "gdal"
+        self.container_name = instance.get_container_name("gdal")
         self.gdal_data_folder = "/data"
         self.dataset_folder = os.getcwd() + '/datasets'
+        self.container = None
+        # Seconds spent starting the worker container and in the last command, see run_command
+        self.time_to_start = None
+        self.last_command_time = None
+        self.last_exit_code = None
+
+    def get_resource_kwargs(self):
+        if self.resource_limits is None:
+            return {}
+        return self.resource_limits.to_docker_kwargs()
+
+    def get_data_mount(self):
+        return Mount(self.gdal_data_folder,
+                     self.dataset_folder, type='bind', read_only=False)
+
+    def start_container(self):
+        """Starts the worker container, or reuses the running one"""
+        with GdalDockerWrapper._lock:
+            if self.container_name not in GdalDockerWrapper._command_slots:
+                GdalDockerWrapper._command_slots[self.container_name] = threading.BoundedSemaphore(
+                    MAX_CONCURRENT_COMMANDS)
+            if self.container is not None:
+                return
+            start = time.perf_counter()
+            try:
+                container = self.docker_client.containers.get(
+                    self.container_name)
+                if WORKER_LABEL not in container.labels:
+                    GdalDockerWrapper._logger.info(
+                        "Removing leftover GDAL docker container")
+                    container.remove(force=True)
+                    container = None
+            except docker.errors.NotFound:
+                container = None
+            if container is None:
+                GdalDockerWrapper._logger.info(
+                    "Creating GDAL worker docker container")
+                container = self.docker_client.containers.run(self.image_name,
+                                                              "sleep infinity",
+                                                              name=self.container_name,
+                                                              labels=[WORKER_LABEL],
+                                                              mounts=[self.get_data_mount()],
+                                                              detach=True,
+                                                              network_mode='host',
+                                                              **self.get_resource_kwargs())
+            elif container.status != "running":
+                container.start()
+            self.container = container
+            self.time_to_start = time.perf_counter() - start
 
-    def run_command(self, cmd):
-        data_mount = Mount(self.gdal_data_folder,
-                           self.dataset_folder, type='bind', read_only=False)
+    def remove_container(self):
+        with GdalDockerWrapper._lock:
+            try:
+                self.docker_client.containers.get(
+                    self.container_name).remove(force=True)
+                GdalDockerWrapper._logger.info(
+                    "Removed GDAL worker docker container")
+            except docker.errors.NotFound:
+                pass
+            self.container = None
+
+    def run_command(self, cmd, check=False):
+        """Runs cmd in the worker container and returns its stdout, or its stderr if it failed.
+        With check a failed command raises a RuntimeError instead; use it wherever commands may run
+        in parallel on the same wrapper, since last_exit_code is shared by them."""
+        self.start_container()
+        with GdalDockerWrapper._command_slots[self.container_name]:
+            start = time.perf_counter()
+            try:
+                exit_code, (stdout, stderr) = self.container.exec_run(
+                    cmd, demux=True)
+            except docker.errors.NotFound:
+                # Removed by another wrapper (e.g. by cleanup), start a new one
+                self.container = None
+                self.start_container()
+                start = time.perf_counter()
+                exit_code, (stdout, stderr) = self.container.exec_run(
+                    cmd, demux=True)
+            self.last_command_time = time.perf_counter() - start
+        self.last_exit_code = exit_code
+        if exit_code != 0:
+            if check:
+                raise RuntimeError(f"{cmd} failed with exit code {exit_code}: {(stderr or b'').decode('utf-8')}")
+            return (stderr or b"").decode("utf-8")
+        return (stdout or b"").decode("utf-8")
+
+    def run_command_in_new_container(self, cmd):
+        """Runs cmd in a container created for it and removed afterwards, as every command used to be"""
         try:
             cmd_output = self.docker_client.containers.run(self.image_name,
                                                            cmd,
-                                                           name=self.container_name,
-                                                           mounts=[data_mount],
+                                                           mounts=[self.get_data_mount()],
                                                            remove=True,
-                                                           network_mode='host')
+                                                           network_mode='host',
+                                                           **self.get_resource_kwargs())
             return cmd_output.decode("utf-8")
         except docker.errors.ContainerError as e:
             return e.stderr.decode("utf-8")
 
-    def project_dataset(self, source, dest, srs="EPSG:3857"):
+    def measure_overhead(self, repeat_count=5):
+        """Average seconds to run a no-op command in a new container and in the worker container,
+        i.e. the container overhead included in the time of a command"""
+        self.start_container()
+        new_container_times = []
+        exec_times = []
+        for _ in range(repeat_count):
+            start = time.perf_counter()
+            self.run_command_in_new_container("true")
+            new_container_times.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            self.run_command("true")
+            exec_times.append(time.perf_counter() - start)
+        return {"worker_start": self.time_to_start,
+                "new_container": sum(new_container_times) / repeat_count,
+                "exec": sum(exec_times) / repeat_count}
+
+    def get_feature_count(self, source):
+        """Number of features in a dataset relative to the datasets folder, as reported by ogrinfo"""
+        output = self.run_command(
+            f"ogrinfo -so -al {self.gdal_data_folder}/{source}")
+        match = re.search(r"Feature Count: (\d+)", output)
+        if match is None:
+            raise ValueError(f"Could not read the feature count of {source}: {output}")
+        return int(match.group(1))
+
+    def measure_read_time(self, source):
+        """Reads a dataset relative to the datasets folder with GDAL in the worker container,
+        returns (feature count, seconds)"""
+        output = self.run_command(
+            ["python3", "-c", READ_SCRIPT, f"{self.gdal_data_folder}/{source}"], check=True)
+        count, seconds = output.split()
+        return int(count), float(seconds)
+
+    def project_dataset(self, source, dest, srs="EPSG:3857", check=False):
         """ source and dest should be relative the datasets folder
             srs is a projection such as EPSG:3857 (Web Mercator; https://epsg.io/3857)
                 or ESRI:102009 (North America Lambert Conformal Conic; http://epsg.io/102009)
+            check raises a RuntimeError if ogr2ogr fails, see run_command
         """
 
-        # Delete and recreate destination directory
-        dataset_dest_dir = Path(f"{self.dataset_folder}/{dest}").parent
-        if dataset_dest_dir.exists():
-            shutil.rmtree(str(dataset_dest_dir))
-        dataset_dest_dir.mkdir(parents=True)
+        # Delete the previous files of the destination layer only, other layers in the
+        # destination directory may be projected at the same time
+        dataset_dest = Path(f"{self.dataset_folder}/{dest}")
+        dataset_dest.parent.mkdir(parents=True, exist_ok=True)
+        for layer_file in dataset_dest.parent.glob(f"{dataset_dest.stem}.*"):
+            layer_file.unlink()
 
         cmd = f"""ogr2ogr
             -f 'ESRI Shapefile' {self.gdal_data_folder}/{dest}
@@ -48,11 +209,34 @@ class GdalDockerWrapper:
             -overwrite
             -t_srs {srs}"""  # ESRI:102009
         GdalDockerWrapper._logger.info(cmd)
-        return self.run_command(cmd)
+        return self.run_command(cmd, check=check)
+
+    def convert_dataset(self, source, dest, output_format, check=False):
+        """ source and dest should be relative the datasets folder
+            output_format is a key of DATASET_FORMATS
+            check raises a RuntimeError if ogr2ogr fails, see run_command
+        """
+        driver, _, options = DATASET_FORMATS[output_format]
+        # Unlike shapefiles these formats are single files, ogr2ogr -overwrite would only replace the layer
+        dataset_dest = Path(f"{self.dataset_folder}/{dest}")
+        dataset_dest.parent.mkdir(parents=True, exist_ok=True)
+        if dataset_dest.exists():
+            dataset_dest.unlink()
+
+        cmd = f"""ogr2ogr
+            -f {driver} {self.gdal_data_folder}/{dest}
+            {self.gdal_data_folder}/{source}
+            {options}"""
+        GdalDockerWrapper._logger.info(cmd)
+        return self.run_command(cmd, check=check)
 
-    def import_to_mysql(self, source, table_name, create_spatial_index=True, schema_name="SpatialDatasets", host="127.0.0.1", port=3306, user="root", password="root-password"):
+    def import_to_mysql(self, source, table_name, create_spatial_index=True, schema_name="SpatialDatasets", host="127.0.0.1", port=None, user="root", password="root-password",
+                        group_transactions=None):
         """ source should be relative to the datasets folder
+            group_transactions is the number of features per transaction (-gt), e.g. 1000 or "unlimited"
         """
+        if port is None:
+            port = instance.MYSQL_PORT
 
         cmd = f"""ogr2ogr
             -f MySQL MySQL:{schema_name},host={host},port={port},user={user},password={password}
@@ -62,17 +246,24 @@ class GdalDockerWrapper:
             -lco FID=OBJECTID"""
         if not create_spatial_index:
             cmd += " -lco SPATIAL_INDEX=NO"
+        if group_transactions is not None:
+            cmd += f" -gt {group_transactions}"
         GdalDockerWrapper._logger.info(cmd)
         return self.run_command(cmd)
 
     def import_to_postgis(self, source, table_name,
                           create_spatial_index="GIST",
                           schema_name="spatialdatasets",
-                          host="127.0.0.1", port=5432, user="postgres", password="root-password",
-                          gcs_type="geometry"
+                          host="127.0.0.1", port=None, user="postgres", password="root-password",
+                          gcs_type="geometry",
+                          group_transactions=None, use_copy=None, promote_to_multi=True
                           ):
         """ source should be relative to the datasets folder
+            group_transactions is the number of features per transaction (-gt), e.g. 1000 or "unlimited"
+            use_copy ("YES"/"NO") sets PG_USE_COPY, None keeps the driver default
         """
+        if port is None:
+            port = instance.POSTGIS_PORT
         # create_spatial_index = {"NONE", "GIST" (default), "SPGIST", "BRIN"}
         # gcs_type = {"geometry", "geography"}
         if not create_spatial_index:
@@ -82,12 +273,16 @@ class GdalDockerWrapper:
             -f PostgreSQL PG:"dbname='{schema_name}' host='{host}' port='{port}' user='{user}' password='{password}'"
             {self.gdal_data_folder}/{source}
             -nln {table_name}
-            -nlt PROMOTE_TO_MULTI
+            {"-nlt PROMOTE_TO_MULTI" if promote_to_multi else ""}
             -overwrite
             -lco FID=OBJECTID
             -lco SPATIAL_INDEX={create_spatial_index}
             -lco GEOM_TYPE={gcs_type}
             -lco GEOMETRY_NAME=wkb_geometry
             -lco DIM=2"""
+        if group_transactions is not None:
+            cmd += f" -gt {group_transactions}"
+        if use_copy is not None:
+            cmd += f" --config PG_USE_COPY {use_copy}"
         GdalDockerWrapper._logger.info(cmd)
         return self.run_command(cmd)
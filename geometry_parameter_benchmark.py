@@ -0,0 +1,87 @@
+import logging
+import time
+import json
+import argparse
+from benchmark.suites import QUERY_GEOMETRY_BENCHMARKS, create_benchmark_spec
+from plotting.bar_chart import create_bar_chart, is_censored
+from util.benchmark_helpers import init, cleanup, start_container, save_benchmark_data, run_benchmarks
+from util.checkpoint import Checkpoint
+
+"""
+Benchmark for passing query geometries as WKT literals in the SQL text
+against binding them as WKB parameters
+"""
+
+parser = argparse.ArgumentParser(description='Process some integers.')
+parser.add_argument('--init', dest='init', action='store_const', const=True, default=False,
+                    help='Create schemas if necessary and load datasets')
+parser.add_argument('--cleanup', dest='cleanup', action='store_const', const=True, default=False,
+                    help='Remove docker containers and volumes')
+parser.add_argument('--no-pcs', dest='pcs', action='store_const', const=False, default=True,
+                    help='Use the datasets in the geographic coordinate system')
+parser.add_argument('--db', dest='db', action='store', default='both',
+                    help='Select DB (both/mysql/pg)')
+parser.add_argument('--resume', dest='resume', action='store_const', const=True, default=False,
+                    help='Skip benchmarks completed by a previous interrupted run')
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    if args.init:
+        logger.info("Initing DB")
+        init(import_gcs=not args.pcs, db=args.db)
+    else:
+        logger.info("Reusing existing DB")
+        start_container(db=args.db)
+
+    dbs = ['mysql', 'pg'] if args.db == 'both' else [args.db]
+    db_group_names = {"mysql": "MySQL", "pg": "Postgis"}
+    modes = [("WKT Literal", False), ("WKB Parameter", True)]
+
+    benchmarks = []
+    for db in dbs:
+        for mode_name, use_wkb_parameters in modes:
+            for name in QUERY_GEOMETRY_BENCHMARKS:
+                benchmarks.append((f"{db_group_names[db]} ({mode_name})", name,
+                                   create_benchmark_spec(db, name, use_projected_crs=args.pcs,
+                                                         use_wkb_parameters=use_wkb_parameters)))
+
+    output_file = "geometry_parameter_benchmark"
+    if not args.pcs:
+        output_file += '_gcs'
+
+    checkpoint = Checkpoint(f"{output_file}_{args.db}", resume=args.resume)
+    benchmark_data = run_benchmarks(benchmarks, checkpoint,
+                                    on_retry=lambda: start_container(db=args.db),
+                                    compact_results=True)
+    benchmark_data = save_benchmark_data(output_file, benchmark_data)
+    checkpoint.remove()
+
+    # Time of the WKT literal query relative to the WKB parameter query
+    speedup = {}
+    for db in dbs:
+        literal_times = benchmark_data[f"{db_group_names[db]} (WKT Literal)"]
+        parameter_times = benchmark_data[f"{db_group_names[db]} (WKB Parameter)"]
+        speedup[db_group_names[db]] = dict(
+            (name, literal_times[name] / parameter_times[name]) for name in QUERY_GEOMETRY_BENCHMARKS
+            if literal_times.get(name) and parameter_times.get(name)
+            and not is_censored(literal_times[name]) and not is_censored(parameter_times[name]))
+    logger.info(f"WKB parameter speedup: {speedup}")
+    with open(f"results/{output_file}_speedup.json", 'w') as file:
+        file.write(json.dumps(speedup, indent=4))
+
+    create_bar_chart(benchmark_data, "Time to Run Query With WKT Literals and WKB Parameters",
+                     "Seconds", f"figures/{output_file}.png", yscale='log', fig_size=(15, 5))
+
+    if args.cleanup:
+        cleanup(db=args.db)
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    end = time.perf_counter()
+    logger.info(f"Total benchmark time: {(end-start)/60} minutes")
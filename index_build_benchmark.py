@@ -0,0 +1,121 @@
+import logging
+import time
+import argparse
+from benchmark import suites
+from plotting.bar_chart import create_bar_chart
+from util.benchmark_helpers import init, cleanup, start_container, save_benchmark_data, run_benchmarks
+from util.checkpoint import Checkpoint
+from util.query_timeout import parse_timeouts
+from util.index_manager import create_index_manager, get_dataset_tables
+
+"""
+Benchmark for spatial index variants built in place on a single loaded dataset.
+The datasets are loaded once; each index variant is built (and timed), the query suite is run,
+and the index is dropped again before the next variant is built.
+"""
+
+parser = argparse.ArgumentParser(description='Process some integers.')
+parser.add_argument('mode', metavar='M', type=str,
+                    choices=['join', 'analysis'],
+                    help='Constrains which benchmarks are run')
+parser.add_argument('--init', dest='init', action='store_const', const=True, default=False,
+                    help='Create schemas if necessary and load datasets')
+parser.add_argument('--cleanup', dest='cleanup', action='store_const', const=True, default=False,
+                    help='Remove docker containers and volumes')
+parser.add_argument('--no-pcs', dest='pcs', action='store_const', const=False, default=True,
+                    help='Use the geographic instead of the projected datasets')
+parser.add_argument('--db', dest='db', action='store', default='both',
+                    help='Select DB (both/mysql/pg)')
+parser.add_argument('--pg-indexes', dest='pg_indexes', action='store', default='NONE,GIST,SPGIST,BRIN',
+                    help='Comma separated postgis index variants')
+parser.add_argument('--benchmarks', dest='benchmarks', action='store', default=None,
+                    help='Comma separated benchmark names (default: the whole suite)')
+parser.add_argument('--resume', dest='resume', action='store_const', const=True, default=False,
+                    help='Skip benchmarks completed by a previous interrupted run')
+parser.add_argument('--retries', dest='retries', action='store', type=int, default=2,
+                    help='Number of times a failed benchmark is retried')
+parser.add_argument('--timeout', dest='timeout', action='store', default=None,
+                    help='Query timeout in seconds, optionally per benchmark (e.g. 600,PolygonDisjointPolygon=3600)')
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def get_variants():
+    """(db, index variant, group name) in build order"""
+    crs_suffix = ' (GCS)' if not args.pcs else ''
+    variants = []
+    if args.db != 'pg':
+        variants.append(('mysql', True, f"MySQL{crs_suffix}"))
+        variants.append(('mysql', False, f"MySQL (No Index){crs_suffix}"))
+    if args.db != 'mysql':
+        for pg_index in args.pg_indexes.split(','):
+            pg_index_name = 'No' if pg_index == 'NONE' else pg_index
+            variants.append(('pg', pg_index, f"Postgis ({pg_index_name} Index){crs_suffix}"))
+    return variants
+
+
+def main():
+    if args.init:
+        logger.info("Initing DB")
+        # MySQL is imported with its index, see MysqlIndexManager
+        init(create_spatial_index=True, import_gcs=not args.pcs,
+             postgis_index="NONE", db=args.db)
+    else:
+        logger.info("Reusing existing DB")
+        start_container(db=args.db)
+
+    names = [name for name, _, _ in suites.get_suite(args.mode)]
+    if args.benchmarks is not None:
+        names = [name for name in names if name in args.benchmarks.split(',')]
+
+    output_file = f"index_build_{args.mode}_benchmark"
+    if not args.pcs:
+        output_file += '_gcs'
+    checkpoint = Checkpoint(f"{output_file}_{args.db}", resume=args.resume)
+    tables = get_dataset_tables(use_projected_crs=args.pcs)
+
+    benchmark_data = {}
+    build_data = {}
+    index_size_data = {}
+    for db, variant, group in get_variants():
+        manager = create_index_manager(db, tables)
+        try:
+            build_data[group] = manager.switch(variant)
+            index_size_data[group] = manager.get_index_sizes()
+        finally:
+            manager.close()
+        logger.info(f"{group}: build times {build_data[group]}, index sizes {index_size_data[group]}")
+
+        benchmarks = [(group, name, suites.create_benchmark_spec(db, name, use_projected_crs=args.pcs))
+                      for name in names]
+        benchmark_data.update(run_benchmarks(benchmarks, checkpoint, retries=args.retries,
+                                             on_retry=lambda: start_container(db=args.db),
+                                             timeouts=parse_timeouts(args.timeout),
+                                             compact_results=True))
+
+    # Save raw benchmark data to file
+    save_benchmark_data(output_file, benchmark_data)
+    save_benchmark_data(f"{output_file}_build", {
+        group: {"build_time": build_data[group], "index_size": index_size_data[group]}
+        for group in build_data})
+    checkpoint.remove()
+
+    create_bar_chart(benchmark_data, "Time to Run Query",
+                     "Seconds", f"figures/{output_file}.png", yscale='log', fig_size=(15, 5))
+    indexed_groups = [group for group in build_data if build_data[group]]
+    create_bar_chart({group: build_data[group] for group in indexed_groups}, "Time to Build Spatial Index",
+                     "Seconds", f"figures/{output_file}_build.png")
+    create_bar_chart({group: index_size_data[group] for group in indexed_groups}, "Size of Spatial Index",
+                     "Megabytes", f"figures/{output_file}_index_size.png")
+
+    if args.cleanup:
+        cleanup(db=args.db)
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    end = time.perf_counter()
+    logger.info(f"Total benchmark time: {(end-start)/60} minutes")
@@ -0,0 +1,188 @@
+import logging
+import time
+import json
+import argparse
+import docker
+from benchmark import mysql_benchmarks, postgresql_benchmarks
+from benchmark.benchmark_exception import BenchmarkException
+from gdal.gdaldockerwrapper import GdalDockerWrapper
+from postgis_docker_wrapper.postgisdockerwrapper import PostgisDockerWrapper
+from plotting.bar_chart import create_bar_chart
+from util.benchmark_helpers import cleanup, start_container, expand_grid, create_mysql_schema, create_postgis_database
+from util.checkpoint import Checkpoint
+
+"""
+Benchmark for ogr2ogr import options.
+Loads each dataset into each database with a grid of ogr2ogr options and reports the load time and rows/s
+of every configuration, and the fastest configuration that loaded every feature.
+"""
+
+# The first value of each option is what the benchmarks use and is the baseline.
+# group_transactions None and use_copy None keep the ogr2ogr defaults (COPY is used for new tables).
+PG_GRID = {
+    "group_transactions": [None, 1000, 100000, "unlimited"],
+    "use_copy": [None, "NO"],
+    "index_after_load": [False, True],
+    "promote_to_multi": [True, False],
+}
+MYSQL_GRID = {
+    "group_transactions": [None, 1000, 100000, "unlimited"],
+    "index_after_load": [False, True],
+}
+
+DATASETS = {
+    "Airspaces": "airspace/Class_Airspace.shp",
+    "Airports": "airports/Airports.shp",
+    "Routes": "routes/ATS_Route.shp",
+}
+
+parser = argparse.ArgumentParser(description='Process some integers.')
+parser.add_argument('--init', dest='init', action='store_const', const=True, default=False,
+                    help='Create the schemas the datasets are loaded into')
+parser.add_argument('--cleanup', dest='cleanup', action='store_const', const=True, default=False,
+                    help='Remove docker containers and volumes')
+parser.add_argument('--db', dest='db', action='store', default='both',
+                    help='Select DB (both/mysql/pg)')
+parser.add_argument('--datasets', dest='datasets', action='store', default=None,
+                    help='Comma separated list of datasets to load (default: Airspaces,Airports,Routes)')
+parser.add_argument('--strategy', dest='strategy', action='store', default='oat',
+                    choices=['oat', 'full'],
+                    help='Vary one option at a time (oat) or run the full cartesian grid (full)')
+parser.add_argument('--grid', dest='grid', action='store', default=None,
+                    help='JSON file with {"pg": {...}, "mysql": {...}} option grids')
+parser.add_argument('--repeat', dest='repeat', action='store', type=int, default=3,
+                    help='Number of loads per dataset and configuration')
+parser.add_argument('--resume', dest='resume', action='store_const', const=True, default=False,
+                    help='Skip configurations completed by a previous interrupted sweep')
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def create_load_benchmark(db, dataset, settings):
+    table_name = f"{dataset.lower()}_ingest"
+    if db == 'mysql':
+        return mysql_benchmarks.TunedLoad(DATASETS[dataset], table_name, repeat_count=args.repeat, **settings)
+    return postgresql_benchmarks.TunedLoad(DATASETS[dataset], table_name, repeat_count=args.repeat, **settings)
+
+
+def run_configuration(db, settings, datasets, feature_counts, checkpoint):
+    """Returns {dataset: {"time", "rows", "rows_per_second", "valid"}}; a configuration is valid
+    for a dataset if ogr2ogr succeeded and every feature was loaded"""
+    measurements = {}
+    for dataset in datasets:
+        key = f"{db}/{json.dumps(settings, sort_keys=True)}/{dataset}"
+        if checkpoint.is_done(key):
+            measurements[dataset] = checkpoint.get(key)
+            continue
+        bnchmrk = create_load_benchmark(db, dataset, settings)
+        try:
+            bnchmrk.run()
+            load_time = bnchmrk.get_average_time()
+            measurements[dataset] = {
+                "time": load_time,
+                "rows": bnchmrk.loaded_row_count,
+                "rows_per_second": bnchmrk.loaded_row_count / load_time,
+                "valid": bnchmrk.loaded_row_count == feature_counts[dataset],
+            }
+            logger.info(f"{db} {dataset} with {settings}: {measurements[dataset]}")
+            checkpoint.record(key, measurements[dataset])
+        except BenchmarkException as e:
+            logger.warning(f"Benchmark Exception: {str(e)}")
+            measurements[dataset] = {"time": None, "rows": None, "rows_per_second": None, "valid": False}
+            checkpoint.record_failure(key, str(e))
+        finally:
+            bnchmrk.close()
+    return measurements
+
+
+def build_report(runs, datasets):
+    """The fastest valid configuration of each dataset and its speedup over the baseline"""
+    report = {}
+    for dataset in datasets:
+        valid_runs = [run for run in runs if run["measurements"][dataset]["valid"]]
+        if not valid_runs:
+            continue
+        best_run = min(valid_runs, key=lambda run: run["measurements"][dataset]["time"])
+        baseline_time = runs[0]["measurements"][dataset]["time"]
+        best_time = best_run["measurements"][dataset]["time"]
+        report[dataset] = {
+            "best_settings": best_run["settings"],
+            "best_time": best_time,
+            "best_rows_per_second": best_run["measurements"][dataset]["rows_per_second"],
+            "baseline_time": baseline_time,
+            "speedup": baseline_time / best_time if baseline_time else None,
+        }
+    return report
+
+
+def get_settings_label(settings, baseline):
+    changed = [f"{name}={value}" for name, value in settings.items() if value != baseline[name]]
+    return ", ".join(changed) if changed else "Baseline"
+
+
+def main():
+    grids = {"pg": PG_GRID, "mysql": MYSQL_GRID}
+    if args.grid is not None:
+        with open(args.grid, 'r') as file:
+            grids.update(json.loads(file.read()))
+
+    start_container(db=args.db)
+    if args.init:
+        logger.info("Creating schemas")
+        if args.db != 'pg':
+            create_mysql_schema()
+        if args.db != 'mysql':
+            create_postgis_database(PostgisDockerWrapper(docker.from_env())).close()
+
+    datasets = list(DATASETS) if args.datasets is None else args.datasets.split(',')
+    gdal_docker_wrapper = GdalDockerWrapper(docker.from_env())
+    feature_counts = dict((dataset, gdal_docker_wrapper.get_feature_count(DATASETS[dataset]))
+                          for dataset in datasets)
+    logger.info(f"Feature counts: {feature_counts}")
+
+    output_file = "ingest_tuning_benchmark"
+    checkpoint = Checkpoint(f"{output_file}_{args.db}", resume=args.resume)
+
+    dbs = ['mysql', 'pg'] if args.db == 'both' else [args.db]
+    db_group_names = {"mysql": "MySQL", "pg": "Postgis"}
+    sweep_data = {}
+    report = {}
+    chart_data = {}
+    for db in dbs:
+        runs = []
+        configs = expand_grid(grids[db], args.strategy)
+        for settings in configs:
+            logger.info(f"Running {db} configuration {settings}")
+            runs.append({"settings": settings,
+                         "measurements": run_configuration(db, settings, datasets, feature_counts, checkpoint)})
+        sweep_data[db_group_names[db]] = runs
+        report[db_group_names[db]] = build_report(runs, datasets)
+        for run in runs:
+            label = f"{db_group_names[db]}: {get_settings_label(run['settings'], configs[0])}"
+            chart_data[label] = dict((dataset, measurement["rows_per_second"] or 0)
+                                     for dataset, measurement in run["measurements"].items())
+
+    with open(f"results/{output_file}.json", 'w') as file:
+        file.write(json.dumps(sweep_data, indent=4))
+    with open(f"results/{output_file}_report.json", 'w') as file:
+        file.write(json.dumps(report, indent=4))
+    checkpoint.remove()
+
+    for group_name, datasets_report in report.items():
+        for dataset, summary in datasets_report.items():
+            logger.info(
+                f"{group_name} {dataset}: best settings {summary['best_settings']} ({summary['speedup']}x)")
+    create_bar_chart(chart_data, "Rows Loaded per Second with Different ogr2ogr Options",
+                     "Rows per Second", f"figures/{output_file}.png", fig_size=(15, 5))
+
+    if args.cleanup:
+        cleanup(db=args.db)
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    end = time.perf_counter()
+    logger.info(f"Total benchmark time: {(end-start)/60} minutes")
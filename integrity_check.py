@@ -1,57 +1,202 @@
 import logging
-import docker
+import time
 import json
-import sys
 import argparse
+from concurrent.futures import ThreadPoolExecutor
 from pprint import pprint
 from benchmark import mysql_benchmarks, postgresql_benchmarks
-from mysqlutils.mysqldockerwrapper import MySqlDockerWrapper
-from mysqlutils.mysqladapter import MySQLAdapter
-from gdal.gdaldockerwrapper import GdalDockerWrapper
 from util.benchmark_helpers import start_container, init
-#TODO import postgres stuff
+from util.fingerprint import ResultFingerprint, ExternalSorter, sorted_diff, row_key
+from util.result_columns import IntegerColumns
 
-def check(bnchmrk, mysql_results, postgres_results):
-    logging.basicConfig(level=logging.INFO)
+"""
+Checks that MySQL and PostGIS return the same results for every benchmark query.
+Results are compared by fingerprint while the rows are fetched, and only when the
+fingerprints differ are both results sorted on disk and diffed.
+The MySQL and PostGIS queries of a comparison run concurrently, as do several comparisons.
+"""
+
+parser = argparse.ArgumentParser(description='Process some integers.')
+parser.add_argument('target', metavar='T', type=str, nargs='?', default=None,
+                    help="Benchmark to check, or 'all'")
+parser.add_argument('--reuse', dest='reuse', action='store_const', const=True, default=False,
+                    help='Reuse the existing containers instead of loading the datasets')
+parser.add_argument('--from-results', dest='from_results', action='store', default=None,
+                    help='Fingerprint file written by spatial_join_analysis_benchmark.py --fingerprint; '
+                         'only queries whose fingerprints differ are run again')
+parser.add_argument('--mysql-group', dest='mysql_group', action='store', default='MySQL',
+                    help='MySQL group in the fingerprint file')
+parser.add_argument('--pg-group', dest='pg_group', action='store', default='Postgis (GIST Index)',
+                    help='Postgis group in the fingerprint file')
+parser.add_argument('--spill-dir', dest='spill_dir', action='store', default=None,
+                    help='Directory for the sorted runs of the diff (default: system temp directory)')
+parser.add_argument('--jobs', dest='jobs', action='store', type=int, default=4,
+                    help='Number of comparisons run at the same time')
+parser.add_argument('--max-samples', dest='max_samples', action='store', type=int, default=20,
+                    help='Number of mismatching rows of each side kept in the report')
+parser.add_argument('--report', dest='report', action='store', default='results/integrity_report.json',
+                    help='Machine readable report of the check')
+args = parser.parse_args()
+
+
+def fingerprint_result(bnchmrk):
+    """Returns the fingerprint of the benchmark's result and the time to compute it"""
+    fingerprint = ResultFingerprint()
+    bnchmrk.set_result_handler(fingerprint.update, stream_results=True)
+    start = time.perf_counter()
+    try:
+        bnchmrk.execute()
+    finally:
+        bnchmrk.set_result_handler(None)
+    return fingerprint, time.perf_counter() - start
+
+
+def sort_externally(rows):
+    """Spills the row keys of a result to sorted runs on disk"""
+    sorter = ExternalSorter(directory=args.spill_dir)
+    sorter.update(rows)
+    return sorter
+
+
+class ResultCollector:
+    """Keeps a result as IntegerColumns, which stores ID pairs in 16 bytes per row,
+    and moves it to an ExternalSorter as soon as a row holds anything but integers"""
+
+    def __init__(self):
+        self.columns = IntegerColumns()
+        self.sorter = None
+
+    def update(self, rows):
+        if self.sorter is not None:
+            self.sorter.update(rows)
+            return
+        self.columns.update(rows)
+        if not self.columns.is_compact():
+            self.spill()
+
+    def spill(self):
+        if self.sorter is None:
+            self.sorter = sort_externally(self.columns)
+            self.columns = None
+
+    def close(self):
+        if self.sorter is not None:
+            self.sorter.close()
+
+
+def collect_result(bnchmrk):
+    collector = ResultCollector()
+    bnchmrk.set_result_handler(collector.update, stream_results=True)
+    try:
+        bnchmrk.execute()
+    except Exception:
+        collector.close()
+        raise
+    finally:
+        bnchmrk.set_result_handler(None)
+    return collector
+
+
+def diff_results(mysql_bnchmrk, postgres_bnchmrk, side_executor):
+    """Sorted-merge diff of both results. Both queries run at the same time.
+    Integer results are sorted in memory, anything else is compared by row key on disk."""
+    futures = [side_executor.submit(collect_result, bnchmrk)
+               for bnchmrk in (mysql_bnchmrk, postgres_bnchmrk)]
+    try:
+        collectors = [future.result() for future in futures]
+        if all(collector.sorter is None for collector in collectors):
+            diff = sorted_diff(collectors[0].columns.iter_sorted(), collectors[1].columns.iter_sorted(),
+                               max_samples=args.max_samples)
+            for side in ("samples_a", "samples_b"):
+                diff[side] = [row_key(row) for row in diff[side]]
+        else:
+            for collector in collectors:
+                collector.spill()
+            diff = sorted_diff(iter(collectors[0].sorter), iter(collectors[1].sorter),
+                               max_samples=args.max_samples)
+    finally:
+        for future in futures:
+            if future.exception() is None:
+                future.result().close()
+    return {"only_mysql": diff["only_a"], "only_postgres": diff["only_b"],
+            "mysql_samples": diff["samples_a"], "postgres_samples": diff["samples_b"]}
+
+
+def check(bnchmrk, mysql_bnchmrk, postgres_bnchmrk, side_executor, fingerprints=None):
+    """Compares the results of one benchmark and returns its report entry.
+    fingerprints are the (mysql, postgres) fingerprints of an earlier run, computed now if missing."""
     logger = logging.getLogger(__name__)
+    start = time.perf_counter()
+    entry = {"status": "ok"}
 
-    compare_results = list(set(mysql_results) | set(postgres_results))
-    if len(compare_results) == len(mysql_results):
-        logger.info(f"{bnchmrk} integrity: OK")
-        return None
+    if fingerprints is None:
+        mysql_future = side_executor.submit(fingerprint_result, mysql_bnchmrk)
+        postgres_future = side_executor.submit(
+            fingerprint_result, postgres_bnchmrk)
+        mysql_fingerprint, entry["mysql_time"] = mysql_future.result()
+        postgres_fingerprint, entry["postgres_time"] = postgres_future.result()
     else:
-        diff_results = list((set(mysql_results) - set(postgres_results)) | (set(postgres_results) - set(mysql_results)))
-        logger.info(f"{bnchmrk} integrity: FAIL on {diff_results}")
-        return (bnchmrk, diff_results)
-    
+        mysql_fingerprint, postgres_fingerprint = fingerprints
+    entry["mysql_rows"] = mysql_fingerprint.count
+    entry["postgres_rows"] = postgres_fingerprint.count
+    entry["mysql_fingerprint"] = mysql_fingerprint.to_dict()
+    entry["postgres_fingerprint"] = postgres_fingerprint.to_dict()
 
-def main():
-    logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger(__name__)
+    if mysql_fingerprint == postgres_fingerprint:
+        logger.info(
+            f"{bnchmrk} integrity: OK ({mysql_fingerprint.count} rows)")
+    else:
+        logger.info(
+            f"{bnchmrk} fingerprints differ: {mysql_fingerprint} {postgres_fingerprint}, diffing results")
+        diff_start = time.perf_counter()
+        entry["diff"] = diff_results(
+            mysql_bnchmrk, postgres_bnchmrk, side_executor)
+        entry["diff_time"] = time.perf_counter() - diff_start
+        # Without a difference the stored fingerprints came from an earlier run and the data has changed since
+        if entry["diff"]["only_mysql"] or entry["diff"]["only_postgres"]:
+            entry["status"] = "fail"
+            logger.info(f"{bnchmrk} integrity: FAIL on {entry['diff']}")
+        else:
+            logger.info(f"{bnchmrk} integrity: OK")
+    entry["total_time"] = time.perf_counter() - start
+    return entry
 
-    #docker_client = docker.from_env()
-    #mysql_docker = MySqlDockerWrapper(docker_client)
-    #mysql_docker.start_container()
 
+def check_safely(bnchmrk, benchmarks, side_executor, fingerprints):
+    logger = logging.getLogger(__name__)
+    logger.info(f"Starting Integrity Check for {bnchmrk}")
+    try:
+        return check(bnchmrk, benchmarks[bnchmrk][0], benchmarks[bnchmrk][1],
+                     side_executor, fingerprints)
+    except Exception as e:
+        logger.exception(f"{bnchmrk} integrity: ERROR")
+        return {"status": "error", "error": str(e)}
 
 
-    # For debugging
-    # mysql_docker.stop_container()
-    # mysql_docker.remove_container()
-    # mysql_docker.remove_volume()
+def load_fingerprints(path):
+    """Returns {benchmark: (mysql fingerprint, postgres fingerprint)} for the benchmarks in both groups"""
+    with open(path, 'r') as file:
+        data = json.loads(file.read())
+    mysql_data = data.get(args.mysql_group, {})
+    postgres_data = data.get(args.pg_group, {})
+    return dict((name, (ResultFingerprint.from_dict(mysql_data[name]),
+                        ResultFingerprint.from_dict(postgres_data[name])))
+                for name in mysql_data if name in postgres_data)
 
-    #mysql_docker.start_container()
 
-    # Create mysql schema
+def main():
+    logging.basicConfig(level=logging.INFO)
+    logger = logging.getLogger(__name__)
 
-    if True:
-        init()
-    else:
-        start_container()
+    if args.target is None:
+        logger.info(f"Please specify target query/queries or 'all'")
+        return
 
-    # Create postgres schema
+    if args.reuse:
+        start_container()
+    else:
+        init()
 
-    #TODO insert postgres queries, as benchmarks[][1]
     benchmarks = {
         "PointEqualsPoint": [mysql_benchmarks.PointEqualsPoint(), postgresql_benchmarks.PointEqualsPoint()],
         "PointIntersectsLine": [mysql_benchmarks.PointIntersectsLine(), postgresql_benchmarks.PointIntersectsLine()],
@@ -80,35 +225,39 @@ def main():
         "SingleLineIntersectsPolygon": [mysql_benchmarks.SingleLineIntersectsPolygon(), postgresql_benchmarks.SingleLineIntersectsPolygon()],
     }
 
-    # test all arg
-    if len(sys.argv) > 1 and sys.argv[1] == "all":
-        fails = []
-        for bnchmrk in benchmarks:
-            logger.info(f"Starting benchmark {bnchmrk}")
-            mysql_results = benchmarks[bnchmrk][0].execute()
-            postgres_results = benchmarks[bnchmrk][1].execute()
-            retval = check(bnchmrk, mysql_results, postgres_results)
-            if retval is not None:
-                fails.append(retval)
-        print("---fails--")
-        pprint(fails)
-    
-    #test single arg
-    elif len(sys.argv) > 1 and benchmarks[sys.argv[1]] != None: 
-        logger.info(f"Starting Integrity Check for {sys.argv[1]}")
-        mysql_results = benchmarks[sys.argv[1]][0].execute()
-        postgres_results = benchmarks[sys.argv[1]][1].execute()
-        check(sys.argv[1], mysql_results, postgres_results)
+    stored_fingerprints = {}
+    if args.from_results is not None:
+        stored_fingerprints = load_fingerprints(args.from_results)
 
-    else:
-        logger.info(f"Please specify target query/queries or 'all'")
+    targets = list(benchmarks) if args.target == "all" else [args.target]
+    start = time.perf_counter()
+    # Comparisons run in one pool and the MySQL and PostGIS queries of each comparison in another,
+    # so that a comparison waiting for its queries never blocks them
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor, \
+            ThreadPoolExecutor(max_workers=2 * args.jobs) as side_executor:
+        futures = dict((bnchmrk, executor.submit(check_safely, bnchmrk, benchmarks, side_executor,
+                                                 stored_fingerprints.get(bnchmrk)))
+                       for bnchmrk in targets)
+        results = dict((bnchmrk, future.result())
+                       for bnchmrk, future in futures.items())
+    wall_time = time.perf_counter() - start
 
-    #Cleanup
-    #mysql_docker.stop_container()
-    #mysql_docker.remove_container()
-    #mysql_docker.remove_volume()
-    #TODO cleanup postgres docker stuff
+    report = {
+        "wall_time": wall_time,
+        "jobs": args.jobs,
+        "failed": [bnchmrk for bnchmrk, entry in results.items() if entry["status"] == "fail"],
+        "errors": [bnchmrk for bnchmrk, entry in results.items() if entry["status"] == "error"],
+        "benchmarks": results,
+    }
+    with open(args.report, 'w') as file:
+        file.write(json.dumps(report, indent=4))
 
-if __name__ == "__main__":
+    fails = [(bnchmrk, results[bnchmrk].get("diff", results[bnchmrk].get("error")))
+             for bnchmrk in report["failed"] + report["errors"]]
+    print("---fails--")
+    pprint(fails)
+    logger.info(f"Integrity check took {wall_time} seconds, report written to {args.report}")
 
+
+if __name__ == "__main__":
     main()
@@ -0,0 +1,82 @@
+import logging
+import time
+import json
+import argparse
+from benchmark import micro_benchmarks
+from plotting.bar_chart import create_bar_chart
+
+"""
+Micro benchmarks of client side code paths. Reports the time per item (e.g. per point)
+and the speedup over the first benchmark of the suite.
+"""
+
+parser = argparse.ArgumentParser(description='Process some integers.')
+parser.add_argument('suite', metavar='S', type=str,
+                    choices=['transform', 'row_conversion', 'shapefile_airspace', 'shapefile_routes'],
+                    help='Micro benchmark suite to run')
+parser.add_argument('--size', dest='size', action='store', type=int, default=100000,
+                    help='Number of items processed by each benchmark (the shapefile suites read the whole layer)')
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SHAPEFILE_LAYERS = {
+    "shapefile_airspace": "airspace/Class_Airspace.shp",
+    "shapefile_routes": "routes/ATS_Route.shp",
+}
+
+
+def get_suite(suite, size):
+    if suite == 'transform':
+        # Creating a transformer per point is slow, so it runs on fewer points
+        return [
+            micro_benchmarks.TransformNewTransformer(
+                point_count=max(1, size // 100)),
+            micro_benchmarks.TransformCachedTransformer(point_count=size),
+            micro_benchmarks.TransformVectorized(point_count=size),
+        ]
+    if suite == 'row_conversion':
+        return [
+            micro_benchmarks.RowConversionLegacy(row_count=size),
+            micro_benchmarks.RowConversionSqlValues(row_count=size),
+            micro_benchmarks.RowConversionCopyText(row_count=size),
+            micro_benchmarks.RowConversionCopyBinary(row_count=size),
+        ]
+    if suite in SHAPEFILE_LAYERS:
+        return [
+            micro_benchmarks.ShapefileReadGdal(SHAPEFILE_LAYERS[suite]),
+            micro_benchmarks.ShapefileReadMmap(SHAPEFILE_LAYERS[suite]),
+        ]
+    return []
+
+
+def main():
+    benchmarks = get_suite(args.suite, args.size)
+
+    time_per_item = {}
+    for bnchmrk in benchmarks:
+        bnchmrk.run()
+        time_per_item[bnchmrk.title] = bnchmrk.get_average_time() / \
+            bnchmrk.get_item_count()
+        logger.info(
+            f"{bnchmrk.title}: {time_per_item[bnchmrk.title] * 1e6} microseconds per item")
+
+    baseline = time_per_item[benchmarks[0].title]
+    speedup = dict((title, baseline / t) for title, t in time_per_item.items())
+    logger.info(f"Speedup: {speedup}")
+
+    output_file = f"micro_benchmark_{args.suite}"
+    with open(f"results/{output_file}.json", 'w') as file:
+        file.write(json.dumps({"time_per_item": time_per_item, "speedup": speedup},
+                              indent=4))
+
+    create_bar_chart({"Time per Item": time_per_item}, f"Micro Benchmark: {args.suite}",
+                     "Seconds", f"figures/{output_file}.png", yscale='log')
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    end = time.perf_counter()
+    logger.info(f"Total benchmark time: {(end-start)/60} minutes")
@@ -0,0 +1,39 @@
+import aiomysql
+from util import instance
+from util.query_timeout import QueryTimeoutException
+from mysqlutils.mysqladapter import QUERY_TIMEOUT_ERRORS
+
+
+class AsyncMySQLAdapter:
+    """asyncio counterpart of MySQLAdapter on a pool of aiomysql connections.
+    Many coroutines can await execute at the same time; each query runs on the next free connection.
+    Create it with `await AsyncMySQLAdapter.create(...)`."""
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    @staticmethod
+    async def create(user, password, host="127.0.0.1", port=None, pool_size=4):
+        if port is None:
+            port = instance.MYSQL_PORT
+        pool = await aiomysql.create_pool(host=host, port=port, user=user, password=password,
+                                          minsize=pool_size, maxsize=pool_size, connect_timeout=10)
+        return AsyncMySQLAdapter(pool)
+
+    async def execute(self, query, params=None):
+        """params are bound to the %s placeholders of the query"""
+        async with self.pool.acquire() as connection:
+            async with connection.cursor() as cursor:
+                try:
+                    await cursor.execute(query, params)
+                except aiomysql.Error as e:
+                    if e.args and e.args[0] in QUERY_TIMEOUT_ERRORS:
+                        raise QueryTimeoutException(str(e))
+                    raise e
+                if cursor.description != None:
+                    return list(await cursor.fetchall())
+                return None
+
+    async def close(self):
+        self.pool.close()
+        await self.pool.wait_closed()
@@ -1,9 +1,25 @@
 import time
 import mysql.connector
+from util import instance
+from util.query_timeout import QueryTimeoutException
+from util.misc import consume_results
+
+# Server errors for queries stopped by MAX_EXECUTION_TIME and by KILL QUERY
+QUERY_TIMEOUT_ERRORS = (3024, 1317)
 
 
 class MySQLAdapter:
-    def __init__(self, user, password, host="127.0.0.1", port="3306"):
+    def __init__(self, user, password, host="127.0.0.1", port=None):
+        if port is None:
+            port = instance.MYSQL_PORT
+        self._connect_args = dict(host=host, port=port, user=user, password=password)
+        # Called with batches of rows instead of returning the result, see consume_results
+        self.result_handler = None
+        # Same option as PostgisAdapter.stream_results; mysql.connector cursors are unbuffered,
+        # so the rows are always fetched as they arrive
+        self.stream_results = False
+        # Prepared statement cursors by query, see execute_prepared
+        self._prepared_cursors = {}
         attempt = 0
         while True:
             try:
@@ -27,16 +43,65 @@ class MySQLAdapter:
         except:
             pass
 
-    def execute(self, query):
+    def close(self):
+        for cursor in self._prepared_cursors.values():
+            cursor.close()
+        self._prepared_cursors = {}
+        self.connection.close()
+
+    def execute(self, query, params=None):
+        """params are bound to the %s placeholders of the query"""
+        return self._execute(self.connection.cursor(), query, params)
+
+    def execute_with_description(self, query, params=None):
+        """(rows, cursor description) of a query, e.g. for RowTranscoder.from_description"""
         cursor = self.connection.cursor()
-        cursor.execute(query)
-        if cursor.description != None:
-            return cursor.fetchall()
-        else:
-            return None
+        return self._execute(cursor, query, params), cursor.description
+
+    def execute_prepared(self, query, params):
+        """Runs the query as a server side prepared statement over the binary protocol.
+        The statement is prepared by the first call and reused by later calls with the same query."""
+        if query not in self._prepared_cursors:
+            self._prepared_cursors[query] = self.connection.cursor(
+                prepared=True)
+        return self._execute(self._prepared_cursors[query], query, params)
+
+    def _execute(self, cursor, query, params):
+        try:
+            cursor.execute(query, params)
+            if cursor.description != None:
+                if self.result_handler is not None:
+                    return consume_results(cursor, self.result_handler)
+                return cursor.fetchall()
+            else:
+                return None
+        except mysql.connector.Error as e:
+            if e.errno in QUERY_TIMEOUT_ERRORS:
+                raise QueryTimeoutException(str(e))
+            raise e
 
     def commit(self):
         self.connection.commit()
 
+    def rollback(self):
+        """Ends the open transaction, unless the connection is already closed"""
+        if self.connection.is_connected():
+            self.connection.rollback()
+
+    def set_statement_timeout(self, seconds):
+        """Server side time limit for the SELECT statements of this session, None disables it"""
+        milliseconds = 0 if seconds is None else int(seconds * 1000)
+        self.execute(f"SET SESSION MAX_EXECUTION_TIME = {milliseconds}")
+
+    def cancel(self):
+        """Stops the running query with KILL QUERY from a second connection"""
+        connection = mysql.connector.connect(
+            connection_timeout=10, **self._connect_args)
+        try:
+            connection.cursor().execute(
+                f"KILL QUERY {self.connection.connection_id}")
+        finally:
+            connection.close()
+
     def get_schemas(self):
         return [tuple[0] for tuple in self.execute("SHOW SCHEMAS")]
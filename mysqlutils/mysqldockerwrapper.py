@@ -1,21 +1,31 @@
 import docker
 import time
 import logging
+from util.docker_storage import DataStorage
+from util import instance
+from util.readiness import wait_until_ready, mysql_probe
 
 
 class MySqlDockerWrapper:
     _logger = logging.getLogger(__name__)
 
-    def __init__(self, docker_client):
+    def __init__(self, docker_client, resource_limits=None, storage=None):
+        """resource_limits is an optional util.docker_resources.ResourceLimits
+        storage is an optional util.docker_storage.DataStorage (default: named volume)"""
         self.docker_client = docker_client
+        self.resource_limits = resource_limits if resource_limits is not None else instance.get_resource_limits()
+        self.storage = storage if storage is not None else DataStorage()
         self.image_name = "mysql"
-        self.container_name = "mysql"
+        self.container_name = instance.get_container_name("mysql")
         self.mysql_version = "8"
         self.root_password = "root-password"
         self.container = None
-        self.volume_name = "mysqldata"
+        self.volume_name = instance.get_container_name("mysqldata")
         self.mysql_data_folder = "/var/lib/mysql"
         self.volume = None
+        self.host = "127.0.0.1"
+        self.port = instance.MYSQL_PORT
+        self.time_to_ready = None
 
         try:
             self.get_container()
@@ -31,24 +41,55 @@ class MySqlDockerWrapper:
         except docker.errors.NotFound:
             MySqlDockerWrapper._logger.info("Container not found")
 
-    def start_container(self):
+    def start_container(self, server_settings=None):
+        """server_settings is a dictionary of mysqld options such as innodb_buffer_pool_size.
+        They only take effect when a new container is created."""
+        start = time.perf_counter()
         try:
             self.container = self.docker_client.containers.get(
                 self.container_name)
+            if self.resource_limits is not None:
+                MySqlDockerWrapper._logger.info(
+                    f"Applying resource limits: {self.resource_limits}")
+                self.container.update(**self.resource_limits.to_docker_kwargs())
             self.container.start()
             MySqlDockerWrapper._logger.info(
                 "Found existing MySQL docker container")
+            if server_settings:
+                MySqlDockerWrapper._logger.warning(
+                    f"Ignoring server settings for existing container: {server_settings}")
         except docker.errors.NotFound:
             MySqlDockerWrapper._logger.info(
                 "Creating new MySQL docker container")
+            command = [f"--{name.replace('_', '-')}={value}"
+                       for name, value in (server_settings or {}).items()]
             self.container = self.docker_client.containers.run(f"{self.image_name}:{self.mysql_version}",
                                                                detach=True,
                                                                name=self.container_name,
+                                                               **self.get_resource_kwargs(),
                                                                ports={
-                                                                   '3306': 3306},
+                                                                   '3306': self.port},
                                                                environment=[
                                                                    f"MYSQL_ROOT_PASSWORD={self.root_password}"],
-                                                               volumes={self.volume_name: {'bind': self.mysql_data_folder, 'mode': 'rw'}})
+                                                               **self.storage.to_docker_kwargs(
+                                                                   self.volume_name, self.mysql_data_folder, subfolder=self.container_name),
+                                                               command=command or None)
+        self.wait_until_ready()
+        self.time_to_ready = time.perf_counter() - start
+        MySqlDockerWrapper._logger.info(
+            f"MySQL time to ready: {self.time_to_ready} seconds")
+        return self.time_to_ready
+
+    def wait_until_ready(self, timeout=300):
+        """Blocks until MySQL completes a handshake and answers a ping"""
+        # The entrypoint initializes the data directory with networking disabled
+        return wait_until_ready(lambda: mysql_probe(self.host, self.port, "root", self.root_password),
+                                "MySQL", container=self.container, timeout=timeout)
+
+    def get_resource_kwargs(self):
+        if self.resource_limits is None:
+            return {}
+        return self.resource_limits.to_docker_kwargs()
 
     def stop_container(self):
         if self.container != None:
@@ -65,6 +106,9 @@ class MySqlDockerWrapper:
             return self.container.logs()
 
     def remove_volume(self):
+        if self.storage.kind != 'volume':
+            # tmpfs disappears with the container and bind mounted host data is left in place
+            return
         try:
             volume = self.docker_client.volumes.get(self.volume_name)
             MySqlDockerWrapper._logger.info("Removing MySQL volume")
@@ -0,0 +1,223 @@
+import logging
+import time
+import json
+import os
+import shlex
+import sys
+import argparse
+import subprocess
+import threading
+from queue import Queue
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from util.checkpoint import Checkpoint
+
+"""
+Runs the steps of a benchmark script such as run.sh concurrently.
+Every benchmark job gets its own containers and ports (SDB_INSTANCE) and its own CPU cores
+(SDB_CPUSET), so independent backends and index configurations don't interfere.
+Plotting steps wait for all benchmark steps before them.
+"""
+
+parser = argparse.ArgumentParser(description='Process some integers.')
+parser.add_argument('script', metavar='S', type=str, nargs='?', default='run.sh',
+                    help='Script with one benchmark or plotting command per line')
+parser.add_argument('--jobs', dest='jobs', action='store', type=int, default=2,
+                    help='Number of jobs to run at the same time')
+parser.add_argument('--cpus-per-job', dest='cpus_per_job', action='store', type=int, default=None,
+                    help='Cores pinned to each job (default: all cores divided by the number of jobs)')
+parser.add_argument('--no-split', dest='split', action='store_const', const=False, default=True,
+                    help='Do not split runs of both databases into separate MySQL and PostGIS jobs')
+parser.add_argument('--dry-run', dest='dry_run', action='store_const', const=True, default=False,
+                    help='Only print the jobs')
+parser.add_argument('--resume', dest='resume', action='store_const', const=True, default=False,
+                    help='Skip steps completed by a previous run and resume interrupted ones')
+parser.add_argument('--retries', dest='retries', action='store', type=int, default=1,
+                    help='Number of times a failed step is retried')
+parser.add_argument('--retry-delay', dest='retry_delay', action='store', type=int, default=30,
+                    help='Seconds before the first retry, doubled for every further retry')
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Benchmarks that accept --db and --merge-results
+SPLITTABLE_BENCHMARKS = ["spatial_join_analysis_benchmark.py"]
+# Benchmarks that accept --resume
+RESUMABLE_BENCHMARKS = ["spatial_join_analysis_benchmark.py",
+                        "subsampling_benchmark.py", "config_sweep_benchmark.py"]
+
+checkpoint_lock = threading.Lock()
+
+
+class Job:
+    def __init__(self, job_id, command, is_plot, dependencies, instance_id):
+        self.job_id = job_id
+        self.command = command
+        self.is_plot = is_plot
+        self.dependencies = dependencies
+        self.instance_id = instance_id
+        self.cpuset = None
+        self.returncode = None
+        self.duration = None
+        self.attempts = 0
+
+    def is_resumable(self):
+        return any(token.endswith(name) for token in shlex.split(self.command)
+                   for name in RESUMABLE_BENCHMARKS)
+
+
+def split_command(command):
+    """Splits a run of both databases into a MySQL and a PostGIS run writing to the same results file"""
+    tokens = shlex.split(command)
+    if not args.split or '--db' in tokens or not any(token.endswith(name) for token in tokens
+                                                      for name in SPLITTABLE_BENCHMARKS):
+        return [command]
+    return [f"{command} --db mysql --merge-results", f"{command} --db pg --merge-results"]
+
+
+def parse_run_script(path):
+    jobs = []
+    benchmark_jobs = []
+    next_instance = 1
+    with open(path, 'r') as file:
+        lines = [line.strip() for line in file.readlines()]
+    for line in lines:
+        if not line or line.startswith('#') or line.startswith('set '):
+            continue
+        if 'plotting/' in line:
+            jobs.append(Job(len(jobs), line, True,
+                            [job.job_id for job in benchmark_jobs], None))
+            continue
+        for command in split_command(line):
+            dependencies = []
+            instance_id = next_instance
+            if '--init' not in shlex.split(command) and benchmark_jobs and 'data_loading' not in command:
+                # Continues from the state left by the previous benchmark
+                dependencies = [benchmark_jobs[-1].job_id]
+                instance_id = benchmark_jobs[-1].instance_id
+            else:
+                next_instance += 1
+            job = Job(len(jobs), command, False, dependencies, instance_id)
+            jobs.append(job)
+            benchmark_jobs.append(job)
+    return jobs
+
+
+def run_job(job, cpu_slots, checkpoint):
+    cpus = cpu_slots.get()
+    try:
+        env = dict(os.environ)
+        if job.instance_id is not None:
+            env["SDB_INSTANCE"] = str(job.instance_id)
+            env["SDB_CPUSET"] = f"{cpus[0]}-{cpus[-1]}"
+            job.cpuset = env["SDB_CPUSET"]
+        os.makedirs("results/logs", exist_ok=True)
+        command = job.command
+        if args.resume and job.is_resumable():
+            command += " --resume"
+        delay = args.retry_delay
+        start = time.perf_counter()
+        while True:
+            job.attempts += 1
+            logger.info(
+                f"Starting job {job.job_id} (attempt {job.attempts}): {command} ({job.cpuset})")
+            log_mode = 'a' if args.resume or job.attempts > 1 else 'w'
+            with open(f"results/logs/job_{job.job_id}.log", log_mode) as log_file:
+                process = subprocess.Popen(shlex.split(command), env=env,
+                                           stdout=log_file, stderr=subprocess.STDOUT,
+                                           preexec_fn=lambda: os.sched_setaffinity(0, cpus))
+                job.returncode = process.wait()
+            if job.returncode == 0 or job.attempts > args.retries:
+                break
+            logger.warning(
+                f"Job {job.job_id} failed with code {job.returncode}, retrying in {delay} seconds")
+            time.sleep(delay)
+            delay *= 2
+            # The retry continues where the failed attempt stopped
+            if job.is_resumable() and not command.endswith(" --resume"):
+                command += " --resume"
+        job.duration = time.perf_counter() - start
+        logger.info(
+            f"Finished job {job.job_id} in {job.duration} seconds with code {job.returncode}")
+        with checkpoint_lock:
+            if job.returncode == 0:
+                checkpoint.record(job.command, job.duration,
+                                  attempts=job.attempts)
+            else:
+                checkpoint.record_failure(
+                    job.command, f"Exit code {job.returncode}", attempts=job.attempts)
+        return job
+    finally:
+        cpu_slots.put(cpus)
+
+
+def main():
+    jobs = parse_run_script(args.script)
+    cpus_per_job = args.cpus_per_job or max(1, os.cpu_count() // args.jobs)
+    cpu_slots = Queue()
+    for slot in range(args.jobs):
+        first_cpu = (slot * cpus_per_job) % os.cpu_count()
+        cpu_slots.put(list(range(first_cpu, min(
+            first_cpu + cpus_per_job, os.cpu_count()))))
+
+    checkpoint = Checkpoint("parallel_run", resume=args.resume)
+    for job in jobs:
+        if checkpoint.is_done(job.command):
+            job.returncode = 0
+            logger.info(f"Job {job.job_id} completed by a previous run: {job.command}")
+            continue
+        logger.info(
+            f"Job {job.job_id} (instance {job.instance_id}, after {job.dependencies}): {job.command}")
+    if args.dry_run:
+        return
+
+    start = time.perf_counter()
+    pending = [job for job in jobs if not checkpoint.is_done(job.command)]
+    running = {}
+    failed = set()
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        while pending or running:
+            for job in list(pending):
+                if any(dep in failed for dep in job.dependencies):
+                    logger.warning(
+                        f"Skipping job {job.job_id} because a job it depends on failed")
+                    failed.add(job.job_id)
+                    pending.remove(job)
+                elif all(jobs[dep].returncode == 0 for dep in job.dependencies) and len(running) < args.jobs:
+                    running[executor.submit(run_job, job, cpu_slots, checkpoint)] = job
+                    pending.remove(job)
+            if not running:
+                # No job can start and none will finish: fail the rest instead of polling for them
+                for job in pending:
+                    logger.error(f"Job {job.job_id} waits for jobs that will not run")
+                    failed.add(job.job_id)
+                break
+            # Blocks until a job finishes, the loop only runs again once there is a free slot
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                job = running.pop(future)
+                future.result()
+                if job.returncode != 0:
+                    failed.add(job.job_id)
+    wall_time = time.perf_counter() - start
+
+    summary = {
+        "wall_time": wall_time,
+        "sequential_time": sum(job.duration for job in jobs if job.duration is not None),
+        "jobs": [{"command": job.command, "instance": job.instance_id, "cpuset": job.cpuset,
+                  "duration": job.duration, "returncode": job.returncode, "attempts": job.attempts}
+                 for job in jobs],
+    }
+    with open("results/parallel_run.json", 'w') as file:
+        file.write(json.dumps(summary, indent=4))
+    logger.info(
+        f"Ran {len(jobs)} jobs in {wall_time/60} minutes ({summary['sequential_time']/60} minutes of job time)")
+    if failed:
+        logger.error(
+            f"Failed jobs: {sorted(failed)}, rerun with --resume to continue")
+        sys.exit(1)
+    checkpoint.remove()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+import logging
+import time
+import json
+import argparse
+from benchmark import suites
+from benchmark.benchmark_exception import BenchmarkException
+from plotting.bar_chart import create_bar_chart
+from util.benchmark_helpers import init, cleanup, start_container, save_benchmark_data
+from util.index_manager import get_dataset_tables
+from util.query_plans import get_query_plans
+from util.table_maintenance import create_table_maintenance, run_maintenance, parse_steps
+
+"""
+Benchmark for the planner statistics gathered by the post-load maintenance stage.
+The statistics of the dataset tables are removed and the suite is run (and its query plans recorded),
+then the maintenance steps are run (and timed) and the suite is run again. The report shows for each query
+whether its plan changed and how its latency changed with fresh statistics.
+"""
+
+parser = argparse.ArgumentParser(description='Process some integers.')
+parser.add_argument('mode', metavar='M', type=str,
+                    choices=['join', 'analysis'],
+                    help='Constrains which benchmarks are run')
+parser.add_argument('--init', dest='init', action='store_const', const=True, default=False,
+                    help='Create schemas if necessary and load datasets')
+parser.add_argument('--cleanup', dest='cleanup', action='store_const', const=True, default=False,
+                    help='Remove docker containers and volumes')
+parser.add_argument('--no-pcs', dest='pcs', action='store_const', const=False, default=True,
+                    help='Use the geographic instead of the projected datasets')
+parser.add_argument('--db', dest='db', action='store', default='both',
+                    help='Select DB (both/mysql/pg)')
+parser.add_argument('--maintenance', dest='maintenance', action='store', default='analyze,histograms',
+                    help='Comma separated maintenance steps (vacuum,optimize,cluster,analyze,histograms)')
+parser.add_argument('--benchmarks', dest='benchmarks', action='store', default=None,
+                    help='Comma separated benchmark names (default: the whole suite)')
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def run_suite(db, names):
+    """{name: {"time": average seconds or None if it failed, "plans": plan summaries, None if missing}}"""
+    measurements = {}
+    for name in names:
+        bnchmrk = suites.create_benchmark(db, name, use_projected_crs=args.pcs)
+        try:
+            # The plans are captured first, the cleanup of the last run may drop what the queries need
+            bnchmrk.ensure_prepared()
+            plans = get_query_plans(db, bnchmrk)
+            bnchmrk.run()
+            measurements[name] = {"time": bnchmrk.get_average_time(), "plans": plans}
+        except BenchmarkException as e:
+            logger.warning(f"Benchmark Exception: {str(e)}")
+            measurements[name] = {"time": None, "plans": []}
+        finally:
+            bnchmrk.close()
+    return measurements
+
+
+def is_plan_changed(plans_before, plans_after):
+    """None if a plan is missing on either side"""
+    if None in plans_before or None in plans_after:
+        return None
+    return [plan["nodes"] for plan in plans_before] != [plan["nodes"] for plan in plans_after]
+
+
+def build_report(before, after):
+    report = {}
+    for name in before:
+        time_before = before[name]["time"]
+        time_after = after[name]["time"]
+        report[name] = {
+            "time_without_statistics": time_before,
+            "time_with_statistics": time_after,
+            "speedup": time_before / time_after if time_before and time_after else None,
+            "plan_changed": is_plan_changed(before[name]["plans"], after[name]["plans"]),
+            "plans_without_statistics": before[name]["plans"],
+            "plans_with_statistics": after[name]["plans"],
+        }
+    return report
+
+
+def main():
+    steps = parse_steps(args.maintenance)
+    if args.init:
+        logger.info("Initing DB")
+        # The maintenance is run and measured below
+        init(import_gcs=not args.pcs, db=args.db, maintenance=[])
+    else:
+        logger.info("Reusing existing DB")
+        start_container(db=args.db)
+
+    names = [name for name, _, _ in suites.get_suite(args.mode)]
+    if args.benchmarks is not None:
+        names = [name for name in names if name in args.benchmarks.split(',')]
+    tables = get_dataset_tables(use_projected_crs=args.pcs)
+
+    dbs = ['mysql', 'pg'] if args.db == 'both' else [args.db]
+    db_group_names = {"mysql": "MySQL", "pg": "Postgis"}
+    crs_suffix = ' (GCS)' if not args.pcs else ''
+    benchmark_data = {}
+    maintenance_data = {}
+    report = {}
+    for db in dbs:
+        group = f"{db_group_names[db]}{crs_suffix}"
+        maintenance = create_table_maintenance(db, tables)
+        try:
+            maintenance.reset_statistics()
+            before = run_suite(db, names)
+            maintenance_data[group] = run_maintenance(maintenance, steps)
+            after = run_suite(db, names)
+        finally:
+            maintenance.restore()
+            maintenance.close()
+        report[group] = build_report(before, after)
+        benchmark_data[f"{group} (No Statistics)"] = dict(
+            (name, measurement["time"] or 0) for name, measurement in before.items())
+        benchmark_data[f"{group} (Fresh Statistics)"] = dict(
+            (name, measurement["time"] or 0) for name, measurement in after.items())
+        changed = [name for name, entry in report[group].items() if entry["plan_changed"]]
+        logger.info(f"{group}: plans changed with fresh statistics for {changed}")
+
+    output_file = f"planner_statistics_{args.mode}_benchmark"
+    if not args.pcs:
+        output_file += '_gcs'
+    save_benchmark_data(output_file, benchmark_data)
+    with open(f"results/{output_file}_report.json", 'w') as file:
+        file.write(json.dumps({"maintenance_steps": steps, "maintenance_time": maintenance_data,
+                               "queries": report}, indent=4))
+
+    create_bar_chart(benchmark_data, "Time to Run Query without and with Planner Statistics",
+                     "Seconds", f"figures/{output_file}.png", yscale='log', fig_size=(15, 5))
+
+    if args.cleanup:
+        cleanup(db=args.db)
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    end = time.perf_counter()
+    logger.info(f"Total benchmark time: {(end-start)/60} minutes")
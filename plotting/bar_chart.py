@@ -10,23 +10,35 @@ import argparse
 logger = logging.getLogger(__name__)
 
 
-def autolabel(rects, ax):
+def is_censored(value):
+    """True for measurements of benchmarks stopped by a timeout"""
+    return isinstance(value, dict) and value.get("censored", False)
+
+
+def get_time(value):
+    """Measured time, or the timeout for censored measurements"""
+    return value["value"] if isinstance(value, dict) else value
+
+
+def autolabel(rects, ax, censored=None):
     # from http://composition.al/blog/2015/11/29/a-better-way-to-add-labels-to-bar-charts-with-matplotlib/
     # Get y-axis height to calculate label position from.
     (y_bottom, y_top) = ax.get_ylim()
     y_height = y_top - y_bottom
 
-    for rect in rects:
+    for idx, rect in enumerate(rects):
         height = rect.get_height()
         label_position = height
+        prefix = '> ' if censored is not None and censored[idx] else ' '
 
         ax.text(rect.get_x() + rect.get_width()/2., label_position,
-                ' {:.4g}'.format(float(height)),
+                prefix + '{:.4g}'.format(float(height)),
                 ha='center', va='bottom', rotation=90)
 
 
 def create_bar_chart(data, title, y_axis_label, filename, yscale='linear', fig_size=(10, 5)):
     """ data is a dictionary of category (string) to dictionaries. Each inner dictionary is a dictionary of bar label (string) to bar height (number)
+    Censored measurements ({"censored": true, "value": timeout}) are drawn hatched and labelled "> timeout".
     """
     fig, ax = plt.subplots(figsize=fig_size)
 
@@ -39,12 +51,16 @@ def create_bar_chart(data, title, y_axis_label, filename, yscale='linear', fig_s
     indexes = np.arange(num_data_points) * (num_series+1) * width
 
     for idx, series in enumerate(sorted(data)):
-        bar_heights = np.array([data[series].get(label, 0)
-                                for label in labels])
+        values = [data[series].get(label, 0) for label in labels]
+        bar_heights = np.array([get_time(value) for value in values])
+        censored = np.array([is_censored(value) for value in values])
         mask = bar_heights.nonzero()
         rects = ax.bar((indexes + width * idx)[mask], bar_heights[mask],
                        width, label=series, zorder=2)
-        autolabel(rects, ax)
+        for rect, is_rect_censored in zip(rects, censored[mask]):
+            if is_rect_censored:
+                rect.set_hatch('//')
+        autolabel(rects, ax, censored[mask])
 
     # axis labels
     ax.set_xticks(indexes + width/2 * (num_series-1))
@@ -0,0 +1,49 @@
+import argparse
+import json
+import logging
+from bar_chart import create_bar_chart, is_censored
+
+logger = logging.getLogger(__name__)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description='Process some integers.')
+    parser.add_argument('mode', metavar='M', type=str,
+                        choices=['join', 'analysis'],
+                        help='Constrains which benchmarks are run')
+    parser.add_argument('--pg-index', dest='pg_index', action='store', default='GIST',
+                        help='Select postgis index (GIST/SPGIST/BRIN/NONE)')
+    parser.add_argument('--storage', dest='storage', action='store', default='tmpfs',
+                        help='Storage label of the results to compare against the default volume (e.g. tmpfs)')
+    args = parser.parse_args()
+
+    output_file = f"{args.mode}_storage_benchmark_pg_index_{args.pg_index}_{args.storage}"
+    base_file = f"{args.mode}_benchmark_pg_index_{args.pg_index}.json"
+    storage_file = f"{args.mode}_benchmark_pg_index_{args.pg_index}_{args.storage}.json"
+
+    with open(f"results/{base_file}", 'r') as file:
+        base_data = json.loads(file.read())
+    with open(f"results/{storage_file}", 'r') as file:
+        storage_data = json.loads(file.read())
+
+    benchmark_data = {}
+    benchmark_data.update(base_data)
+    benchmark_data.update(storage_data)
+    logger.info(benchmark_data)
+
+    # Fraction of the query time that goes away when the data directory is moved to faster storage
+    io_share = {}
+    for base_group in base_data:
+        storage_groups = [g for g in storage_data if g.startswith(f"{base_group} (")]
+        for storage_group in storage_groups:
+            io_share[storage_group] = dict(
+                (query, (base_data[base_group][query] - t) / base_data[base_group][query])
+                for query, t in storage_data[storage_group].items()
+                if base_data[base_group].get(query)
+                and not is_censored(t) and not is_censored(base_data[base_group][query]))
+    logger.info(io_share)
+    with open(f"results/{output_file}.json", 'w') as file:
+        file.write(json.dumps(io_share, indent=4))
+
+    create_bar_chart(benchmark_data, "Time to Run Query With Different Storage",
+                     "Seconds", f"figures/{output_file}.png", yscale='log', fig_size=(15, 5))
@@ -32,9 +32,16 @@ def create_line_graph(data, title, x_axis_label, y_axis_label, filename, yscale=
     for idx, series in enumerate(data):
         # bar_heights = [data[series].get(label, 0) for label in labels]
         x_vals = np.array(list(data[series].keys()))
-        y_vals = np.array([data[series][x_val] for x_val in x_vals])
-        ax.plot(x_vals, y_vals, label=series, zorder=2, marker='o',
-                linewidth=2, markersize=6)
+        # Censored measurements are plotted at their timeout with an upward marker
+        y_vals = np.array([data[series][x_val]["value"] if isinstance(data[series][x_val], dict)
+                           else data[series][x_val] for x_val in x_vals])
+        censored = np.array([isinstance(data[series][x_val], dict)
+                             for x_val in x_vals], dtype=bool)
+        lines = ax.plot(x_vals, y_vals, label=series, zorder=2, marker='o',
+                        linewidth=2, markersize=6)
+        if censored.any():
+            ax.plot(x_vals[censored], y_vals[censored], linestyle='none', marker='^',
+                    markersize=10, color=lines[0].get_color(), zorder=3)
 
     # Axis labels
     # ax.set_xticks(x_ticks)
@@ -0,0 +1,69 @@
+import re
+import asyncpg
+from util import instance
+from util.query_timeout import QueryTimeoutException
+
+_PLACEHOLDER = re.compile(r"%s|%%")
+
+
+def to_numbered_placeholders(query):
+    """Rewrites the %s placeholders used by the blocking adapters to asyncpg's $1, $2, ..."""
+    count = 0
+
+    def replace(match):
+        nonlocal count
+        if match.group(0) == "%%":
+            return "%"
+        count += 1
+        return f"${count}"
+    return _PLACEHOLDER.sub(replace, query)
+
+
+class AsyncPostgisAdapter:
+    """asyncio counterpart of PostgisAdapter on a pool of asyncpg connections.
+    Many coroutines can await execute at the same time; each query runs on the next free connection.
+    Create it with `await AsyncPostgisAdapter.create(...)`."""
+
+    def __init__(self, pool, persist=False):
+        self.pool = pool
+        self._persist = persist
+
+    @staticmethod
+    async def create(user, password, host="127.0.0.1", port=None, dbname='spatialdatasets', persist=False,
+                     pool_size=4, statement_cache_size=0):
+        """asyncpg prepares every query and by default keeps the prepared statements for reuse.
+        With statement_cache_size=0 each query is parsed and planned again, like the literal SQL
+        sent by PostgisAdapter; the rows still come back in the binary format."""
+        if port is None:
+            port = instance.POSTGIS_PORT
+        pool = await asyncpg.create_pool(host=host, port=port, user=user, password=password, database=dbname,
+                                         min_size=pool_size, max_size=pool_size,
+                                         statement_cache_size=statement_cache_size)
+        return AsyncPostgisAdapter(pool, persist=persist)
+
+    async def execute(self, query, params=None):
+        """params are bound to the %s placeholders of the query.
+        Returns the rows as tuples; statements without a result return an empty list."""
+        query = to_numbered_placeholders(query)
+        async with self.pool.acquire() as connection:
+            transaction = connection.transaction()
+            await transaction.start()
+            try:
+                rows = await connection.fetch(query, *(params or ()))
+            except asyncpg.exceptions.QueryCanceledError as e:
+                await transaction.rollback()
+                raise QueryTimeoutException(str(e))
+            except Exception as e:
+                await transaction.rollback()
+                print("Query exception:")
+                print(f"\tQuery: {query}")
+                print(f"\tException: {e}")
+                raise e
+            if self._persist:
+                await transaction.commit()
+            else:
+                await transaction.rollback()
+        return [tuple(row) for row in rows]
+
+    async def close(self):
+        await self.pool.close()
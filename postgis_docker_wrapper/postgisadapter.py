@@ -1,9 +1,21 @@
+import re
 import mysql.connector
 import psycopg2
+import psycopg2.errors
+from util import instance
+from util.query_timeout import QueryTimeoutException
+from util.misc import consume_results, IteratorFile
+
+# Queries that can be run through a server side cursor (DECLARE ... CURSOR FOR)
+STREAMABLE_QUERY = re.compile(r"^[\s(]*(SELECT|WITH|VALUES|TABLE)\b", re.IGNORECASE)
+# Rows fetched from a server side cursor per round trip
+STREAM_BATCH_SIZE = 10000
 
 
 class PostgisAdapter:
-    def __init__(self, user, password, host="127.0.0.1", port="5432", dbname='spatialdatasets', persist = False):
+    def __init__(self, user, password, host="127.0.0.1", port=None, dbname='spatialdatasets', persist = False):
+        if port is None:
+            port = instance.POSTGIS_PORT
         self.connection = psycopg2.connect(
             host=host,
             port=port,
@@ -12,6 +24,13 @@ class PostgisAdapter:
             dbname=dbname,
         )
         self._persist = persist
+        # Called with batches of rows instead of returning the result, see consume_results
+        self.result_handler = None
+        # Fetch the rows for the result_handler from a server side cursor, see _execute_streaming.
+        # Off for timed runs: a cursor never gets a parallel plan and costs a round trip per batch.
+        self.stream_results = False
+        # Names of the server side cursors, see _execute_streaming
+        self._cursor_count = 0
 
     def __del__(self):
         try:
@@ -20,24 +39,75 @@ class PostgisAdapter:
         except:
             pass
 
-    def execute(self, query):
+    def close(self):
+        self.connection.close()
+
+    def execute(self, query, params=None):
+        """params are bound to the %s placeholders of the query.
+        With a result_handler and stream_results the rows of a query are fetched in batches from a server
+        side cursor, so neither libpq nor Python hold the whole result"""
+        if self.result_handler is not None and self.stream_results and STREAMABLE_QUERY.match(query):
+            return self._execute_streaming(query, params)
+        return self._execute(self.connection.cursor(), query, params)
+
+    def execute_with_description(self, query, params=None):
+        """(rows, cursor description) of a query, e.g. for RowTranscoder.from_description"""
         cursor = self.connection.cursor()
+        return self._execute(cursor, query, params), cursor.description
+
+    def _execute(self, cursor, query, params):
         try:
-            cursor.execute(query)
+            cursor.execute(query, params)
+        except psycopg2.errors.QueryCanceled as e:
+            self.connection.rollback()
+            raise QueryTimeoutException(str(e))
         except Exception as e:
             print("Query exception:")
             print(f"\tQuery: {query}")
             print(f"\tException: {e}")
+            # Otherwise every later query of the connection fails in the aborted transaction
+            self.rollback()
             raise e
         if self._persist:
             self.connection.commit()
         else:
             self.connection.rollback()
         if cursor.description != None:
+            if self.result_handler is not None:
+                return consume_results(cursor, self.result_handler)
             return cursor.fetchall()
         else:
             return None
 
+    def _execute_streaming(self, query, params):
+        self._cursor_count += 1
+        cursor = self.connection.cursor(name=f"result_stream_{self._cursor_count}")
+        cursor.itersize = STREAM_BATCH_SIZE
+        try:
+            # The query runs while the rows are fetched, the cursor only lives until the end of the transaction
+            cursor.execute(query, params)
+            consume_results(cursor, self.result_handler, batch_size=STREAM_BATCH_SIZE)
+            cursor.close()
+        except psycopg2.errors.QueryCanceled as e:
+            self.connection.rollback()
+            raise QueryTimeoutException(str(e))
+        except Exception as e:
+            print("Query exception:")
+            print(f"\tQuery: {query}")
+            print(f"\tException: {e}")
+            self.rollback()
+            raise e
+        if self._persist:
+            self.connection.commit()
+        else:
+            self.connection.rollback()
+        return None
+
+    def rollback(self):
+        """Ends the open transaction, unless the connection is already closed"""
+        if not self.connection.closed:
+            self.connection.rollback()
+
     def execute_nontransaction(self, query):
         old_isolation_level = self.connection.isolation_level
         self.connection.set_isolation_level(0)
@@ -52,5 +122,45 @@ class PostgisAdapter:
         finally:
             self.connection.set_isolation_level(old_isolation_level)
 
+    def prepare(self, name, query, types):
+        """Creates a server side prepared statement for this session.
+        The parameters of the query are $1, $2, ... with the given PostgreSQL types."""
+        self.execute_nontransaction(
+            f"PREPARE {name} ({', '.join(types)}) AS {query}")
+
+    def execute_prepared(self, name, params):
+        """Runs a statement created by prepare; the server reuses its parsed query and cached plan"""
+        return self.execute(f"EXECUTE {name} ({', '.join(['%s'] * len(params))})", params)
+
+    def deallocate(self, name):
+        self.execute_nontransaction(f"DEALLOCATE {name}")
+
+    def copy_rows(self, table, columns, chunks, binary=False):
+        """Loads rows with COPY ... FROM STDIN; chunks are the lines of RowTranscoder.to_copy_text
+        or the byte chunks of RowTranscoder.to_copy_binary"""
+        copy_format = "binary" if binary else "text"
+        cursor = self.connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {table} ({', '.join(columns)}) FROM STDIN (FORMAT {copy_format})",
+                               IteratorFile(chunks))
+        except Exception as e:
+            print("Query exception:")
+            print(f"\tCOPY into {table}")
+            print(f"\tException: {e}")
+            self.connection.rollback()
+            raise e
+        if self._persist:
+            self.connection.commit()
+        return cursor.rowcount
+
+    def set_statement_timeout(self, seconds):
+        """Server side time limit for every statement of this connection, None disables it"""
+        milliseconds = 0 if seconds is None else int(seconds * 1000)
+        self.execute_nontransaction(f"SET statement_timeout = {milliseconds}")
+
+    def cancel(self):
+        """Cancels the running query; safe to call from another thread"""
+        self.connection.cancel()
+
     def get_schemas(self):
         return [tuple[0] for tuple in self.execute("SELECT datname FROM pg_database;")]
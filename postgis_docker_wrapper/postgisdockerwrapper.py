@@ -1,21 +1,31 @@
 import docker
 import time
 import logging
+from util.docker_storage import DataStorage
+from util import instance
+from util.readiness import wait_until_ready, postgis_probe
 
 
 class PostgisDockerWrapper:
     _logger = logging.getLogger(__name__)
 
-    def __init__(self, docker_client):
+    def __init__(self, docker_client, resource_limits=None, storage=None):
+        """resource_limits is an optional util.docker_resources.ResourceLimits
+        storage is an optional util.docker_storage.DataStorage (default: named volume)"""
         self.docker_client = docker_client
+        self.resource_limits = resource_limits if resource_limits is not None else instance.get_resource_limits()
+        self.storage = storage if storage is not None else DataStorage()
         self.image_name = "postgis/postgis"
-        self.container_name = "postgis"
+        self.container_name = instance.get_container_name("postgis")
         self.postgis_version = "13-3.0"
         self.root_password = "root-password"
         self.container = None
-        self.volume_name = "postgisdata"
+        self.volume_name = instance.get_container_name("postgisdata")
         self.postgis_data_folder = "/var/lib/postgresql/data"
         self.volume = None
+        self.host = "127.0.0.1"
+        self.port = instance.POSTGIS_PORT
+        self.time_to_ready = None
 
         try:
             self.get_container()
@@ -31,41 +41,67 @@ class PostgisDockerWrapper:
         except docker.errors.NotFound:
             PostgisDockerWrapper._logger.info("Container not found")
 
-    def start_container(self, parallel_query_execution=False):
+    def start_container(self, parallel_query_execution=False, server_settings=None):
+        """server_settings is a dictionary of postgresql.conf parameters passed with -c.
+        They only take effect when a new container is created."""
+        start = time.perf_counter()
         try:
             self.container = self.docker_client.containers.get(
                 self.container_name)
+            if self.resource_limits is not None:
+                PostgisDockerWrapper._logger.info(
+                    f"Applying resource limits: {self.resource_limits}")
+                self.container.update(**self.resource_limits.to_docker_kwargs())
             self.container.start()
             PostgisDockerWrapper._logger.info(
                 "Found existing Postgis docker container")
+            if server_settings:
+                PostgisDockerWrapper._logger.warning(
+                    f"Ignoring server settings for existing container: {server_settings}")
         except docker.errors.NotFound:
             PostgisDockerWrapper._logger.info(
                 "Creating new Postgis docker container")
-            command = "postgres -c max_parallel_workers_per_gather=0"
-            if parallel_query_execution:
-                command = "postgres"
+            settings = {}
+            if not parallel_query_execution:
+                settings["max_parallel_workers_per_gather"] = 0
+            if server_settings:
+                settings.update(server_settings)
+            command = "postgres"
+            for name, value in settings.items():
+                command += f" -c {name}={value}"
             self.container = self.docker_client.containers.run(f"{self.image_name}:{self.postgis_version}",
                                                                detach=True,
                                                                name=self.container_name,
+                                                               **self.get_resource_kwargs(),
                                                                ports={
-                                                                   '5432': 5432},
+                                                                   '5432': self.port},
                                                                environment=[
                                                                    f"POSTGRES_PASSWORD={self.root_password}"],
-                                                               volumes={self.volume_name: {
-                                                                   'bind': self.postgis_data_folder, 'mode': 'rw'}},
+                                                               **self.storage.to_docker_kwargs(
+                                                                   self.volume_name, self.postgis_data_folder, subfolder=self.container_name),
                                                                command=command)
-        # wait until PostGIS is initialized
-        logs = str(self.container.logs())
-        while 'listening on IPv6 address "::", port 5432' not in logs:
-            # print(logs)
-            time.sleep(0.5)
-            logs = str(self.container.logs())
+        self.wait_until_ready()
+        self.time_to_ready = time.perf_counter() - start
+        PostgisDockerWrapper._logger.info(
+            f"Postgis time to ready: {self.time_to_ready} seconds")
+        return self.time_to_ready
+
+    def wait_until_ready(self, timeout=300):
+        """Blocks until PostGIS accepts connections over TCP"""
+        # The init scripts run a temporary server without TCP, so this also waits for them
+        return wait_until_ready(lambda: postgis_probe(self.host, self.port, "postgres", self.root_password),
+                                "Postgis", container=self.container, timeout=timeout)
 
     def inject_command(self, cmd):
         if self.container != None:
             PostgisDockerWrapper._logger.info(f"Executing: {cmd}")
             return self.container.exec_run(cmd)
 
+    def get_resource_kwargs(self):
+        if self.resource_limits is None:
+            return {}
+        return self.resource_limits.to_docker_kwargs()
+
     def stop_container(self):
         if self.container != None:
             PostgisDockerWrapper._logger.info(
@@ -83,6 +119,9 @@ class PostgisDockerWrapper:
             return self.container.logs()
 
     def remove_volume(self):
+        if self.storage.kind != 'volume':
+            # tmpfs disappears with the container and bind mounted host data is left in place
+            return
         try:
             volume = self.docker_client.volumes.get(self.volume_name)
             PostgisDockerWrapper._logger.info("Removing Postgis volume")
@@ -0,0 +1,116 @@
+import logging
+import time
+import json
+import argparse
+from benchmark import mysql_benchmarks, postgresql_benchmarks
+from plotting.bar_chart import create_bar_chart, is_censored
+from util.benchmark_helpers import init, cleanup, start_container, save_benchmark_data, run_benchmarks
+from util.checkpoint import Checkpoint
+
+"""
+Benchmark for repeated lookups with varying query geometries, sent as new literal SQL
+for every call and through server side prepared statements
+"""
+
+parser = argparse.ArgumentParser(description='Process some integers.')
+parser.add_argument('--init', dest='init', action='store_const', const=True, default=False,
+                    help='Create schemas if necessary and load datasets')
+parser.add_argument('--cleanup', dest='cleanup', action='store_const', const=True, default=False,
+                    help='Remove docker containers and volumes')
+parser.add_argument('--no-pcs', dest='pcs', action='store_const', const=False, default=True,
+                    help='Use the datasets in the geographic coordinate system')
+parser.add_argument('--db', dest='db', action='store', default='both',
+                    help='Select DB (both/mysql/pg)')
+parser.add_argument('--calls', dest='calls', action='store', type=int, default=1000,
+                    help='Number of lookups per run, each with a different query geometry')
+parser.add_argument('--resume', dest='resume', action='store_const', const=True, default=False,
+                    help='Skip benchmarks completed by a previous interrupted run')
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+LOOKUP_BENCHMARKS = ["PointLookup", "RangeLookup"]
+
+# (group, constructor arguments) of each mode. With forced custom plans EXECUTE still saves
+# parsing but plans every call, so the difference to the default mode is the planning saved.
+MODES = {
+    "mysql": [
+        ("MySQL (Literal)", {}),
+        ("MySQL (Prepared)", {"use_prepared_statements": True}),
+    ],
+    "pg": [
+        ("Postgis (Literal)", {}),
+        ("Postgis (Prepared, Custom Plans)", {"use_prepared_statements": True,
+                                              "plan_cache_mode": "force_custom_plan"}),
+        ("Postgis (Prepared)", {"use_prepared_statements": True}),
+    ],
+}
+
+
+def create_lookup_benchmark(db, name, **kwargs):
+    module = mysql_benchmarks if db == 'mysql' else postgresql_benchmarks
+    return getattr(module, name)(use_projected_crs=args.pcs, call_count=args.calls, **kwargs)
+
+
+def main():
+    if args.init:
+        logger.info("Initing DB")
+        init(import_gcs=not args.pcs, db=args.db)
+    else:
+        logger.info("Reusing existing DB")
+        start_container(db=args.db)
+
+    dbs = ['mysql', 'pg'] if args.db == 'both' else [args.db]
+
+    benchmarks = []
+    for db in dbs:
+        for group, kwargs in MODES[db]:
+            for name in LOOKUP_BENCHMARKS:
+                benchmarks.append((group, name, create_lookup_benchmark(db, name, **kwargs)))
+
+    output_file = "prepared_statement_benchmark"
+    if not args.pcs:
+        output_file += '_gcs'
+
+    checkpoint = Checkpoint(f"{output_file}_{args.db}", resume=args.resume)
+    benchmark_data = run_benchmarks(benchmarks, checkpoint,
+                                    on_retry=lambda: start_container(db=args.db))
+    benchmark_data = save_benchmark_data(output_file, benchmark_data)
+    checkpoint.remove()
+
+    latency = dict((group, {}) for group in benchmark_data)
+    for group, name, bnchmrk in benchmarks:
+        value = benchmark_data[group].get(name)
+        if value and not is_censored(value):
+            latency[group][name] = value / bnchmrk.get_item_count()
+    logger.info(f"Latency per call: {latency}")
+
+    # Planning and execution time per call reported by the server
+    server_times = {}
+    for group, name, bnchmrk in benchmarks:
+        if isinstance(bnchmrk, postgresql_benchmarks.PgLookupBenchmark):
+            server_times.setdefault(group, {})[
+                name] = bnchmrk.get_planning_time()
+    for group, times in server_times.items():
+        if group != "Postgis (Literal)":
+            for name in times:
+                times[name]["planning_saved"] = server_times["Postgis (Literal)"][name]["planning"] - \
+                    times[name]["planning"]
+    logger.info(f"Server times per call: {server_times}")
+
+    with open(f"results/{output_file}_latency.json", 'w') as file:
+        file.write(json.dumps({"latency": latency, "server_times": server_times}, indent=4))
+
+    create_bar_chart(latency, "Latency per Lookup With Literal SQL and Prepared Statements",
+                     "Seconds", f"figures/{output_file}.png", yscale='log', fig_size=(10, 5))
+
+    if args.cleanup:
+        cleanup(db=args.db)
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    end = time.perf_counter()
+    logger.info(f"Total benchmark time: {(end-start)/60} minutes")
@@ -0,0 +1,122 @@
+import logging
+import time
+import json
+import os
+import argparse
+from benchmark.suites import get_suite, create_benchmark
+from benchmark.benchmark_exception import BenchmarkException
+from plotting.subsampling_benchmark_graph import create_line_graph
+from util.benchmark_helpers import init, cleanup, recreate_containers
+from util.docker_resources import ResourceLimits
+
+"""
+Benchmark for spatial join and analysis queries with different numbers of CPU cores
+"""
+
+parser = argparse.ArgumentParser(description='Process some integers.')
+parser.add_argument('mode', metavar='M', type=str,
+                    choices=['join', 'analysis'],
+                    help='Constrains which benchmarks are run')
+parser.add_argument('--init', dest='init', action='store_const', const=True, default=False,
+                    help='Create schemas if necessary and load datasets')
+parser.add_argument('--cleanup', dest='cleanup', action='store_const', const=True, default=False,
+                    help='Remove docker containers and volumes')
+parser.add_argument('--parallel', dest='parallel', action='store_const', const=True, default=False,
+                    help='Let PostGIS use one parallel worker per available core')
+parser.add_argument('--db', dest='db', action='store', default='both',
+                    help='Select DB (both/mysql/pg)')
+parser.add_argument('--cores', dest='cores', action='store', default='1,2,4,8',
+                    help='Comma separated list of core counts')
+parser.add_argument('--memory', dest='memory', action='store', default=None,
+                    help='Memory limit for the database containers, e.g. 16g')
+parser.add_argument('--benchmarks', dest='benchmarks', action='store', default=None,
+                    help='Comma separated list of benchmarks to run (default: all benchmarks of the mode)')
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def main():
+    if args.init:
+        logger.info("Initing DB")
+        init(parallel_query_execution=args.parallel, db=args.db)
+
+    core_counts = sorted(int(c) for c in args.cores.split(','))
+    if core_counts[-1] > os.cpu_count():
+        logger.warning(
+            f"Skipping core counts above the {os.cpu_count()} available cores")
+        core_counts = [c for c in core_counts if c <= os.cpu_count()]
+
+    benchmark_names = [name for name, _, _ in get_suite(args.mode)]
+    if args.benchmarks is not None:
+        benchmark_names = args.benchmarks.split(',')
+
+    dbs = ['mysql', 'pg'] if args.db == 'both' else [args.db]
+    group_names = {"mysql": "MySQL",
+                   "pg": f"Postgis{' (Parallel)' if args.parallel else ''}"}
+
+    times = {}
+    # Limits of the containers of the benchmarked databases only, the others are not started
+    limits = {}
+    for cores in core_counts:
+        resource_limits = ResourceLimits.for_cores(
+            cores, mem_limit=args.memory)
+        limits[cores] = dict((group_names[db], str(resource_limits)) for db in dbs)
+        pg_settings = None
+        if args.parallel:
+            pg_settings = {"max_parallel_workers_per_gather": cores,
+                           "max_parallel_workers": cores,
+                           "max_worker_processes": max(8, cores)}
+        recreate_containers(pg_settings=pg_settings, parallel_query_execution=args.parallel,
+                            resource_limits=resource_limits, db=args.db)
+        for db in dbs:
+            for name in benchmark_names:
+                series = f"{group_names[db]}: {name}"
+                times.setdefault(series, {})
+                bnchmrk = create_benchmark(db, name)
+                try:
+                    bnchmrk.run()
+                    times[series][cores] = bnchmrk.get_average_time()
+                    logger.info(
+                        f"{series} with {cores} cores: {times[series][cores]} seconds")
+                except BenchmarkException as e:
+                    logger.warning(f"Benchmark Exception: {str(e)}")
+                finally:
+                    bnchmrk.close()
+
+    # Speedup and efficiency relative to the smallest core count
+    speedup = {}
+    efficiency = {}
+    for series, series_times in times.items():
+        if core_counts[0] not in series_times:
+            continue
+        base_cores = core_counts[0]
+        base_time = series_times[base_cores]
+        speedup[series] = dict((cores, base_time / t)
+                               for cores, t in series_times.items())
+        efficiency[series] = dict((cores, speedup[series][cores] / (cores / base_cores))
+                                  for cores in series_times)
+
+    output_file = f"scaling_{args.mode}_benchmark"
+    if args.parallel:
+        output_file += '_parallel'
+    with open(f"results/{output_file}.json", 'w') as file:
+        file.write(json.dumps({"times": times, "speedup": speedup, "efficiency": efficiency,
+                               "resource_limits": limits}, indent=4))
+
+    create_line_graph(speedup, "Speedup With Different Numbers of Cores", "Cores",
+                      "Speedup", f"figures/{output_file}.png")
+
+    # Leave the containers without limits
+    recreate_containers(parallel_query_execution=args.parallel, db=args.db)
+
+    if args.cleanup:
+        cleanup(db=args.db)
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    end = time.perf_counter()
+    logger.info(f"Total benchmark time: {(end-start)/60} minutes")
@@ -0,0 +1,176 @@
+import logging
+import os
+import time
+import json
+import argparse
+import docker
+from benchmark import mysql_benchmarks, postgresql_benchmarks
+from benchmark.benchmark_exception import BenchmarkException
+from gdal.gdaldockerwrapper import GdalDockerWrapper, DATASET_FORMATS
+from postgis_docker_wrapper.postgisdockerwrapper import PostgisDockerWrapper
+from plotting.bar_chart import create_bar_chart
+from util.benchmark_helpers import cleanup, start_container, create_mysql_schema, create_postgis_database
+from util.projection_cache import ProjectionCache, get_layer_files
+
+"""
+Benchmark for the on-disk format of the source datasets.
+Converts the shapefiles to GeoPackage, FlatGeobuf and GeoParquet (cached, see util.projection_cache),
+then loads each dataset from each format into each database and reports the load time, the rows/s
+and the size of the source files.
+"""
+
+DATASETS = {
+    "Airspaces": "airspace/Class_Airspace.shp",
+    "Airports": "airports/Airports.shp",
+    "Routes": "routes/ATS_Route.shp",
+}
+# Shapefile is the format the other benchmarks load and is the baseline
+SOURCE_FORMAT = "Shapefile"
+
+parser = argparse.ArgumentParser(description='Process some integers.')
+parser.add_argument('--init', dest='init', action='store_const', const=True, default=False,
+                    help='Create the schemas the datasets are loaded into')
+parser.add_argument('--cleanup', dest='cleanup', action='store_const', const=True, default=False,
+                    help='Remove docker containers and volumes')
+parser.add_argument('--db', dest='db', action='store', default='both',
+                    help='Select DB (both/mysql/pg)')
+parser.add_argument('--formats', dest='formats', action='store', default=','.join(DATASET_FORMATS),
+                    help='Comma separated formats to convert the datasets to (default: GeoPackage,FlatGeobuf,GeoParquet)')
+parser.add_argument('--repeat', dest='repeat', action='store', type=int, default=3,
+                    help='Number of loads per dataset and format')
+parser.add_argument('--force-convert', dest='force_convert', action='store_const', const=True, default=False,
+                    help='Convert every dataset again even if the cached conversion is up to date')
+args = parser.parse_args()
+
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+def get_conversions(formats):
+    """(source, dest, format) tuples, e.g. airports/Airports.shp to formats/GeoPackage/airports/Airports.gpkg"""
+    conversions = []
+    for output_format in formats:
+        extension = DATASET_FORMATS[output_format][1]
+        for source in DATASETS.values():
+            stem = os.path.splitext(source)[0]
+            conversions.append((source, f"formats/{output_format}/{stem}.{extension}", output_format))
+    return conversions
+
+
+def get_source_size(dataset_folder, path):
+    """Megabytes of the files of a layer"""
+    if path.endswith(".shp"):
+        layer_files = get_layer_files(dataset_folder, path)
+    else:
+        layer_files = [path]
+    return sum(os.path.getsize(os.path.join(dataset_folder, layer_file)) for layer_file in layer_files) / 1e6
+
+
+def is_complete(gdal_docker_wrapper, path, feature_count):
+    """Whether GDAL can read the dataset and it holds feature_count features"""
+    try:
+        return gdal_docker_wrapper.get_feature_count(path) == feature_count
+    except ValueError as e:
+        logger.warning(str(e))
+        return False
+
+
+def convert_datasets(gdal_docker_wrapper, formats, feature_counts):
+    """Returns {format: {dataset: path}} of the formats whose conversions succeeded and hold every feature,
+    with the shapefiles first"""
+    cache = ProjectionCache(gdal_docker_wrapper)
+    sources = {SOURCE_FORMAT: dict(DATASETS)}
+    for output_format in formats:
+        conversions = get_conversions([output_format])
+        start = time.perf_counter()
+        try:
+            converted = cache.convert_all(conversions, force=args.force_convert)
+        except RuntimeError as e:
+            logger.warning(f"Skipping {output_format}: {str(e)}")
+            continue
+        logger.info(
+            f"Converted {len(converted)} datasets to {output_format} in {time.perf_counter() - start} seconds")
+        paths = dict(zip(DATASETS, [dest for _, dest, _ in conversions]))
+        # A conversion cached by an earlier run may be incomplete, it is not timed
+        incomplete = [dataset for dataset, path in paths.items()
+                      if not is_complete(gdal_docker_wrapper, path, feature_counts[dataset])]
+        if incomplete:
+            logger.warning(f"Skipping {output_format}: {', '.join(incomplete)} do not hold every feature, "
+                           f"convert them again with --force-convert")
+            continue
+        sources[output_format] = paths
+    return sources
+
+
+def create_load_benchmark(db, source, table_name):
+    if db == 'mysql':
+        return mysql_benchmarks.TunedLoad(source, table_name, repeat_count=args.repeat)
+    return postgresql_benchmarks.TunedLoad(source, table_name, repeat_count=args.repeat)
+
+
+def main():
+    start_container(db=args.db)
+    if args.init:
+        logger.info("Creating schemas")
+        if args.db != 'pg':
+            create_mysql_schema()
+        if args.db != 'mysql':
+            create_postgis_database(PostgisDockerWrapper(docker.from_env())).close()
+
+    gdal_docker_wrapper = GdalDockerWrapper(docker.from_env())
+    feature_counts = dict((dataset, gdal_docker_wrapper.get_feature_count(source))
+                          for dataset, source in DATASETS.items())
+    logger.info(f"Feature counts: {feature_counts}")
+    sources = convert_datasets(gdal_docker_wrapper, args.formats.split(','), feature_counts)
+
+    dbs = ['mysql', 'pg'] if args.db == 'both' else [args.db]
+    db_group_names = {"mysql": "MySQL", "pg": "Postgis"}
+    load_data = {}
+    rate_data = {}
+    validity_data = {}
+    for db in dbs:
+        for source_format, paths in sources.items():
+            group = f"{db_group_names[db]} ({source_format})"
+            load_data[group] = {}
+            rate_data[group] = {}
+            validity_data[group] = {}
+            for dataset, path in paths.items():
+                bnchmrk = create_load_benchmark(db, path, f"{dataset.lower()}_format")
+                try:
+                    bnchmrk.run()
+                    load_data[group][dataset] = bnchmrk.get_average_time()
+                    rate_data[group][dataset] = bnchmrk.loaded_row_count / bnchmrk.get_average_time()
+                    validity_data[group][dataset] = bnchmrk.loaded_row_count == feature_counts[dataset]
+                    logger.info(f"{group} {dataset}: {load_data[group][dataset]} seconds, "
+                                f"{bnchmrk.loaded_row_count} of {feature_counts[dataset]} rows")
+                except BenchmarkException as e:
+                    logger.warning(f"Benchmark Exception: {str(e)}")
+                    validity_data[group][dataset] = False
+                finally:
+                    bnchmrk.close()
+
+    size_data = dict((source_format, dict((dataset, get_source_size(gdal_docker_wrapper.dataset_folder, path))
+                                          for dataset, path in paths.items()))
+                     for source_format, paths in sources.items())
+
+    output_file = "source_format_benchmark"
+    with open(f"results/{output_file}.json", 'w') as file:
+        file.write(json.dumps(load_data, indent=4))
+    with open(f"results/{output_file}_details.json", 'w') as file:
+        file.write(json.dumps({"rows_per_second": rate_data, "valid": validity_data,
+                               "source_size": size_data, "sources": sources}, indent=4))
+
+    create_bar_chart(load_data, "Time to Load Dataset from Each Source Format",
+                     "Seconds", f"figures/{output_file}.png", yscale='log', fig_size=(15, 5))
+    create_bar_chart(size_data, "Size of Source Dataset",
+                     "Megabytes", f"figures/{output_file}_size.png")
+
+    if args.cleanup:
+        cleanup(db=args.db)
+
+
+if __name__ == "__main__":
+    start = time.perf_counter()
+    main()
+    end = time.perf_counter()
+    logger.info(f"Total benchmark time: {(end-start)/60} minutes")
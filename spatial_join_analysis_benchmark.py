@@ -1,14 +1,17 @@
 import logging
 import time
-import json
 import argparse
 from benchmark import mysql_benchmarks, postgresql_benchmarks
-from benchmark.benchmark_exception import BenchmarkException
 from mysqlutils.mysqldockerwrapper import MySqlDockerWrapper
 from mysqlutils.mysqladapter import MySQLAdapter
 from gdal.gdaldockerwrapper import GdalDockerWrapper
 from plotting.bar_chart import create_bar_chart
-from util.benchmark_helpers import init, cleanup, start_container
+from benchmark.benchmark import BenchmarkSpec
+from util.benchmark_helpers import init, cleanup, start_container, save_benchmark_data, run_benchmarks
+from util.checkpoint import Checkpoint
+from util.query_timeout import parse_timeouts
+from util.profiling import PROFILE_MODES
+from util.docker_storage import DataStorage
 
 """
 Benchmark for spatial join and analysis queries
@@ -34,6 +37,20 @@ parser.add_argument('--pg-index', dest='pg_index', action='store', default='GIST
                     help='Select postgis index (GIST/SPGIST/BRIN/NONE)')
 parser.add_argument('--mysql-noindex', dest='mysql_index', action='store_const', const=False, default=True,
                     help='Disable MySQL index')
+parser.add_argument('--storage', dest='storage', action='store', default='volume',
+                    help='Data directory storage (volume/tmpfs[:size]/bind:PATH, optionally ,throttled:DEVICE:BPS)')
+parser.add_argument('--merge-results', dest='merge_results', action='store_const', const=True, default=False,
+                    help='Keep the results of other groups already in the results file')
+parser.add_argument('--resume', dest='resume', action='store_const', const=True, default=False,
+                    help='Skip benchmarks completed by a previous interrupted run')
+parser.add_argument('--retries', dest='retries', action='store', type=int, default=2,
+                    help='Number of times a failed benchmark is retried')
+parser.add_argument('--timeout', dest='timeout', action='store', default=None,
+                    help='Query timeout in seconds, optionally per benchmark (e.g. 600,PolygonDisjointPolygon=3600)')
+parser.add_argument('--fingerprint', dest='fingerprint', action='store_const', const=True, default=False,
+                    help='Save a fingerprint of each query result for integrity_check.py --from-results')
+parser.add_argument('--profile', dest='profile', action='store', default=None, choices=PROFILE_MODES,
+                    help='Profile the client side of each benchmark with cprofile or a sampling profiler')
 args = parser.parse_args()
 
 logging.basicConfig(level=logging.INFO)
@@ -41,132 +58,135 @@ logger = logging.getLogger(__name__)
 
 
 def main():
+    storage = DataStorage.from_spec(args.storage)
     if args.init:
         logger.info("Initing DB")
         init(create_spatial_index=args.mysql_index, import_gcs=not args.pcs,
-             postgis_index=args.pg_index, parallel_query_execution=args.parallel)
+             postgis_index=args.pg_index, parallel_query_execution=args.parallel,
+             storage=storage, db=args.db)
     else:
         logger.info("Reusing existing DB")
-        start_container()
+        start_container(db=args.db, storage=storage)
 
-    mysql_group_name = f"MySQL{' (No Index)' if not args.mysql_index else ''}{ ' (GCS)' if not args.pcs else ''}"
+    storage_suffix = f" ({storage.get_label()})" if args.storage != 'volume' else ''
+    mysql_group_name = f"MySQL{' (No Index)' if not args.mysql_index else ''}{ ' (GCS)' if not args.pcs else ''}{storage_suffix}"
     pg_index_name = 'No' if args.pg_index == 'NONE' else args.pg_index
-    postgis_group_name = f"Postgis ({pg_index_name} Index){ ' (GCS)' if not args.pcs else ''}{ ' (Parallel)' if args.parallel else ''}"
+    postgis_group_name = f"Postgis ({pg_index_name} Index){ ' (GCS)' if not args.pcs else ''}{ ' (Parallel)' if args.parallel else ''}{storage_suffix}"
 
     join_benchmarks = []
     if args.db != 'pg':
         join_benchmarks.extend([
             (mysql_group_name, "PointEqualsPoint",
-             mysql_benchmarks.PointEqualsPoint(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.PointEqualsPoint, use_projected_crs=args.pcs)),
             (mysql_group_name, "PointIntersectsLine",
-             mysql_benchmarks.PointIntersectsLine(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.PointIntersectsLine, use_projected_crs=args.pcs)),
             (mysql_group_name, "PointWithinPolygon",
-             mysql_benchmarks.PointWithinPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.PointWithinPolygon, use_projected_crs=args.pcs)),
             (mysql_group_name, "LineIntersectsPolygon",
-             mysql_benchmarks.LineIntersectsPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.LineIntersectsPolygon, use_projected_crs=args.pcs)),
             (mysql_group_name, "LineWithinPolygon",
-             mysql_benchmarks.LineWithinPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.LineWithinPolygon, use_projected_crs=args.pcs)),
             (mysql_group_name, "LineIntersectsLine",
-             mysql_benchmarks.LineIntersectsLine(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.LineIntersectsLine, use_projected_crs=args.pcs)),
             (mysql_group_name, "PolygonEqualsPolygon",
-             mysql_benchmarks.PolygonEqualsPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.PolygonEqualsPolygon, use_projected_crs=args.pcs)),
             (mysql_group_name, "PolygonDisjointPolygon",
-             mysql_benchmarks.PolygonDisjointPolygon(use_projected_crs=args.pcs, subsampling_factor=10)),
+             BenchmarkSpec(mysql_benchmarks.PolygonDisjointPolygon, use_projected_crs=args.pcs, subsampling_factor=10)),
             (mysql_group_name, "PolygonIntersectsPolygon",
-             mysql_benchmarks.PolygonIntersectsPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.PolygonIntersectsPolygon, use_projected_crs=args.pcs)),
             (mysql_group_name, "PolygonWithinPolygon",
-             mysql_benchmarks.PolygonWithinPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.PolygonWithinPolygon, use_projected_crs=args.pcs)),
         ])
     if args.db != 'mysql':
         join_benchmarks.extend([
             (postgis_group_name, "PointEqualsPoint",
-             postgresql_benchmarks.PointEqualsPoint(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.PointEqualsPoint, use_projected_crs=args.pcs)),
             (postgis_group_name, "PointIntersectsLine",
-             postgresql_benchmarks.PointIntersectsLine(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.PointIntersectsLine, use_projected_crs=args.pcs)),
             (postgis_group_name, "PointWithinPolygon",
-             postgresql_benchmarks.PointWithinPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.PointWithinPolygon, use_projected_crs=args.pcs)),
             (postgis_group_name, "LineIntersectsPolygon",
-             postgresql_benchmarks.LineIntersectsPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.LineIntersectsPolygon, use_projected_crs=args.pcs)),
             (postgis_group_name, "LineWithinPolygon",
-             postgresql_benchmarks.LineWithinPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.LineWithinPolygon, use_projected_crs=args.pcs)),
             (postgis_group_name, "LineIntersectsLine",
-             postgresql_benchmarks.LineIntersectsLine(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.LineIntersectsLine, use_projected_crs=args.pcs)),
             (postgis_group_name, "PolygonEqualsPolygon",
-             postgresql_benchmarks.PolygonEqualsPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.PolygonEqualsPolygon, use_projected_crs=args.pcs)),
             (postgis_group_name, "PolygonDisjointPolygon",
-             postgresql_benchmarks.PolygonDisjointPolygon(use_projected_crs=args.pcs, subsampling_factor=10)),
+             BenchmarkSpec(postgresql_benchmarks.PolygonDisjointPolygon, use_projected_crs=args.pcs, subsampling_factor=10)),
             (postgis_group_name, "PolygonIntersectsPolygon",
-             postgresql_benchmarks.PolygonIntersectsPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.PolygonIntersectsPolygon, use_projected_crs=args.pcs)),
             (postgis_group_name, "PolygonWithinPolygon",
-             postgresql_benchmarks.PolygonWithinPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.PolygonWithinPolygon, use_projected_crs=args.pcs)),
         ])
 
     analysis_benchmarks = []
     if args.db != 'pg':
         analysis_benchmarks.extend([
             (mysql_group_name, "RetrievePoints",
-             mysql_benchmarks.RetrievePoints(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.RetrievePoints, use_projected_crs=args.pcs)),
             (mysql_group_name, "LongestLine",
-             mysql_benchmarks.LongestLine(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.LongestLine, use_projected_crs=args.pcs)),
             (mysql_group_name, "TotalLength",
-             mysql_benchmarks.TotalLength(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.TotalLength, use_projected_crs=args.pcs)),
             (mysql_group_name, "RetrieveLines",
-             mysql_benchmarks.RetrieveLines(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.RetrieveLines, use_projected_crs=args.pcs)),
             (mysql_group_name, "LargestArea",
-             mysql_benchmarks.LargestArea(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.LargestArea, use_projected_crs=args.pcs)),
             (mysql_group_name, "TotalArea",
-             mysql_benchmarks.TotalArea(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.TotalArea, use_projected_crs=args.pcs)),
             (mysql_group_name, "RetrievePolygons",
-             mysql_benchmarks.RetrievePolygons(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.RetrievePolygons, use_projected_crs=args.pcs)),
             (mysql_group_name, "PointNearPoint",
-             mysql_benchmarks.PointNearPoint(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.PointNearPoint, use_projected_crs=args.pcs)),
             (mysql_group_name, "PointNearPoint2",
-             mysql_benchmarks.PointNearPoint2(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.PointNearPoint2, use_projected_crs=args.pcs)),
             (mysql_group_name, "PointNearLine",
-             mysql_benchmarks.PointNearLine(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.PointNearLine, use_projected_crs=args.pcs)),
             (mysql_group_name, "PointNearLine2",
-             mysql_benchmarks.PointNearLine2(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.PointNearLine2, use_projected_crs=args.pcs)),
             (mysql_group_name, "PointNearPolygon",
-             mysql_benchmarks.PointNearPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.PointNearPolygon, use_projected_crs=args.pcs)),
             (mysql_group_name, "SinglePointWithinPolygon",
-             mysql_benchmarks.SinglePointWithinPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.SinglePointWithinPolygon, use_projected_crs=args.pcs)),
             (mysql_group_name, "LineNearPolygon",
-             mysql_benchmarks.LineNearPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.LineNearPolygon, use_projected_crs=args.pcs)),
             (mysql_group_name, "SingleLineIntersectsPolygon",
-             mysql_benchmarks.SingleLineIntersectsPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(mysql_benchmarks.SingleLineIntersectsPolygon, use_projected_crs=args.pcs)),
         ])
     if args.db != 'mysql':
         analysis_benchmarks.extend([
             (postgis_group_name, "RetrievePoints",
-             postgresql_benchmarks.RetrievePoints(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.RetrievePoints, use_projected_crs=args.pcs)),
             (postgis_group_name, "LongestLine",
-             postgresql_benchmarks.LongestLine(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.LongestLine, use_projected_crs=args.pcs)),
             (postgis_group_name, "TotalLength",
-             postgresql_benchmarks.TotalLength(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.TotalLength, use_projected_crs=args.pcs)),
             (postgis_group_name, "RetrieveLines",
-             postgresql_benchmarks.RetrieveLines(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.RetrieveLines, use_projected_crs=args.pcs)),
             (postgis_group_name, "LargestArea",
-             postgresql_benchmarks.LargestArea(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.LargestArea, use_projected_crs=args.pcs)),
             (postgis_group_name, "TotalArea",
-             postgresql_benchmarks.TotalArea(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.TotalArea, use_projected_crs=args.pcs)),
             (postgis_group_name, "RetrievePolygons",
-             postgresql_benchmarks.RetrievePolygons(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.RetrievePolygons, use_projected_crs=args.pcs)),
             (postgis_group_name, "PointNearPoint",
-             postgresql_benchmarks.PointNearPoint(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.PointNearPoint, use_projected_crs=args.pcs)),
             (postgis_group_name, "PointNearPoint2",
-             postgresql_benchmarks.PointNearPoint2(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.PointNearPoint2, use_projected_crs=args.pcs)),
             (postgis_group_name, "PointNearLine",
-             postgresql_benchmarks.PointNearLine(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.PointNearLine, use_projected_crs=args.pcs)),
             (postgis_group_name, "PointNearLine2",
-             postgresql_benchmarks.PointNearLine2(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.PointNearLine2, use_projected_crs=args.pcs)),
             (postgis_group_name, "PointNearPolygon",
-             postgresql_benchmarks.PointNearPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.PointNearPolygon, use_projected_crs=args.pcs)),
             (postgis_group_name, "SinglePointWithinPolygon",
-             postgresql_benchmarks.SinglePointWithinPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.SinglePointWithinPolygon, use_projected_crs=args.pcs)),
             (postgis_group_name, "LineNearPolygon",
-             postgresql_benchmarks.LineNearPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.LineNearPolygon, use_projected_crs=args.pcs)),
             (postgis_group_name, "SingleLineIntersectsPolygon",
-             postgresql_benchmarks.SingleLineIntersectsPolygon(use_projected_crs=args.pcs)),
+             BenchmarkSpec(postgresql_benchmarks.SingleLineIntersectsPolygon, use_projected_crs=args.pcs)),
         ])
 
     benchmarks = []
@@ -175,28 +195,6 @@ def main():
     elif args.mode == 'analysis':
         benchmarks = analysis_benchmarks
 
-    benchmark_data = dict([(benchmark[0], {}) for benchmark in benchmarks])
-    for idx, bnchmrk in enumerate(benchmarks):
-        if args.db != 'both':
-            if args.db == 'mysql' and "MySQL" not in bnchmrk[0]:
-                continue
-            if args.db == 'pg' and "Postgis" not in bnchmrk[0]:
-                continue
-        logger.info(f"Starting benchmark {idx+1}")
-        try:
-            bnchmrk[2].run()
-            logger.info(
-                f"Benchmark times: {bnchmrk[2].get_time_measurements()}")
-            logger.info(
-                f"Benchmark average time: {bnchmrk[2].get_average_time()}")
-            benchmark_data[bnchmrk[0]][bnchmrk[1]
-                                       ] = bnchmrk[2].get_average_time()
-            logger.info(f"Result Count: {len(bnchmrk[2].get_results())}")
-        except BenchmarkException as e:
-            logger.warning(f"Benchmark Exception: {str(e)}")
-            benchmark_data[bnchmrk[0]][bnchmrk[1]] = 0
-
-    # Save raw benchmark data to file
     output_file = ""
     if args.mode == 'join':
         output_file = 'join_benchmark'
@@ -209,15 +207,34 @@ def main():
         output_file += '_gcs'
     if args.parallel:
         output_file += '_parallel'
+    if args.storage != 'volume':
+        output_file += f"_{storage.get_file_label()}"
+    if args.profile is not None:
+        # The profiler overhead is included in the timings, which must not replace those of an unprofiled run
+        output_file += f"_profiled_{args.profile}"
+
+    checkpoint = Checkpoint(f"{output_file}_{args.db}", resume=args.resume)
+    fingerprints = {} if args.fingerprint else None
+    benchmark_data = run_benchmarks(benchmarks, checkpoint, retries=args.retries,
+                                    on_retry=lambda: start_container(db=args.db, storage=storage),
+                                    timeouts=parse_timeouts(args.timeout),
+                                    fingerprints=fingerprints, profile=args.profile,
+                                    startup_report=output_file, db=args.db,
+                                    compact_results=True)
 
-    with open(f"results/{output_file}.json", 'w') as file:
-        file.write(json.dumps(benchmark_data, indent=4))
+    # Save raw benchmark data to file
+    benchmark_data = save_benchmark_data(
+        output_file, benchmark_data, merge=args.merge_results)
+    if fingerprints is not None:
+        save_benchmark_data(f"{output_file}_fingerprints",
+                            fingerprints, merge=args.merge_results)
+    checkpoint.remove()
 
     create_bar_chart(benchmark_data, "Time to Run Query",
                      "Seconds", f"figures/{output_file}.png", yscale='log')
 
     if args.cleanup:
-        cleanup()
+        cleanup(db=args.db, storage=storage)
 
 
 if __name__ == "__main__":
@@ -5,6 +5,7 @@ import argparse
 from benchmark import mysql_benchmarks, postgresql_benchmarks
 from plotting.bar_chart import create_bar_chart
 from util.benchmark_helpers import init, cleanup
+from util.index_manager import MysqlIndexManager, PostgisIndexManager, get_dataset_tables
 
 """
 Benchmark for measuring dataset sizes
@@ -14,30 +15,39 @@ logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
+def measure_sizes(benchmarks, benchmark_data):
+    benchmark_data.update(dict([(benchmark[0], {}) for benchmark in benchmarks]))
+    for idx, bnchmrk in enumerate(benchmarks):
+        logger.info(f"Starting benchmark {idx+1}")
+        bnchmrk[2].run()
+        storage_space = bnchmrk[2].get_results()[0][0]
+        logger.info(f"Storage Space: {storage_space} megabytes")
+        benchmark_data[bnchmrk[0]][bnchmrk[1]] = storage_space
+        bnchmrk[2].close()
+
+
 def main():
+    # The datasets are loaded once and the index variants are switched in place
     init(create_spatial_index=True, postgis_index="GIST")
-
-    benchmarks = [
+    tables = get_dataset_tables()
+    mysql_index_manager = MysqlIndexManager(tables)
+    postgis_index_manager = PostgisIndexManager(tables)
+    # Refreshes the sizes reported by information_schema after the import
+    mysql_index_manager.switch(True)
+
+    benchmark_data = {}
+    measure_sizes([
         ("MySQL", "Airspaces", mysql_benchmarks.AirspacesSize()),
         ("MySQL", "Airports", mysql_benchmarks.AirportsSize()),
         ("MySQL", "Routes", mysql_benchmarks.RoutesSize()),
         ("Postgis (GIST Index)", "Airspaces", postgresql_benchmarks.AirspacesSize()),
         ("Postgis (GIST Index)", "Airports", postgresql_benchmarks.AirportsSize()),
         ("Postgis (GIST Index)", "Routes", postgresql_benchmarks.RoutesSize()),
-    ]
-
-    benchmark_data = dict([(benchmark[0], {}) for benchmark in benchmarks])
-    for idx, bnchmrk in enumerate(benchmarks):
-        logger.info(f"Starting benchmark {idx+1}")
-        bnchmrk[2].run()
-        storage_space = bnchmrk[2].get_results()[0][0]
-        logger.info(f"Storage Space: {storage_space} megabytes")
-        benchmark_data[bnchmrk[0]][bnchmrk[1]] = storage_space
+    ], benchmark_data)
 
-    cleanup()
-    init(create_spatial_index=False, postgis_index="NONE")
-
-    benchmarks = [
+    mysql_index_manager.switch(False)
+    postgis_index_manager.switch("NONE")
+    measure_sizes([
         ("MySQL (No Index)", "Airspaces", mysql_benchmarks.AirspacesSize()),
         ("MySQL (No Index)", "Airports", mysql_benchmarks.AirportsSize()),
         ("MySQL (No Index)", "Routes", mysql_benchmarks.RoutesSize()),
@@ -46,56 +56,27 @@ def main():
         ("Postgis (No Index)", "Airports",
          postgresql_benchmarks.AirportsSize()),
         ("Postgis (No Index)", "Routes", postgresql_benchmarks.RoutesSize()),
-    ]
+    ], benchmark_data)
 
-    benchmark_data.update(dict([(benchmark[0], {})
-                                for benchmark in benchmarks]))
-    for idx, bnchmrk in enumerate(benchmarks):
-        logger.info(f"Starting benchmark {idx+1}")
-        bnchmrk[2].run()
-        storage_space = bnchmrk[2].get_results()[0][0]
-        logger.info(f"Storage Space: {storage_space} megabytes")
-        benchmark_data[bnchmrk[0]][bnchmrk[1]] = storage_space
-
-    cleanup()
-    init(create_spatial_index=True, postgis_index="SPGIST")
-
-    benchmarks = [
+    postgis_index_manager.switch("SPGIST")
+    measure_sizes([
         ("Postgis (SPGIST Index)", "Airspaces",
          postgresql_benchmarks.AirspacesSize()),
         ("Postgis (SPGIST Index)", "Airports",
          postgresql_benchmarks.AirportsSize()),
         ("Postgis (SPGIST Index)", "Routes", postgresql_benchmarks.RoutesSize()),
-    ]
+    ], benchmark_data)
 
-    benchmark_data.update(dict([(benchmark[0], {})
-                                for benchmark in benchmarks]))
-    for idx, bnchmrk in enumerate(benchmarks):
-        logger.info(f"Starting benchmark {idx+1}")
-        bnchmrk[2].run()
-        storage_space = bnchmrk[2].get_results()[0][0]
-        logger.info(f"Storage Space: {storage_space} megabytes")
-        benchmark_data[bnchmrk[0]][bnchmrk[1]] = storage_space
-
-    cleanup()
-    init(create_spatial_index=True, postgis_index="BRIN")
-
-    benchmarks = [
+    postgis_index_manager.switch("BRIN")
+    measure_sizes([
         ("Postgis (BRIN Index)", "Airspaces",
          postgresql_benchmarks.AirspacesSize()),
         ("Postgis (BRIN Index)", "Airports",
          postgresql_benchmarks.AirportsSize()),
         ("Postgis (BRIN Index)", "Routes", postgresql_benchmarks.RoutesSize()),
-    ]
-
-    benchmark_data.update(dict([(benchmark[0], {})
-                                for benchmark in benchmarks]))
-    for idx, bnchmrk in enumerate(benchmarks):
-        logger.info(f"Starting benchmark {idx+1}")
-        bnchmrk[2].run()
-        storage_space = bnchmrk[2].get_results()[0][0]
-        logger.info(f"Storage Space: {storage_space} megabytes")
-        benchmark_data[bnchmrk[0]][bnchmrk[1]] = storage_space
+    ], benchmark_data)
+    mysql_index_manager.close()
+    postgis_index_manager.close()
 
     # Save raw benchmark data to file
     output_file = "storage_size_benchmark"
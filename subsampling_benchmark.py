@@ -4,7 +4,10 @@ import json
 import argparse
 from benchmark import mysql_benchmarks, postgresql_benchmarks
 from plotting.subsampling_benchmark_graph import create_line_graph
-from util.benchmark_helpers import init, cleanup, start_container
+from benchmark.benchmark import BenchmarkSpec
+from util.benchmark_helpers import init, cleanup, start_container, run_benchmarks
+from util.checkpoint import Checkpoint
+from util.query_timeout import parse_timeouts
 
 """
 Benchmark for spatial join and analysis queries
@@ -28,6 +31,12 @@ parser.add_argument('--pg-index', dest='pg_index', action='store', default='GIST
                     help='Select postgis index (GIST/SPGIST/BRIN/NONE)')
 parser.add_argument('--mysql-noindex', dest='mysql_index', action='store_const', const=False, default=True,
                     help='Disable MySQL index')
+parser.add_argument('--resume', dest='resume', action='store_const', const=True, default=False,
+                    help='Skip benchmarks completed by a previous interrupted run')
+parser.add_argument('--retries', dest='retries', action='store', type=int, default=2,
+                    help='Number of times a failed benchmark is retried')
+parser.add_argument('--timeout', dest='timeout', action='store', default=None,
+                    help='Query timeout in seconds, optionally per benchmark (e.g. 600,PolygonDisjointPolygon=3600)')
 args = parser.parse_args()
 
 logging.basicConfig(level=logging.INFO)
@@ -69,11 +78,11 @@ def main():
             if t[0] == "MySQL":
                 group_suffix = " (No Index)" if not args.mysql_index else ""
                 join_benchmarks.append(
-                    (f"{t[0]}: {t[1]}{group_suffix}", 1/s, t[2](subsampling_factor=s)))
+                    (f"{t[0]}: {t[1]}{group_suffix}", 1/s, BenchmarkSpec(t[2], subsampling_factor=s)))
             else:
                 group_suffix = f" ({args.pg_index})"
                 join_benchmarks.append(
-                    (f"{t[0]}: {t[1]}{group_suffix}", 1/s, t[2](subsampling_factor=s)))
+                    (f"{t[0]}: {t[1]}{group_suffix}", 1/s, BenchmarkSpec(t[2], subsampling_factor=s)))
 
     analysis_benchmarks_template = [
         ("MySQL", "RetrievePoints", mysql_benchmarks.RetrievePoints),
@@ -96,11 +105,11 @@ def main():
             if t[0] == "MySQL":
                 group_suffix = " (No Index)" if not args.mysql_index else ""
                 analysis_benchmarks.append(
-                    (f"{t[0]}: {t[1]}{group_suffix}", 1/s, t[2](subsampling_factor=s)))
+                    (f"{t[0]}: {t[1]}{group_suffix}", 1/s, BenchmarkSpec(t[2], subsampling_factor=s)))
             else:
                 group_suffix = f" ({args.pg_index})"
                 analysis_benchmarks.append(
-                    (f"{t[0]}: {t[1]}{group_suffix}", 1/s, t[2](subsampling_factor=s)))
+                    (f"{t[0]}: {t[1]}{group_suffix}", 1/s, BenchmarkSpec(t[2], subsampling_factor=s)))
 
     benchmarks = []
     if args.mode == 'join':
@@ -108,16 +117,6 @@ def main():
     elif args.mode == 'analysis':
         benchmarks = analysis_benchmarks
 
-    benchmark_data = dict([(benchmark[0], {}) for benchmark in benchmarks])
-    for idx, bnchmrk in enumerate(benchmarks):
-        logger.info(f"Starting benchmark {idx+1}")
-        bnchmrk[2].run()
-        logger.info(f"Benchmark times: {bnchmrk[2].get_time_measurements()}")
-        logger.info(f"Benchmark average time: {bnchmrk[2].get_average_time()}")
-        benchmark_data[bnchmrk[0]][bnchmrk[1]] = bnchmrk[2].get_average_time()
-        logger.info(f"Result Count: {len(bnchmrk[2].get_results())}")
-
-    # Save raw benchmark data to file
     output_file = ""
     if args.mode == 'join':
         output_file = 'subsampling_join_benchmark'
@@ -127,8 +126,16 @@ def main():
         output_file += '_no_mysql_index'
     output_file += f"_pg_index_{args.pg_index}"
 
+    checkpoint = Checkpoint(output_file, resume=args.resume)
+    benchmark_data = run_benchmarks(benchmarks, checkpoint, retries=args.retries,
+                                    on_retry=start_container,
+                                    timeouts=parse_timeouts(args.timeout),
+                                    compact_results=True)
+
+    # Save raw benchmark data to file
     with open(f"results/{output_file}.json", 'w') as file:
         file.write(json.dumps(benchmark_data, indent=4))
+    checkpoint.remove()
 
     create_line_graph(benchmark_data, "Time to Run Query With Different Dataset Sizes", "Size of Dataset Relative to Original",
                       "Seconds", f"figures/{output_file}.png", yscale='linear')
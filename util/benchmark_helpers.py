@@ -1,36 +1,294 @@
 import docker
+import fcntl
+import itertools
+import json
+import os
+import re
+import resource
+import time
 from mysqlutils.mysqladapter import MySQLAdapter
 from mysqlutils.mysqldockerwrapper import MySqlDockerWrapper
 from postgis_docker_wrapper.postgisadapter import PostgisAdapter
 from postgis_docker_wrapper.postgisdockerwrapper import PostgisDockerWrapper
 from gdal.gdaldockerwrapper import GdalDockerWrapper
+from benchmark.benchmark import BenchmarkSpec
+from benchmark.benchmark_exception import BenchmarkException, BenchmarkTimeoutException
+from util.query_timeout import censored_measurement
+from util.table_maintenance import get_default_steps, run_post_load_maintenance
 
 import logging
 
+# Fallback for get_process_start_time
+_IMPORT_TIME = time.time()
 
-def init(create_spatial_index=True, import_gcs=False, postgis_index="GIST", parallel_query_execution=False):
+
+def append_result_entry(output_file, entry):
+    """Appends entry to the list in the JSON file output_file. The file is locked while it is
+    read and rewritten, since concurrent processes (see parallel_run.py) append to the same files."""
+    with open(f"{output_file}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        entries = []
+        if os.path.exists(output_file):
+            with open(output_file, 'r') as file:
+                entries = json.loads(file.read())
+        entries.append(entry)
+        with open(output_file, 'w') as file:
+            file.write(json.dumps(entries, indent=4))
+
+
+def record_startup_metrics(mysql_docker, postgis_docker, db='both', output_file="results/container_startup.json"):
+    """Appends the time-to-ready and the resource limits of the started containers to the startup results file.
+    db is the databases that were started (both/mysql/pg)"""
+    entry = {"timestamp": time.time(), "resource_limits": {}}
+    started = []
+    if db != 'pg':
+        started.append(("MySQL", mysql_docker))
+    if db != 'mysql':
+        started.append(("Postgis", postgis_docker))
+    for name, docker_wrapper in started:
+        entry[name] = docker_wrapper.time_to_ready
+        if docker_wrapper.resource_limits is not None:
+            entry["resource_limits"][name] = str(docker_wrapper.resource_limits)
+    append_result_entry(output_file, entry)
+
+
+def save_benchmark_data(output_file, benchmark_data, merge=False):
+    """Writes benchmark data to results/<output_file>.json and returns what was written.
+    With merge, groups already in the file are kept so that several processes
+    (e.g. the MySQL and PostGIS halves of a run) can write to the same file."""
+    path = f"results/{output_file}.json"
+    with open(f"{path}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        if merge and os.path.exists(path):
+            with open(path, 'r') as file:
+                merged_data = json.loads(file.read())
+            for group, values in benchmark_data.items():
+                merged_data.setdefault(group, {}).update(values)
+            benchmark_data = merged_data
+        with open(path, 'w') as file:
+            file.write(json.dumps(benchmark_data, indent=4))
+    return benchmark_data
+
+
+def expand_grid(grid, strategy):
+    """Returns a list of settings dictionaries, the first of which is the baseline.
+    strategy 'oat' varies one parameter at a time from the baseline, 'full' runs the cartesian grid."""
+    baseline = dict((name, values[0]) for name, values in grid.items())
+    if strategy == 'full':
+        names = list(grid.keys())
+        return [dict(zip(names, values)) for values in itertools.product(*grid.values())]
+    configs = [baseline]
+    for name, values in grid.items():
+        for value in values[1:]:
+            configs.append({**baseline, name: value})
+    return configs
+
+
+def run_benchmarks(benchmarks, checkpoint, retries=2, retry_delay=10, on_retry=None, failure_value=0,
+                   timeouts=None, fingerprints=None, profile=None, startup_report=None, db='both',
+                   compact_results=False):
+    """Runs a list of (group, label, benchmark) tuples and returns {group: {label: average time}}.
+    The benchmark can be a BenchmarkSpec, in which case it is only created (and connected) right
+    before it runs, created again for a retry, and closed once it is done. A benchmark instance is
+    retried on its own connections, whose open transactions are rolled back first.
+    Each result is written to the checkpoint as soon as the benchmark finishes, and benchmarks
+    already in the checkpoint are skipped. Failed benchmarks are retried with exponential backoff,
+    calling on_retry first (e.g. to restart a container), and are recorded as failure_value.
+    timeouts maps benchmark names (and None for the default) to seconds, see parse_timeouts;
+    benchmarks that time out are recorded as censored measurements and are not retried.
+    If fingerprints is a dictionary, the result fingerprints of the benchmarks are added to it.
+    compact_results keeps the results as IntegerColumns instead of lists of tuples.
+    profile (cprofile/sample) profiles every benchmark to results/profiles/<group>_<label>.*
+    With startup_report, the time to the first benchmark and the idle connections on the
+    servers of db at that point are recorded under that name, see record_harness_startup."""
+    logger = logging.getLogger(__name__)
+    benchmark_data = dict([(benchmark[0], {}) for benchmark in benchmarks])
+    for idx, (group, label, bnchmrk) in enumerate(benchmarks):
+        key = f"{group}/{label}"
+        if checkpoint.is_done(key):
+            logger.info(f"Skipping benchmark {idx+1} ({key}), already completed")
+            benchmark_data[group][label] = checkpoint.get(key)
+            continue
+        logger.info(f"Starting benchmark {idx+1}")
+        spec = bnchmrk if isinstance(bnchmrk, BenchmarkSpec) else None
+        profile_name = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{group}_{label}")
+        attempts = checkpoint.get_attempts(key)
+        delay = retry_delay
+        for attempt in range(retries + 1):
+            attempts += 1
+            try:
+                if spec is not None:
+                    bnchmrk = None
+                    bnchmrk = _create_benchmark(spec)
+                if fingerprints is not None:
+                    bnchmrk.enable_fingerprint()
+                if compact_results:
+                    bnchmrk.enable_compact_results()
+                if profile is not None:
+                    bnchmrk.enable_profiling(profile_name, mode=profile)
+                if timeouts is not None:
+                    bnchmrk.set_timeout(timeouts.get(
+                        type(bnchmrk).__name__, timeouts.get(None)))
+                if startup_report is not None:
+                    record_harness_startup(startup_report, db=db)
+                    startup_report = None
+                bnchmrk.run()
+            except BenchmarkTimeoutException as e:
+                logger.warning(f"Benchmark Timeout: {str(e)}")
+                benchmark_data[group][label] = censored_measurement(e.timeout)
+                checkpoint.record(
+                    key, benchmark_data[group][label], attempts=attempts)
+                break
+            except BenchmarkException as e:
+                logger.warning(f"Benchmark Exception: {str(e)}")
+                if attempt == retries:
+                    checkpoint.record_failure(key, str(e), attempts=attempts)
+                    benchmark_data[group][label] = failure_value
+                    break
+                logger.info(f"Retrying {key} in {delay} seconds")
+                time.sleep(delay)
+                delay *= 2
+                if bnchmrk is not None:
+                    bnchmrk.time_measurements = []
+                if on_retry is not None:
+                    on_retry()
+                if spec is None:
+                    try:
+                        bnchmrk.rollback()
+                    except Exception:
+                        logger.exception("Could not roll back the connections of the benchmark: ")
+                continue
+            finally:
+                if spec is not None and bnchmrk is not None:
+                    _close_benchmark(bnchmrk)
+            logger.info(
+                f"Benchmark times: {bnchmrk.get_time_measurements()}")
+            logger.info(
+                f"Benchmark average time: {bnchmrk.get_average_time()}")
+            logger.info(f"Result Count: {bnchmrk.get_result_count()}")
+            logger.info(
+                f"Peak client RSS: {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024} megabytes")
+            benchmark_data[group][label] = bnchmrk.get_average_time()
+            if fingerprints is not None and bnchmrk.fingerprint is not None:
+                fingerprints.setdefault(group, {})[label] = bnchmrk.fingerprint.to_dict()
+            checkpoint.record(
+                key, benchmark_data[group][label], attempts=attempts)
+            break
+    return benchmark_data
+
+
+def _create_benchmark(spec):
+    try:
+        return spec.create()
+    except Exception as e:
+        logging.getLogger(__name__).exception("Exception: ")
+        raise BenchmarkException(f"Error creating benchmark: {e}")
+
+
+def _close_benchmark(bnchmrk):
+    try:
+        bnchmrk.close()
+    except Exception:
+        logging.getLogger(__name__).exception("Could not close benchmark: ")
+
+
+def get_process_start_time():
+    """Wall clock time at which this process started, from /proc on Linux"""
+    try:
+        with open("/proc/self/stat", 'r') as file:
+            # Fields after the command name, which may contain spaces; starttime is field 22
+            start_ticks = int(file.read().rsplit(")", 1)[1].split()[19])
+        with open("/proc/uptime", 'r') as file:
+            uptime = float(file.read().split()[0])
+    except (OSError, ValueError, IndexError):
+        return _IMPORT_TIME
+    return time.time() - (uptime - start_ticks / os.sysconf("SC_CLK_TCK"))
+
+
+def count_idle_connections(db='both'):
+    """Client connections open on the database servers that are not running a query"""
+    counts = {}
+    if db != 'pg':
+        adapter = MySQLAdapter('root', 'root-password')
+        counts["MySQL"] = adapter.execute(
+            "SELECT COUNT(*) FROM information_schema.PROCESSLIST WHERE COMMAND = 'Sleep'")[0][0]
+        adapter.close()
+    if db != 'mysql':
+        adapter = PostgisAdapter("postgres", "root-password")
+        counts["Postgis"] = adapter.execute(
+            "SELECT COUNT(*) FROM pg_stat_activity WHERE backend_type = 'client backend' AND state LIKE 'idle%'")[0][0]
+        adapter.close()
+    return counts
+
+
+def record_harness_startup(name, db='both', output_file="results/harness_startup.json"):
+    """Appends the time from the start of the process to the first benchmark and the number
+    of idle connections at that point to the harness startup results file"""
+    time_to_first_benchmark = time.time() - get_process_start_time()
+    try:
+        idle_connections = count_idle_connections(db)
+    except Exception:
+        logging.getLogger(__name__).exception("Could not count idle connections: ")
+        idle_connections = None
+    logging.getLogger(__name__).info(
+        f"Time to first benchmark: {time_to_first_benchmark} seconds, idle connections: {idle_connections}")
+    append_result_entry(output_file, {
+        "timestamp": time.time(),
+        "name": name,
+        "time_to_first_benchmark": time_to_first_benchmark,
+        "idle_connections": idle_connections,
+    })
+
+
+def init(create_spatial_index=True, import_gcs=False, postgis_index="GIST", parallel_query_execution=False,
+         mysql_settings=None, pg_settings=None, resource_limits=None, storage=None, db='both', maintenance=None):
+    """db selects which database is started and loaded (both/mysql/pg)
+    maintenance is the list of post-load maintenance steps (see util.table_maintenance),
+    None runs the default steps and an empty list skips the stage"""
     # TODO: Woradorn make spatial index a string for postgis
     print(
         f"Creating containers with gcs={import_gcs} mysql_index={create_spatial_index} pg_index={postgis_index}")
     logging.basicConfig(level=logging.INFO)
-    logger = logging.getLogger(__name__)
 
     docker_client = docker.from_env()
-    mysql_docker = MySqlDockerWrapper(docker_client)
-    mysql_docker.start_container()
+    gdal_docker_wrapper = GdalDockerWrapper(docker_client)
+    mysql_docker = MySqlDockerWrapper(
+        docker_client, resource_limits=resource_limits, storage=storage)
+    postgis_docker_wrapper = PostgisDockerWrapper(
+        docker_client, resource_limits=resource_limits, storage=storage)
+
+    if db != 'pg':
+        mysql_docker.start_container(server_settings=mysql_settings)
+    if db != 'mysql':
+        postgis_docker_wrapper.start_container(
+            parallel_query_execution=parallel_query_execution, server_settings=pg_settings)
+    record_startup_metrics(mysql_docker, postgis_docker_wrapper, db=db)
+
+    if db != 'pg':
+        init_mysql(gdal_docker_wrapper, create_spatial_index, import_gcs)
+    if db != 'mysql':
+        init_postgis(gdal_docker_wrapper, postgis_docker_wrapper,
+                     postgis_index, import_gcs)
 
-    postgis_docker_wrapper = PostgisDockerWrapper(docker_client)
-    postgis_docker_wrapper.start_container(
-        parallel_query_execution=parallel_query_execution)
+    if maintenance is None:
+        maintenance = get_default_steps()
+    if maintenance:
+        run_post_load_maintenance(maintenance, import_gcs=import_gcs, db=db)
 
-    # Create schema
+
+def create_mysql_schema():
+    """(Re)creates the empty schema the datasets are imported into"""
     mysql_adapter = MySQLAdapter("root", "root-password")
     schema_name = "SpatialDatasets"
     if schema_name in mysql_adapter.get_schemas():
         mysql_adapter.execute(f"DROP SCHEMA {schema_name}")
     mysql_adapter.execute(f"CREATE SCHEMA {schema_name}")
+    mysql_adapter.close()
+
+
+def init_mysql(gdal_docker_wrapper, create_spatial_index=True, import_gcs=False):
+    create_mysql_schema()
 
-    gdal_docker_wrapper = GdalDockerWrapper(docker_client)
     gdal_docker_wrapper.import_to_mysql(
         "airspace_3857/Class_Airspace.shp", "airspaces_3857", create_spatial_index=create_spatial_index)
     gdal_docker_wrapper.import_to_mysql(
@@ -46,6 +304,12 @@ def init(create_spatial_index=True, import_gcs=False, postgis_index="GIST", para
         gdal_docker_wrapper.import_to_mysql(
             "routes/ATS_Route.shp", "routes", create_spatial_index=create_spatial_index)
 
+
+def create_postgis_database(postgis_docker_wrapper):
+    """Creates the database the datasets are imported into with the PostGIS extensions
+    and returns a persisting adapter connected to it"""
+    logger = logging.getLogger(__name__)
+
     # Postgis
     # Recreate schema
     schema_name = "spatialdatasets"
@@ -72,6 +336,13 @@ def init(create_spatial_index=True, import_gcs=False, postgis_index="GIST", para
         "CREATE EXTENSION IF NOT EXISTS postgis_topology;"))
     logger.info(postgis_adapter.execute_nontransaction(
         "CREATE EXTENSION IF NOT EXISTS postgis_sfcgal;"))
+    return postgis_adapter
+
+
+def init_postgis(gdal_docker_wrapper, postgis_docker_wrapper, postgis_index="GIST", import_gcs=False):
+    logger = logging.getLogger(__name__)
+    schema_name = "spatialdatasets"
+    postgis_adapter = create_postgis_database(postgis_docker_wrapper)
 
     # Import airports
     logger.info(gdal_docker_wrapper.import_to_postgis(
@@ -116,24 +387,63 @@ def init(create_spatial_index=True, import_gcs=False, postgis_index="GIST", para
         f"SELECT table_name FROM information_schema.tables WHERE table_schema = 'public' ORDER BY table_name;"))
 
 
-def start_container():
+def start_container(db='both', storage=None):
+    """storage is the util.docker_storage.DataStorage the containers were created with by init"""
     print("Reusing containers")
+    if storage is not None and storage.is_ephemeral():
+        logging.getLogger(__name__).warning(
+            f"A container that was stopped has lost the data it kept on {storage.kind}, load it again with --init")
     docker_client = docker.from_env()
-    mysql_docker = MySqlDockerWrapper(docker_client)
-    mysql_docker.start_container()
-    postgis_docker_wrapper = PostgisDockerWrapper(docker_client)
-    postgis_docker_wrapper.start_container()
+    mysql_docker = MySqlDockerWrapper(docker_client, storage=storage)
+    if db != 'pg':
+        mysql_docker.start_container()
+    postgis_docker_wrapper = PostgisDockerWrapper(docker_client, storage=storage)
+    if db != 'mysql':
+        postgis_docker_wrapper.start_container()
+    record_startup_metrics(mysql_docker, postgis_docker_wrapper, db=db)
+
+
+def recreate_containers(mysql_settings=None, pg_settings=None, parallel_query_execution=False, db='both',
+                        resource_limits=None, storage=None):
+    """Replaces the containers with new ones using the given server settings and resource limits.
+    The data volumes are kept, so the datasets do not need to be reloaded."""
+    if storage is not None and storage.is_ephemeral():
+        raise ValueError(
+            f"Cannot recreate containers that keep their data on {storage.kind}")
+    docker_client = docker.from_env()
+    mysql_docker = MySqlDockerWrapper(
+        docker_client, resource_limits=resource_limits, storage=storage)
+    if db != 'pg':
+        mysql_docker.stop_container()
+        mysql_docker.remove_container()
+        mysql_docker.start_container(server_settings=mysql_settings)
+
+    postgis_docker = PostgisDockerWrapper(
+        docker_client, resource_limits=resource_limits, storage=storage)
+    if db != 'mysql':
+        postgis_docker.stop_container()
+        postgis_docker.remove_container()
+        postgis_docker.start_container(
+            parallel_query_execution=parallel_query_execution, server_settings=pg_settings)
+    record_startup_metrics(mysql_docker, postgis_docker, db=db)
 
 
-def cleanup():
+def cleanup(db='both', storage=None):
+    """storage is the util.docker_storage.DataStorage the containers were created with by init,
+    only a named volume is removed"""
     docker_client = docker.from_env()
-    mysql_docker = MySqlDockerWrapper(docker_client)
+    if db != 'pg':
+        mysql_docker = MySqlDockerWrapper(docker_client, storage=storage)
+        mysql_docker.stop_container()
+        mysql_docker.remove_container()
+        mysql_docker.remove_volume()
 
-    mysql_docker.stop_container()
-    mysql_docker.remove_container()
-    mysql_docker.remove_volume()
+    if db != 'mysql':
+        postgis_docker = PostgisDockerWrapper(docker_client, storage=storage)
+        postgis_docker.stop_container()
+        postgis_docker.remove_container()
+        postgis_docker.remove_volume()
 
-    postgis_docker = PostgisDockerWrapper(docker_client)
-    postgis_docker.stop_container()
-    postgis_docker.remove_container()
-    postgis_docker.remove_volume()
+    # The GDAL worker belongs to the instance (SDB_INSTANCE) rather than to a database, and is
+    # started again on demand, so it is removed whichever databases are cleaned up
+    GdalDockerWrapper(docker_client).remove_container()
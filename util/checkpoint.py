@@ -0,0 +1,53 @@
+import json
+import os
+import time
+
+"""
+Checkpoint files that record completed benchmarks so an interrupted run can be resumed
+"""
+
+
+class Checkpoint:
+    """Persists the result of every completed benchmark to results/checkpoints/<name>.json
+    as soon as it finishes. Entries are keyed by a string such as "<group>/<benchmark>"."""
+
+    def __init__(self, name, resume=False, directory="results/checkpoints"):
+        self.path = f"{directory}/{name}.json"
+        self.entries = {}
+        os.makedirs(directory, exist_ok=True)
+        if resume and os.path.exists(self.path):
+            with open(self.path, 'r') as file:
+                self.entries = json.loads(file.read())
+
+    def is_done(self, key):
+        return key in self.entries and self.entries[key]["status"] == "done"
+
+    def get(self, key):
+        return self.entries[key]["value"]
+
+    def get_attempts(self, key):
+        return self.entries[key]["attempts"] if key in self.entries else 0
+
+    def record(self, key, value, attempts=1):
+        self._write_entry(key, {"status": "done", "value": value,
+                                "attempts": attempts, "timestamp": time.time()})
+
+    def record_failure(self, key, error, attempts=1):
+        """Failed entries are kept for the report but are run again on resume"""
+        self._write_entry(key, {"status": "failed", "error": error,
+                                "attempts": attempts, "timestamp": time.time()})
+
+    def _write_entry(self, key, entry):
+        self.entries[key] = entry
+        # Write to a temporary file first so a crash never leaves a truncated checkpoint
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as file:
+            file.write(json.dumps(self.entries, indent=4))
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, self.path)
+
+    def remove(self):
+        """Deletes the checkpoint once the run has completed"""
+        if os.path.exists(self.path):
+            os.remove(self.path)
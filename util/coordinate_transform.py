@@ -1,7 +1,37 @@
-from pyproj import Transformer
+import threading
+import numpy as np
+
+"""
+Coordinate transformations. Transformers are expensive to create, so one is kept per CRS pair
+(and per thread, since pyproj transformers must not be shared between threads).
+Axis order follows the CRS definitions, e.g. (lat, lon) for EPSG:4326.
+"""
+
+_transformers = threading.local()
+
+
+def get_transformer(source_crs, target_crs):
+    """Returns the cached transformer from source_crs to target_crs"""
+    cache = getattr(_transformers, "cache", None)
+    if cache is None:
+        cache = _transformers.cache = {}
+    key = (source_crs, target_crs)
+    if key not in cache:
+        # Imported on first use so importing the benchmark modules does not load pyproj
+        from pyproj import Transformer
+        cache[key] = Transformer.from_crs(source_crs, target_crs)
+    return cache[key]
+
+
+def transform_points(points, source_crs="epsg:4326", target_crs="epsg:3857"):
+    """Transforms an array-like of shape (n, 2) in one call and returns a NumPy array of shape (n, 2)"""
+    coordinates = np.asarray(points, dtype=np.float64)
+    x, y = get_transformer(source_crs, target_crs).transform(
+        coordinates[:, 0], coordinates[:, 1])
+    return np.column_stack((x, y))
 
 
 def transform_4326_to_3857(point):
-    transformer = Transformer.from_crs("epsg:4326", "epsg:3857")
-    x, y = transformer.transform(point[0], point[1])
+    x, y = get_transformer("epsg:4326", "epsg:3857").transform(
+        point[0], point[1])
     return (x, y)
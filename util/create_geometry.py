@@ -1,3 +1,7 @@
+import struct
+import numpy as np
+
+
 def create_polygon(points):
     wkt = "'POLYGON(("
     points_text = [f"{point[0]} {point[1]}" for point in points]
@@ -14,3 +18,58 @@ def create_linestring(points):
     wkt += ", ".join(points_text)
     wkt += ")'"
     return wkt
+
+
+# WKB geometry types and the EWKB flag that marks an embedded SRID
+WKB_POINT = 1
+WKB_LINESTRING = 2
+WKB_POLYGON = 3
+WKB_MULTIPOINT = 4
+WKB_MULTILINESTRING = 5
+WKB_MULTIPOLYGON = 6
+EWKB_SRID_FLAG = 0x20000000
+
+
+def _wkb_header(geometry_type, srid=None):
+    """Little endian header; with an srid the result is PostGIS EWKB"""
+    if srid is None:
+        return struct.pack("<BI", 1, geometry_type)
+    return struct.pack("<BII", 1, geometry_type | EWKB_SRID_FLAG, srid)
+
+
+def _wkb_coordinates(points):
+    coordinates = np.asarray(points, dtype="<f8").reshape(-1, 2)
+    return struct.pack("<I", len(coordinates)) + coordinates.tobytes()
+
+
+def create_point_wkb(point, srid=None):
+    return _wkb_header(WKB_POINT, srid) + np.asarray(point, dtype="<f8").reshape(2).tobytes()
+
+
+def create_linestring_wkb(points, srid=None):
+    return _wkb_header(WKB_LINESTRING, srid) + _wkb_coordinates(points)
+
+
+def create_polygon_wkb(points, srid=None, interior_rings=()):
+    """points is the exterior ring, interior_rings a list of rings of the holes"""
+    rings = [points] + list(interior_rings)
+    return _wkb_header(WKB_POLYGON, srid) + struct.pack("<I", len(rings)) + \
+        b"".join(_wkb_coordinates(ring) for ring in rings)
+
+
+def create_multipoint_wkb(points, srid=None):
+    points = np.asarray(points, dtype="<f8").reshape(-1, 2)
+    return _wkb_header(WKB_MULTIPOINT, srid) + struct.pack("<I", len(points)) + \
+        b"".join(create_point_wkb(point) for point in points)
+
+
+def create_multilinestring_wkb(lines, srid=None):
+    return _wkb_header(WKB_MULTILINESTRING, srid) + struct.pack("<I", len(lines)) + \
+        b"".join(create_linestring_wkb(line) for line in lines)
+
+
+def create_multipolygon_wkb(polygons, srid=None):
+    """polygons is a list of polygons, each a list of rings starting with the exterior ring"""
+    return _wkb_header(WKB_MULTIPOLYGON, srid) + struct.pack("<I", len(polygons)) + \
+        b"".join(create_polygon_wkb(rings[0], interior_rings=rings[1:])
+                 for rings in polygons)
@@ -0,0 +1,38 @@
+"""
+CPU and memory limits for the docker containers
+"""
+
+
+class ResourceLimits:
+    """cpuset_cpus is a docker cpuset such as "0-3", cpus is a (fractional) number of CPUs
+    enforced with the CFS quota, and mem_limit is a docker size such as "16g"."""
+
+    def __init__(self, cpuset_cpus=None, cpus=None, cpu_period=100000, mem_limit=None, memswap_limit=None):
+        self.cpuset_cpus = cpuset_cpus
+        self.cpus = cpus
+        self.cpu_period = cpu_period
+        self.mem_limit = mem_limit
+        # Default to no swap so the memory limit is a hard limit
+        self.memswap_limit = memswap_limit if memswap_limit is not None else mem_limit
+
+    @staticmethod
+    def for_cores(core_count, first_core=0, mem_limit=None):
+        """Pins the container to core_count cores starting at first_core"""
+        return ResourceLimits(cpuset_cpus=f"{first_core}-{first_core + core_count - 1}",
+                              cpus=core_count, mem_limit=mem_limit)
+
+    def to_docker_kwargs(self):
+        """Keyword arguments accepted by both containers.run and container.update"""
+        kwargs = {}
+        if self.cpuset_cpus is not None:
+            kwargs["cpuset_cpus"] = self.cpuset_cpus
+        if self.cpus is not None:
+            kwargs["cpu_period"] = self.cpu_period
+            kwargs["cpu_quota"] = int(self.cpus * self.cpu_period)
+        if self.mem_limit is not None:
+            kwargs["mem_limit"] = self.mem_limit
+            kwargs["memswap_limit"] = self.memswap_limit
+        return kwargs
+
+    def __str__(self):
+        return f"cpuset={self.cpuset_cpus} cpus={self.cpus} memory={self.mem_limit}"
@@ -0,0 +1,109 @@
+"""
+Storage backends for the data directory of the database containers
+"""
+
+_SIZE_UNITS = {"k": 1024, "m": 1024 ** 2, "g": 1024 ** 3}
+
+
+def parse_size(size):
+    """Converts a size such as 50mb, 512k or 1048576 to bytes"""
+    size = str(size).strip().lower().rstrip("b")
+    if size and size[-1] in _SIZE_UNITS:
+        return int(float(size[:-1]) * _SIZE_UNITS[size[-1]])
+    return int(size)
+
+
+class DataStorage:
+    """kind is 'volume' (the named docker volume, default), 'tmpfs' (in memory)
+    or 'bind' (a host path, e.g. on a specific disk).
+    throttled_device is a host block device such as /dev/sda whose reads and writes
+    are limited to read_bps / write_bps bytes per second."""
+
+    def __init__(self, kind='volume', path=None, tmpfs_size=None,
+                 throttled_device=None, read_bps=None, write_bps=None):
+        if kind not in ('volume', 'tmpfs', 'bind'):
+            raise ValueError(f"Unknown storage kind {kind}")
+        if kind == 'bind' and path is None:
+            raise ValueError("Bind storage requires a host path")
+        self.kind = kind
+        self.path = path
+        self.tmpfs_size = tmpfs_size
+        self.throttled_device = throttled_device
+        self.read_bps = read_bps
+        self.write_bps = write_bps
+        self.validate()
+
+    def validate(self):
+        if self.kind == 'tmpfs' and self.throttled_device is not None:
+            # tmpfs lives in memory, the block device limits would not apply to it
+            raise ValueError("tmpfs storage cannot be throttled")
+
+    @staticmethod
+    def from_spec(spec):
+        """Parses a command line storage specification. Examples:
+            volume
+            tmpfs or tmpfs:8g
+            bind:/mnt/hdd/postgis
+            volume,throttled:/dev/sda:50mb or volume,throttled:/dev/sda:50mb:20mb (read:write)
+        """
+        storage = DataStorage()
+        for part in spec.split(','):
+            fields = part.split(':')
+            if fields[0] == 'volume':
+                storage.kind = 'volume'
+            elif fields[0] == 'tmpfs':
+                storage.kind = 'tmpfs'
+                storage.tmpfs_size = fields[1] if len(fields) > 1 else None
+            elif fields[0] == 'bind':
+                storage.kind = 'bind'
+                storage.path = ':'.join(fields[1:])
+            elif fields[0] == 'throttled':
+                storage.throttled_device = fields[1]
+                storage.read_bps = parse_size(fields[2])
+                if len(fields) > 3:
+                    storage.write_bps = parse_size(fields[3])
+            else:
+                raise ValueError(f"Unknown storage specification {part}")
+        storage.validate()
+        return storage
+
+    def is_ephemeral(self):
+        """True if the data is lost when the container is removed"""
+        return self.kind == 'tmpfs'
+
+    def get_label(self):
+        """Short name used in benchmark group names"""
+        label = self.kind
+        if self.throttled_device is not None:
+            label += f" throttled {self.read_bps}Bps"
+        return label
+
+    def get_file_label(self):
+        """Short name used in result file names"""
+        label = self.kind
+        if self.throttled_device is not None:
+            label += "_throttled"
+        return label
+
+    def to_docker_kwargs(self, volume_name, data_folder, subfolder=None):
+        """Keyword arguments for containers.run that place data_folder on this storage.
+        subfolder separates the containers when several share a bind path."""
+        kwargs = {}
+        if self.kind == 'volume':
+            kwargs["volumes"] = {volume_name: {
+                'bind': data_folder, 'mode': 'rw'}}
+        elif self.kind == 'bind':
+            host_path = self.path if subfolder is None else f"{self.path}/{subfolder}"
+            kwargs["volumes"] = {host_path: {
+                'bind': data_folder, 'mode': 'rw'}}
+        elif self.kind == 'tmpfs':
+            options = "" if self.tmpfs_size is None else f"size={self.tmpfs_size}"
+            kwargs["tmpfs"] = {data_folder: options}
+        if self.throttled_device is not None:
+            if self.read_bps is not None:
+                kwargs["device_read_bps"] = [
+                    {"Path": self.throttled_device, "Rate": self.read_bps}]
+            if self.write_bps is not None:
+                kwargs["device_write_bps"] = [
+                    {"Path": self.throttled_device, "Rate": self.write_bps}]
+        return kwargs
@@ -0,0 +1,209 @@
+import itertools
+import json
+
+"""
+Declarative experiment matrix and a planner that groups the runs sharing a loaded database state.
+A run of a benchmark script needs each of its backends loaded with a given index (and the
+geographic datasets for runs with --no-pcs). Runs needing the same state share one load; the loads
+are ordered so that a backend is only reloaded when the datasets it needs are missing, and otherwise
+only has its index switched in place (see util.index_manager).
+"""
+
+SPATIAL_JOIN_ANALYSIS = "spatial_join_analysis_benchmark.py"
+SUBSAMPLING = "subsampling_benchmark.py"
+
+# Dimensions supported by each script besides mode and pg_index
+SCRIPT_DIMENSIONS = {
+    SPATIAL_JOIN_ANALYSIS: {"db", "mysql_index", "crs", "parallel"},
+    SUBSAMPLING: {"mysql_index"},
+}
+
+# Cost of a reload relative to switching an index in place and to recreating a container with different settings
+RELOAD_COST = 1
+INDEX_SWITCH_COST = 0.2
+CONTAINER_SETTING_COST = 0.1
+
+# The steps of run.sh. Benchmarks that change the data or measure the load itself
+# manage their own containers and run first; the plots run once all results exist.
+DEFAULT_MATRIX = {
+    "standalone": [
+        "data_loading_benchmark.py --cleanup",
+        "data_insertion_benchmark.py --init --cleanup",
+        "data_insertion_benchmark.py --init --cleanup --mysql-noindex --pg-index NONE",
+        "storage_size_benchmark.py --init --cleanup",
+    ],
+    "runs": [
+        {"script": SPATIAL_JOIN_ANALYSIS, "mode": ["analysis", "join"], "pg_index": "GIST"},
+        {"script": SPATIAL_JOIN_ANALYSIS, "mode": "analysis", "pg_index": "NONE", "mysql_index": False},
+        {"script": SPATIAL_JOIN_ANALYSIS, "mode": ["analysis", "join"], "db": "pg", "pg_index": "SPGIST"},
+        {"script": SPATIAL_JOIN_ANALYSIS, "mode": "analysis", "db": "pg", "pg_index": "BRIN"},
+        {"script": SPATIAL_JOIN_ANALYSIS, "mode": "analysis", "pg_index": "GIST", "crs": "geographic"},
+        {"script": SUBSAMPLING, "mode": ["join", "analysis"], "pg_index": "GIST"},
+        {"script": SPATIAL_JOIN_ANALYSIS, "mode": ["analysis", "join"], "db": "pg", "pg_index": "GIST",
+         "parallel": True},
+    ],
+    "plots": [
+        "plotting/data_insertion_benchmark.py",
+        "plotting/index_benchmark.py analysis",
+        "plotting/index_benchmark.py join",
+        "plotting/crs_benchmark.py analysis",
+        "plotting/parallel_execution_benchmark.py analysis",
+        "plotting/parallel_execution_benchmark.py join",
+    ],
+}
+
+
+def load_matrix(path=None):
+    """Reads a matrix from a JSON file with the same keys as DEFAULT_MATRIX"""
+    if path is None:
+        return DEFAULT_MATRIX
+    with open(path, 'r') as file:
+        matrix = json.loads(file.read())
+    return {"standalone": matrix.get("standalone", []), "runs": matrix.get("runs", []),
+            "plots": matrix.get("plots", [])}
+
+
+class Run:
+    """One invocation of a benchmark script on an already loaded database"""
+
+    def __init__(self, script, mode, db='both', pg_index="GIST", mysql_index=True, crs="projected",
+                 parallel=False):
+        self.script = script
+        self.mode = mode
+        self.db = db
+        self.pg_index = pg_index
+        self.mysql_index = mysql_index
+        self.crs = crs
+        self.parallel = parallel
+
+    def uses(self, backend):
+        return self.db in ('both', backend)
+
+    def get_state(self, backend):
+        """Loaded state needed on the backend, or None if the run does not use it"""
+        if not self.uses(backend):
+            return None
+        return self.mysql_index if backend == 'mysql' else self.pg_index
+
+    def get_args(self):
+        args = [self.script, self.mode]
+        if self.db != 'both':
+            args.extend(["--db", self.db])
+        args.extend(["--pg-index", self.pg_index])
+        if not self.mysql_index:
+            args.append("--mysql-noindex")
+        if self.crs == "geographic":
+            args.append("--no-pcs")
+        if self.parallel:
+            args.append("--parallel")
+        return args
+
+    def __repr__(self):
+        return " ".join(self.get_args())
+
+
+def expand_matrix(entries):
+    """Expands each entry of the matrix (a value or a list of values per dimension)
+    into the cross product of its dimensions"""
+    runs = []
+    for entry in entries:
+        script = entry["script"]
+        unsupported = set(entry) - SCRIPT_DIMENSIONS[script] - {"script", "mode", "pg_index"}
+        if unsupported:
+            raise ValueError(f"{script} does not support {', '.join(sorted(unsupported))}")
+        dimensions = {name: value if isinstance(value, list) else [value]
+                      for name, value in entry.items() if name != "script"}
+        names = list(dimensions)
+        for values in itertools.product(*[dimensions[name] for name in names]):
+            runs.append(Run(script, **dict(zip(names, values))))
+    return runs
+
+
+class Load:
+    """Runs sharing the same loaded state. A state of None means the backend is not used,
+    so whatever is loaded on it can be kept."""
+
+    def __init__(self, mysql_state=None, pg_state=None):
+        self.states = {"mysql": mysql_state, "pg": pg_state}
+        self.runs = []
+
+    def import_gcs(self):
+        return any(run.crs == "geographic" for run in self.runs)
+
+    def get_ordered_runs(self):
+        """Runs with parallel query execution last, so the PostGIS container is recreated at most once"""
+        return sorted(self.runs, key=lambda run: run.parallel)
+
+    def accepts(self, run):
+        return all(run.get_state(backend) in (None, state) for backend, state in self.states.items())
+
+
+def group_runs(runs):
+    """Groups the runs into loads: runs using both backends first, then runs using one backend
+    join a load with the same state on it, or get a load of their own"""
+    loads = []
+    for run in sorted(runs, key=lambda run: run.db != 'both'):
+        load = next((load for load in loads if load.accepts(run)), None)
+        if load is None:
+            load = Load()
+            loads.append(load)
+        for backend in ("mysql", "pg"):
+            if run.uses(backend):
+                load.states[backend] = run.get_state(backend)
+        load.runs.append(run)
+    return loads
+
+
+def _transitions(loads):
+    """Yields (load, backends to reload, backends whose index is switched in place) for the loads in the
+    given order. A backend is only reloaded when the load needs the geographic datasets and they are missing;
+    one holding them as well can be reused by runs that only need the projected ones."""
+    loaded = {"mysql": None, "pg": None}
+    for load in loads:
+        reloads = []
+        switches = []
+        for backend, state in load.states.items():
+            if state is None:
+                continue
+            if loaded[backend] is None or (load.import_gcs() and not loaded[backend][1]):
+                reloads.append(backend)
+                loaded[backend] = (state, load.import_gcs())
+            elif loaded[backend][0] != state:
+                switches.append(backend)
+                loaded[backend] = (state, loaded[backend][1])
+        yield load, reloads, switches
+
+
+def get_plan_cost(loads):
+    cost = 0
+    parallel = None
+    for load, reloads, switches in _transitions(loads):
+        cost += RELOAD_COST * len(reloads) + INDEX_SWITCH_COST * len(switches)
+        if "pg" in reloads:
+            parallel = None
+        for run in load.get_ordered_runs():
+            if run.uses("pg") and parallel not in (None, run.parallel):
+                cost += CONTAINER_SETTING_COST
+            if run.uses("pg"):
+                parallel = run.parallel
+    return cost
+
+
+def order_loads(loads, max_permutations=40320):
+    """Order of the loads with the lowest cost; tries every order if there are few enough loads"""
+    permutation_count = 1
+    for count in range(2, len(loads) + 1):
+        permutation_count *= count
+    if permutation_count > max_permutations:
+        return loads
+    return list(min(itertools.permutations(loads), key=get_plan_cost))
+
+
+def plan(runs):
+    """Returns a list of (load, backends to reload, backends to switch the index of) in execution order"""
+    return list(_transitions(order_loads(group_runs(runs))))
+
+
+def get_naive_reload_count(runs):
+    """Reloads when every run initializes its own databases, as in run.sh"""
+    return sum(1 if run.db != 'both' else 2 for run in runs)
@@ -0,0 +1,155 @@
+import decimal
+import hashlib
+import heapq
+import os
+import tempfile
+
+"""
+Order independent fingerprints of query results and an external sorted-merge diff
+for comparing result sets that do not fit in memory
+"""
+
+_MASK = (1 << 64) - 1
+
+
+def normalize_value(value):
+    """Maps values that compare equal across the drivers (e.g. Decimal(3), 3.0 and 3) to one representation"""
+    if isinstance(value, (decimal.Decimal, float)):
+        try:
+            if value == int(value):
+                return int(value)
+        except (ValueError, OverflowError):
+            # NaN and infinity
+            pass
+        return float(value)
+    if isinstance(value, (bytearray, memoryview)):
+        return bytes(value)
+    return value
+
+
+def row_key(row):
+    """Canonical string of a row; contains no newlines, so it can be spilled line by line"""
+    return repr(tuple(normalize_value(value) for value in row))
+
+
+def hash_row(row):
+    return int.from_bytes(hashlib.blake2b(row_key(row).encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class ResultFingerprint:
+    """Multiset hash of a result: the row count plus the XOR and the sum (mod 2^64)
+    of 64-bit row hashes. Independent of row order and computed one batch at a time."""
+
+    def __init__(self, count=0, xor=0, sum=0):
+        self.count = count
+        self.xor = xor
+        self.sum = sum
+
+    def update(self, rows):
+        for row in rows:
+            row_hash = hash_row(row)
+            self.count += 1
+            self.xor ^= row_hash
+            self.sum = (self.sum + row_hash) & _MASK
+
+    def __eq__(self, other):
+        return isinstance(other, ResultFingerprint) and \
+            (self.count, self.xor, self.sum) == (other.count, other.xor, other.sum)
+
+    def __repr__(self):
+        return f"ResultFingerprint(count={self.count}, xor={self.xor:016x}, sum={self.sum:016x})"
+
+    def to_dict(self):
+        return {"count": self.count, "xor": f"{self.xor:016x}", "sum": f"{self.sum:016x}"}
+
+    @staticmethod
+    def from_dict(data):
+        return ResultFingerprint(data["count"], int(data["xor"], 16), int(data["sum"], 16))
+
+
+class ExternalSorter:
+    """Collects rows in batches, spilling sorted runs of chunk_size rows to temporary files.
+    Iterating yields the row keys of all rows in sorted order."""
+
+    def __init__(self, chunk_size=200000, directory=None):
+        self.chunk_size = chunk_size
+        self._directory = tempfile.TemporaryDirectory(dir=directory)
+        self._run_files = []
+        self._buffer = []
+
+    def update(self, rows):
+        for row in rows:
+            self._buffer.append(row_key(row))
+            if len(self._buffer) >= self.chunk_size:
+                self._spill()
+
+    def _spill(self):
+        self._buffer.sort()
+        path = os.path.join(self._directory.name,
+                            f"run_{len(self._run_files)}.txt")
+        with open(path, 'w', encoding="utf-8") as file:
+            for key in self._buffer:
+                file.write(key)
+                file.write("\n")
+        self._run_files.append(path)
+        self._buffer = []
+
+    def _read_run(self, path):
+        with open(path, 'r', encoding="utf-8") as file:
+            for line in file:
+                yield line[:-1]
+
+    def __iter__(self):
+        self._buffer.sort()
+        runs = [self._read_run(path) for path in self._run_files]
+        return heapq.merge(iter(self._buffer), *runs)
+
+    def close(self):
+        self._directory.cleanup()
+
+
+def _grouped(keys):
+    """Yields (key, multiplicity) from a sorted iterator"""
+    current = None
+    count = 0
+    for key in keys:
+        if count and key == current:
+            count += 1
+            continue
+        if count:
+            yield current, count
+        current = key
+        count = 1
+    if count:
+        yield current, count
+
+
+def sorted_diff(keys_a, keys_b, max_samples=20):
+    """Compares two sorted iterators of row keys as multisets.
+    Returns the number of rows only in a and only in b together with samples of them."""
+    diff = {"only_a": 0, "only_b": 0, "samples_a": [], "samples_b": []}
+
+    def add(side, key, count):
+        diff[f"only_{side}"] += count
+        if len(diff[f"samples_{side}"]) < max_samples:
+            diff[f"samples_{side}"].append(key)
+
+    groups_a = _grouped(keys_a)
+    groups_b = _grouped(keys_b)
+    a = next(groups_a, None)
+    b = next(groups_b, None)
+    while a is not None or b is not None:
+        if b is None or (a is not None and a[0] < b[0]):
+            add("a", *a)
+            a = next(groups_a, None)
+        elif a is None or b[0] < a[0]:
+            add("b", *b)
+            b = next(groups_b, None)
+        else:
+            if a[1] > b[1]:
+                add("a", a[0], a[1] - b[1])
+            elif b[1] > a[1]:
+                add("b", b[0], b[1] - a[1])
+            a = next(groups_a, None)
+            b = next(groups_b, None)
+    return diff
@@ -0,0 +1,138 @@
+import logging
+import time
+from mysqlutils.mysqladapter import MySQLAdapter
+from postgis_docker_wrapper.postgisadapter import PostgisAdapter
+
+"""
+Switches the spatial index of loaded datasets in place instead of importing them again.
+The indexes get the names ogr2ogr gives them, so a switched table looks like a freshly imported one.
+"""
+
+_logger = logging.getLogger(__name__)
+
+DATASETS = ["airspaces", "airports", "routes"]
+MYSQL_SCHEMA = "SpatialDatasets"
+MYSQL_GEOMETRY_COLUMN = "SHAPE"
+POSTGIS_GEOMETRY_COLUMN = "wkb_geometry"
+POSTGIS_INDEX_METHODS = {"GIST": "gist", "SPGIST": "spgist", "BRIN": "brin"}
+
+
+def get_dataset_tables(use_projected_crs=True, import_gcs=False):
+    """Tables queried with use_projected_crs, plus the geographic tables if they were imported as well"""
+    tables = [f"{dataset}_3857" if use_projected_crs else dataset for dataset in DATASETS]
+    if use_projected_crs and import_gcs:
+        tables.extend(DATASETS)
+    return tables
+
+
+class PostgisIndexManager:
+    """Builds, times and drops the spatial index (GIST/SPGIST/BRIN/NONE) of PostGIS tables"""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.adapter = PostgisAdapter(
+            user="postgres", password="root-password", persist=True)
+
+    def close(self):
+        self.adapter.close()
+
+    def get_index_name(self, table):
+        return f"{table}_{POSTGIS_GEOMETRY_COLUMN}_geom_idx"
+
+    def get_spatial_indexes(self, table):
+        return [row[0] for row in self.adapter.execute(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = 'public' AND tablename = %s AND indexdef LIKE %s",
+            (table, f"%({POSTGIS_GEOMETRY_COLUMN})%"))]
+
+    def drop(self):
+        for table in self.tables:
+            for index in self.get_spatial_indexes(table):
+                _logger.info(f"Dropping index {index}")
+                self.adapter.execute(f"DROP INDEX {index}")
+
+    def switch(self, index_type):
+        """Replaces the spatial index of every table with one of index_type and returns {table: build seconds}"""
+        self.drop()
+        build_times = {}
+        if index_type == "NONE":
+            return build_times
+        for table in self.tables:
+            start = time.perf_counter()
+            self.adapter.execute(
+                f"CREATE INDEX {self.get_index_name(table)} ON {table} "
+                f"USING {POSTGIS_INDEX_METHODS[index_type]} ({POSTGIS_GEOMETRY_COLUMN})")
+            build_times[table] = time.perf_counter() - start
+            _logger.info(
+                f"Built {index_type} index on {table} in {build_times[table]} seconds")
+            self.adapter.execute(f"ANALYZE {table}")
+        return build_times
+
+    def get_index_sizes(self):
+        """{table: megabytes used by its spatial index}"""
+        sizes = {}
+        for table in self.tables:
+            sizes[table] = float(self.adapter.execute(
+                "SELECT COALESCE(SUM(pg_relation_size(quote_ident(indexname)::regclass)), 0) / power(1024, 2) "
+                "FROM pg_indexes WHERE schemaname = 'public' AND tablename = %s AND indexdef LIKE %s",
+                (table, f"%({POSTGIS_GEOMETRY_COLUMN})%"))[0][0])
+        return sizes
+
+
+class MysqlIndexManager:
+    """Builds, times and drops the spatial index of MySQL tables. The tables must have been imported
+    with a spatial index, since only then ogr2ogr declares the geometry column NOT NULL with an SRID."""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.adapter = MySQLAdapter("root", "root-password")
+
+    def close(self):
+        self.adapter.close()
+
+    def get_spatial_indexes(self, table):
+        return [row[0] for row in self.adapter.execute(
+            "SELECT DISTINCT INDEX_NAME FROM information_schema.STATISTICS "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND INDEX_TYPE = 'SPATIAL'",
+            (MYSQL_SCHEMA, table))]
+
+    def drop(self):
+        for table in self.tables:
+            for index in self.get_spatial_indexes(table):
+                _logger.info(f"Dropping index {index} of {table}")
+                self.adapter.execute(
+                    f"ALTER TABLE {MYSQL_SCHEMA}.{table} DROP INDEX `{index}`")
+
+    def switch(self, create_spatial_index):
+        """Drops the spatial index of every table and builds it again if create_spatial_index.
+        Returns {table: build seconds}"""
+        self.drop()
+        build_times = {}
+        for table in self.tables:
+            if create_spatial_index:
+                start = time.perf_counter()
+                self.adapter.execute(
+                    f"CREATE SPATIAL INDEX {MYSQL_GEOMETRY_COLUMN} ON {MYSQL_SCHEMA}.{table} ({MYSQL_GEOMETRY_COLUMN})")
+                build_times[table] = time.perf_counter() - start
+                _logger.info(
+                    f"Built spatial index on {table} in {build_times[table]} seconds")
+            # Refreshes the sizes in information_schema and innodb_index_stats
+            self.adapter.execute(f"ANALYZE TABLE {MYSQL_SCHEMA}.{table}")
+        return build_times
+
+    def get_index_sizes(self):
+        """{table: megabytes used by its spatial index}"""
+        sizes = {}
+        for table in self.tables:
+            sizes[table] = float(self.adapter.execute(
+                "SELECT COALESCE(SUM(stat_value), 0) * @@innodb_page_size / power(1024, 2) "
+                "FROM mysql.innodb_index_stats WHERE database_name = %s AND table_name = %s "
+                "AND index_name = %s AND stat_name = 'size'",
+                (MYSQL_SCHEMA, table, MYSQL_GEOMETRY_COLUMN))[0][0])
+        return sizes
+
+
+def create_index_manager(db, tables):
+    """db is 'mysql' or 'pg'"""
+    if db == 'mysql':
+        return MysqlIndexManager(tables)
+    return PostgisIndexManager(tables)
@@ -0,0 +1,28 @@
+import os
+from util.docker_resources import ResourceLimits
+
+"""
+Container names, ports and CPU pinning used by this process.
+Several benchmark processes can run side by side when each is started with a different
+SDB_INSTANCE (and optionally SDB_CPUSET) environment variable; see parallel_run.py.
+"""
+
+INSTANCE_ID = int(os.environ.get("SDB_INSTANCE", "0"))
+CPUSET = os.environ.get("SDB_CPUSET") or None
+
+MYSQL_PORT = 3306 + INSTANCE_ID
+POSTGIS_PORT = 5432 + INSTANCE_ID
+
+
+def get_container_name(base_name):
+    """Instance 0 keeps the original names so existing containers are reused"""
+    if INSTANCE_ID == 0:
+        return base_name
+    return f"{base_name}_{INSTANCE_ID}"
+
+
+def get_resource_limits():
+    """Limits applied to every container of this instance unless others are given"""
+    if CPUSET is None:
+        return None
+    return ResourceLimits(cpuset_cpus=CPUSET)
@@ -1,40 +1,198 @@
 import decimal
+import io
+import struct
 
 
 def convert_decimals_to_ints_in_tuples(data):
     """data is an array of tuples"""
-    modified_data = []
-    for t in data:
-        new_t = t
-        for idx in range(len(new_t)):
-            if isinstance(t[idx], decimal.Decimal):
-                new_t = new_t[0:idx] + (int(new_t[idx]),) + new_t[idx+1:]
-        modified_data.append(new_t)
-    return modified_data
+    return list(RowTranscoder.for_rows(data, [decimal_to_int]).convert(data))
 
 
 def convert_none_to_null_in_tuples(data):
     """data is an array of tuples"""
-    modified_data = []
-    for t in data:
-        new_t = t
-        for idx in range(len(new_t)):
-            if t[idx] == None:
-                new_t = new_t[0:idx] + ("NULL",) + new_t[idx+1:]
-        modified_data.append(new_t)
-    return modified_data
+    return list(RowTranscoder.for_rows(data, [none_to_null]).convert(data))
 
 
 def tuple_to_str(tup):
-    output = "("
-    for val in tup:
-        if val == None:
-            output += "NULL, "
-        elif isinstance(val, str):
-            # escaped_val = val.replace("'", "\\'")
-            escaped_val = val.replace("'", "")
-            output += f"'{str(escaped_val)}', "
-        else:
-            output += f"{str(val)}, "
-    output = output[:-2] + ")"
-    return output
+    return "(" + ", ".join([value_to_sql(val) for val in tup]) + ")"
+
+
+def decimal_to_int(value):
+    return int(value) if isinstance(value, decimal.Decimal) else value
+
+
+def none_to_null(value):
+    return "NULL" if value == None else value
+
+
+def _escape_copy_text(value):
+    if "\\" in value:
+        value = value.replace("\\", "\\\\")
+    if "\t" in value or "\n" in value or "\r" in value:
+        value = value.replace("\t", "\\t").replace(
+            "\n", "\\n").replace("\r", "\\r")
+    return value
+
+
+def _quote_sql(value):
+    return "'" + value.replace("'", "") + "'"
+
+
+def _format_sql_other(value):
+    return _quote_sql(value) if isinstance(value, str) else str(value)
+
+
+def _format_copy_text_other(value):
+    return _escape_copy_text(value) if isinstance(value, str) else str(value)
+
+
+# Formatters by exact value type, with a fallback for other types (e.g. str subclasses).
+# One dict lookup is cheaper than a chain of isinstance tests for every value.
+_SQL_FORMATTERS = {
+    type(None): lambda value: "NULL",
+    str: _quote_sql,
+}
+_COPY_TEXT_FORMATTERS = {
+    type(None): lambda value: "\\N",
+    str: _escape_copy_text,
+    bool: lambda value: "t" if value else "f",
+    bytes: lambda value: "\\\\x" + value.hex(),
+    bytearray: lambda value: "\\\\x" + value.hex(),
+    memoryview: lambda value: "\\\\x" + value.hex(),
+}
+
+
+def value_to_sql(value):
+    """SQL literal of a value as written by tuple_to_str; quotes are removed from strings"""
+    return _SQL_FORMATTERS.get(type(value), _format_sql_other)(value)
+
+
+def copy_text_value(value):
+    """Value in the PostgreSQL COPY text format"""
+    return _COPY_TEXT_FORMATTERS.get(type(value), _format_copy_text_other)(value)
+
+
+# Cursor description type codes of DECIMAL/NUMERIC columns (psycopg2 OID, mysql.connector field types)
+DECIMAL_TYPE_CODES = {1700, 0, 246}
+
+
+# Encoders of the PostgreSQL binary COPY format by column type
+_COPY_BINARY_ENCODERS = {
+    "bool": lambda value: struct.pack("!?", value),
+    "int2": lambda value: struct.pack("!h", value),
+    "int4": lambda value: struct.pack("!i", value),
+    "int8": lambda value: struct.pack("!q", value),
+    "float4": lambda value: struct.pack("!f", value),
+    "float8": lambda value: struct.pack("!d", value),
+    "text": lambda value: str(value).encode("utf-8"),
+    "varchar": lambda value: str(value).encode("utf-8"),
+    "bytea": bytes,
+    # The binary input of geometry and geography is EWKB
+    "geometry": bytes,
+    "geography": bytes,
+}
+COPY_BINARY_HEADER = b"PGCOPY\n\xff\r\n\x00" + struct.pack("!ii", 0, 0)
+COPY_BINARY_TRAILER = struct.pack("!h", -1)
+
+
+class RowTranscoder:
+    """Converts rows in a single pass. One converter per column (None keeps the value) is
+    chosen once, e.g. from the cursor description, instead of testing every value of every row."""
+
+    def __init__(self, converters):
+        self.converters = converters
+        self._converted_columns = [(idx, converter) for idx, converter in enumerate(converters)
+                                   if converter is not None]
+
+    @staticmethod
+    def from_description(description, decimals_to_ints=True):
+        """Converters for the columns of a cursor description"""
+        converters = []
+        for column in description:
+            if decimals_to_ints and column[1] in DECIMAL_TYPE_CODES:
+                converters.append(decimal_to_int)
+            else:
+                converters.append(None)
+        return RowTranscoder(converters)
+
+    @staticmethod
+    def for_rows(rows, converters):
+        """Applies the same converter to every column of the rows"""
+        width = len(rows[0]) if len(rows) > 0 else 0
+        return RowTranscoder(converters * width)
+
+    def convert(self, rows):
+        """Generator of converted rows"""
+        if not self._converted_columns:
+            yield from rows
+            return
+        converted_columns = self._converted_columns
+        for row in rows:
+            row = list(row)
+            for idx, converter in converted_columns:
+                row[idx] = converter(row[idx])
+            yield tuple(row)
+
+    def to_sql_values(self, rows):
+        """Generator of "(v1, v2, ...)" strings for INSERT ... VALUES"""
+        get_formatter = _SQL_FORMATTERS.get
+        for row in self.convert(rows):
+            yield "(" + ", ".join([get_formatter(type(value), _format_sql_other)(value) for value in row]) + ")"
+
+    def to_copy_text(self, rows):
+        """Generator of lines in the COPY ... FROM STDIN text format"""
+        get_formatter = _COPY_TEXT_FORMATTERS.get
+        for row in self.convert(rows):
+            yield "\t".join([get_formatter(type(value), _format_copy_text_other)(value) for value in row]) + "\n"
+
+    def to_copy_binary(self, rows, column_types):
+        """Generator of byte chunks in the COPY ... FROM STDIN (FORMAT binary) format.
+        column_types are PostgreSQL type names of the target columns, e.g. int4 or geometry."""
+        encoders = [_COPY_BINARY_ENCODERS[column_type]
+                    for column_type in column_types]
+        field_count = struct.pack("!h", len(encoders))
+        null = struct.pack("!i", -1)
+        yield COPY_BINARY_HEADER
+        for row in self.convert(rows):
+            fields = [field_count]
+            for encoder, value in zip(encoders, row):
+                if value is None:
+                    fields.append(null)
+                else:
+                    data = encoder(value)
+                    fields.append(struct.pack("!i", len(data)))
+                    fields.append(data)
+            yield b"".join(fields)
+        yield COPY_BINARY_TRAILER
+
+
+class IteratorFile(io.RawIOBase):
+    """Read-only file over an iterator of str or bytes chunks, e.g. for cursor.copy_expert"""
+
+    def __init__(self, chunks):
+        self._chunks = iter(chunks)
+        self._buffer = b""
+
+    def readable(self):
+        return True
+
+    def readinto(self, output):
+        while not self._buffer:
+            chunk = next(self._chunks, None)
+            if chunk is None:
+                return 0
+            self._buffer = chunk.encode("utf-8") if isinstance(chunk, str) else chunk
+        size = min(len(output), len(self._buffer))
+        output[:size] = self._buffer[:size]
+        self._buffer = self._buffer[size:]
+        return size
+
+
+def consume_results(cursor, result_handler, batch_size=10000):
+    """Passes the rows of the cursor to result_handler in batches so the result
+    is never materialized as one list"""
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return None
+        result_handler(rows)
@@ -0,0 +1,183 @@
+import cProfile
+import json
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+
+"""
+Client side profiling of benchmarks: cProfile or a sampling profiler, tracemalloc peak memory
+and the split of wall time into CPU time of the client and time spent waiting (e.g. for the server).
+Stacks are written in the collapsed format read by flamegraph.pl and speedscope.
+"""
+
+PROFILE_MODES = ["cprofile", "sample"]
+
+
+def frame_label(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+def function_label(function):
+    filename, line, name = function
+    if filename == "~":
+        # Built-in functions such as <method 'fetchall' ...>
+        return name
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapse_pstats(stats, max_depth=64):
+    """Approximates collapsed stacks (in microseconds) from the call graph of cProfile.
+    The time of a function (and of its callees) is split between its callers in proportion to the
+    cumulative time of the calls from each caller, since cProfile does not record whole stacks."""
+    children = {}
+    for function, (_, _, _, _, callers) in stats.items():
+        for caller, (_, _, _, cumulative_time, *_) in callers.items():
+            children.setdefault(caller, []).append((function, cumulative_time))
+    roots = [function for function, (_, _, _, _, callers) in stats.items() if not callers]
+    stacks = Counter()
+
+    def walk(function, path, fraction):
+        own_time = stats[function][2]
+        path = path + [function_label(function)]
+        stacks[";".join(path)] += own_time * fraction * 1e6
+        if len(path) >= max_depth:
+            return
+        for child, child_time in children.get(function, []):
+            child_cumulative_time = stats[child][3]
+            if function_label(child) in path or child_cumulative_time <= 0:
+                # Recursion, already counted in the own time of the outer call
+                continue
+            # Share of the child's total time spent in calls from this function
+            walk(child, path, fraction * min(1.0, child_time / child_cumulative_time))
+
+    for root in roots:
+        walk(root, [], 1.0)
+    return stacks
+
+
+class StackSampler:
+    """Samples the Python stack of one thread every interval seconds from a background thread"""
+
+    def __init__(self, thread_id, interval=0.005):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._sample, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _sample(self):
+        while not self._stop.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            stack = []
+            while frame is not None:
+                stack.append(frame_label(frame.f_code))
+                frame = frame.f_back
+            if stack:
+                self.stacks[";".join(reversed(stack))] += 1
+
+
+class BenchmarkProfiler:
+    """Profiles the executions of one benchmark and writes results/profiles/<name>.collapsed
+    (stack and count per line: microseconds for cprofile, samples for sample),
+    <name>.json with the wall time, CPU time and peak memory of every run, and <name>.prof
+    with the raw cProfile statistics (cprofile mode). Use measure() around each execution
+    and save() once all runs are done."""
+
+    def __init__(self, name, mode="cprofile", interval=0.005, trace_memory=True, directory="results/profiles"):
+        if mode not in PROFILE_MODES:
+            raise ValueError(f"Unknown profile mode {mode}")
+        self.name = name
+        self.mode = mode
+        self.interval = interval
+        self.trace_memory = trace_memory
+        self.directory = directory
+        self.runs = []
+        self._profile = cProfile.Profile() if mode == "cprofile" else None
+        self._stacks = Counter()
+
+    def measure(self):
+        return _ProfiledRun(self)
+
+    def save(self):
+        os.makedirs(self.directory, exist_ok=True)
+        path = os.path.join(self.directory, self.name)
+        stacks = self._stacks
+        if self._profile is not None:
+            self._profile.dump_stats(f"{path}.prof")
+            stacks = collapse_pstats(pstats.Stats(self._profile).stats)
+        with open(f"{path}.collapsed", 'w') as file:
+            for stack, count in sorted(stacks.items()):
+                if round(count) > 0:
+                    file.write(f"{stack} {round(count)}\n")
+        summary = {"mode": self.mode, "runs": self.runs}
+        if self.runs:
+            summary["wall_time"] = sum(run["wall_time"] for run in self.runs) / len(self.runs)
+            summary["cpu_time"] = sum(run["cpu_time"] for run in self.runs) / len(self.runs)
+            summary["cpu_fraction"] = summary["cpu_time"] / summary["wall_time"] \
+                if summary["wall_time"] > 0 else None
+        with open(f"{path}.json", 'w') as file:
+            file.write(json.dumps(summary, indent=4))
+        return path
+
+
+class _ProfiledRun:
+    """Context manager for a single execution, see BenchmarkProfiler.measure"""
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self._sampler = None
+        self._started_tracemalloc = False
+
+    def __enter__(self):
+        profiler = self.profiler
+        if profiler.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracemalloc = True
+            tracemalloc.reset_peak()
+            self._memory_start = tracemalloc.get_traced_memory()[0]
+        if profiler.mode == "sample":
+            self._sampler = StackSampler(threading.get_ident(), profiler.interval)
+            self._sampler.start()
+        self._cpu_start = time.process_time()
+        self._thread_cpu_start = time.thread_time()
+        self._wall_start = time.perf_counter()
+        if profiler._profile is not None:
+            profiler._profile.enable()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        profiler = self.profiler
+        if profiler._profile is not None:
+            profiler._profile.disable()
+        wall_time = time.perf_counter() - self._wall_start
+        run = {
+            "wall_time": wall_time,
+            # All threads of the process, e.g. including driver threads
+            "cpu_time": time.process_time() - self._cpu_start,
+            "thread_cpu_time": time.thread_time() - self._thread_cpu_start,
+        }
+        # Time the benchmark thread did not run Python or driver code, mostly waiting for the server
+        run["wait_time"] = max(0.0, wall_time - run["thread_cpu_time"])
+        if self._sampler is not None:
+            self._sampler.stop()
+            profiler._stacks.update(self._sampler.stacks)
+        if profiler.trace_memory:
+            run["peak_memory"] = tracemalloc.get_traced_memory()[1] - self._memory_start
+            if self._started_tracemalloc:
+                tracemalloc.stop()
+        profiler.runs.append(run)
+        return False
@@ -0,0 +1,109 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+Cache of projected and converted datasets keyed by a hash of the source files and the target SRS or format.
+A projection or conversion is only run again when the source layer or the target changed or its output is missing.
+"""
+
+_logger = logging.getLogger(__name__)
+
+MANIFEST_FILE = ".projection_cache.json"
+
+
+def get_layer_files(dataset_folder, path):
+    """The files of a shapefile layer (.shp, .shx, .dbf, .prj, ...) relative to dataset_folder, in sorted order"""
+    directory, file_name = os.path.split(path)
+    stem = os.path.splitext(file_name)[0]
+    full_directory = os.path.join(dataset_folder, directory)
+    if not os.path.isdir(full_directory):
+        return []
+    return sorted(os.path.join(directory, name) for name in os.listdir(full_directory)
+                  if os.path.splitext(name)[0] == stem)
+
+
+def hash_layer(dataset_folder, path, chunk_size=1 << 20):
+    """Hash of the names and contents of the files of a layer"""
+    digest = hashlib.blake2b(digest_size=16)
+    for layer_file in get_layer_files(dataset_folder, path):
+        digest.update(os.path.basename(layer_file).encode("utf-8"))
+        with open(os.path.join(dataset_folder, layer_file), 'rb') as file:
+            for chunk in iter(lambda: file.read(chunk_size), b''):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ProjectionCache:
+    """Runs GdalDockerWrapper.project_dataset and convert_dataset only for stale outputs. The key of every
+    output layer is recorded in datasets/.projection_cache.json once its projection or conversion has succeeded."""
+
+    def __init__(self, gdal_docker_wrapper):
+        self.gdal_docker_wrapper = gdal_docker_wrapper
+        self.dataset_folder = gdal_docker_wrapper.dataset_folder
+        self.manifest_path = os.path.join(self.dataset_folder, MANIFEST_FILE)
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, 'r') as file:
+                self.manifest = json.loads(file.read())
+        self._lock = threading.Lock()
+
+    def get_key(self, source, target):
+        return f"{hash_layer(self.dataset_folder, source)}/{target}"
+
+    def is_fresh(self, source, dest, target):
+        entry = self.manifest.get(dest)
+        if entry is None or entry["key"] != self.get_key(source, target):
+            return False
+        # The output may have been deleted since
+        return os.path.exists(os.path.join(self.dataset_folder, dest))
+
+    def project(self, source, dest, srs="EPSG:3857", force=False):
+        """Projects source to dest unless the cached projection is fresh; returns whether it ran"""
+        return self._run(source, dest, srs, self.gdal_docker_wrapper.project_dataset, force, srs=srs)
+
+    def convert(self, source, dest, output_format, force=False):
+        """Converts source to dest in a format of gdal.gdaldockerwrapper.DATASET_FORMATS
+        unless the cached conversion is fresh; returns whether it ran"""
+        return self._run(source, dest, output_format, self.gdal_docker_wrapper.convert_dataset, force,
+                         output_format=output_format)
+
+    def _run(self, source, dest, target, command, force, **kwargs):
+        key = self.get_key(source, target)
+        if not force and self.is_fresh(source, dest, target):
+            _logger.info(f"{dest} is up to date with {source} in {target}")
+            return False
+        # The exit code is checked by the call itself: projections run in parallel on the same wrapper
+        try:
+            command(source, dest, check=True, **kwargs)
+        except RuntimeError as e:
+            raise RuntimeError(f"Could not create {dest} from {source} in {target}: {e}")
+        with self._lock:
+            self.manifest[dest] = {"key": key, "source": source, "target": target}
+            self._save()
+        return True
+
+    def project_all(self, projections, max_workers=4, force=False):
+        """Projects (source, dest, srs) tuples, running the stale ones in parallel.
+        Returns the destinations that were projected again."""
+        return self._run_all(self.project, projections, max_workers, force)
+
+    def convert_all(self, conversions, max_workers=4, force=False):
+        """Converts (source, dest, output format) tuples, running the stale ones in parallel.
+        Returns the destinations that were converted again."""
+        return self._run_all(self.convert, conversions, max_workers, force)
+
+    def _run_all(self, function, tasks, max_workers, force):
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [(dest, executor.submit(function, source, dest, target, force))
+                       for source, dest, target in tasks]
+            return [dest for dest, future in futures if future.result()]
+
+    def _save(self):
+        temp_path = f"{self.manifest_path}.tmp"
+        with open(temp_path, 'w') as file:
+            file.write(json.dumps(self.manifest, indent=4))
+        os.replace(temp_path, self.manifest_path)
@@ -0,0 +1,88 @@
+import json
+import logging
+
+"""
+Query plans of the queries run by a benchmark. The queries are captured by running the benchmark once
+with adapters that record the queries instead of sending them, and are then explained with
+EXPLAIN (FORMAT JSON) on PostGIS and EXPLAIN FORMAT=JSON on MySQL.
+"""
+
+_logger = logging.getLogger(__name__)
+
+
+def capture_queries(bnchmrk):
+    """[(adapter, query, params)] of the queries execute() sends through the benchmark adapters.
+    Benchmarks that use the rows of one query in the next only get the queries up to there.
+    The benchmark has to be prepared; it is cleaned up afterwards, as after a run."""
+    queries = []
+    adapters = list(dict((id(adapter), adapter) for adapter in bnchmrk.get_adapters()).values())
+    for adapter in adapters:
+        adapter.execute = lambda query, params=None, adapter=adapter: queries.append(
+            (adapter, query, params)) or []
+    try:
+        bnchmrk.execute()
+    except Exception as e:
+        _logger.warning(f"{bnchmrk.title}: captured {len(queries)} queries before {e}")
+    finally:
+        for adapter in adapters:
+            del adapter.execute
+    bnchmrk.cleanup()
+    return queries
+
+
+def explain(db, adapter, query, params=None):
+    """JSON plan of a query, db is 'mysql' or 'pg'"""
+    if db == 'mysql':
+        return json.loads(adapter.execute(f"EXPLAIN FORMAT=JSON {query}", params)[0][0])
+    return adapter.execute(f"EXPLAIN (FORMAT JSON) {query}", params)[0][0][0]
+
+
+def _get_postgis_nodes(node):
+    nodes = [node["Node Type"] + (f" on {node['Relation Name']}" if "Relation Name" in node else "")
+             + (f" using {node['Index Name']}" if "Index Name" in node else "")]
+    for child in node.get("Plans", []):
+        nodes.extend(_get_postgis_nodes(child))
+    return nodes
+
+
+def _get_mysql_tables(block):
+    """Access of each table of a MySQL plan in join order"""
+    tables = []
+    if isinstance(block, dict):
+        if "table_name" in block:
+            tables.append(f"{block.get('access_type', 'ALL')} on {block['table_name']}"
+                          + (f" using {block['key']}" if "key" in block else ""))
+        for value in block.values():
+            tables.extend(_get_mysql_tables(value))
+    elif isinstance(block, list):
+        for value in block:
+            tables.extend(_get_mysql_tables(value))
+    return tables
+
+
+def summarize_plan(db, plan):
+    """{"nodes": access paths in plan order, "cost": estimated cost, "rows": estimated rows (PostGIS)}.
+    Two plans with the same nodes only differ in their estimates."""
+    if db == 'mysql':
+        query_block = plan["query_block"]
+        return {"nodes": _get_mysql_tables(query_block),
+                "cost": float(query_block.get("cost_info", {}).get("query_cost", 0)),
+                "rows": None}
+    return {"nodes": _get_postgis_nodes(plan["Plan"]),
+            "cost": plan["Plan"]["Total Cost"],
+            "rows": plan["Plan"]["Plan Rows"]}
+
+
+def get_query_plans(db, bnchmrk):
+    """Summaries of the plans of every query of a prepared benchmark, None for the queries
+    that could not be explained. Call it before run(), whose cleanup may remove what the queries need."""
+    plans = []
+    for adapter, query, params in capture_queries(bnchmrk):
+        try:
+            plans.append(summarize_plan(db, explain(db, adapter, query, params)))
+        except Exception as e:
+            _logger.warning(f"{bnchmrk.title}: could not explain {query}: {e}")
+            # A failed EXPLAIN leaves a PostGIS connection in an aborted transaction
+            adapter.rollback()
+            plans.append(None)
+    return plans
@@ -0,0 +1,73 @@
+import threading
+import logging
+
+"""
+Query timeouts: exceptions, client side cancellation and censored measurements
+"""
+
+_logger = logging.getLogger(__name__)
+
+
+class QueryTimeoutException(Exception):
+    """Raised by the adapters when a query is cancelled because it ran too long"""
+    pass
+
+
+def parse_timeouts(spec):
+    """Parses a timeout specification such as "600" or "600,PolygonDisjointPolygon=3600"
+    into {benchmark name: seconds}. The default timeout is stored under None."""
+    timeouts = {None: None}
+    if spec is None:
+        return timeouts
+    for part in spec.split(','):
+        if '=' in part:
+            name, seconds = part.split('=')
+            timeouts[name] = float(seconds)
+        else:
+            timeouts[None] = float(part)
+    return timeouts
+
+
+def censored_measurement(timeout):
+    """Result entry for a benchmark that was stopped after timeout seconds,
+    i.e. a measurement of "more than timeout seconds" """
+    return {"censored": True, "value": timeout}
+
+
+class QueryWatchdog:
+    """Cancels the running queries of the given adapters from a second thread once the timeout
+    (plus a grace period for the server side limit to act first) has passed.
+    Used as a context manager around a single execution; a timeout of None disables it."""
+
+    def __init__(self, adapters, timeout, grace=None):
+        self.adapters = adapters
+        self.timeout = timeout
+        self.grace = grace if grace is not None else (
+            max(1.0, 0.1 * timeout) if timeout is not None else 0)
+        self.fired = False
+        self._timer = None
+
+    def __enter__(self):
+        self.fired = False
+        if self.timeout is not None:
+            self._timer = threading.Timer(
+                self.timeout + self.grace, self._cancel)
+            self._timer.daemon = True
+            self._timer.start()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        return False
+
+    def _cancel(self):
+        self.fired = True
+        _logger.warning(
+            f"Query still running after {self.timeout + self.grace} seconds, cancelling it")
+        for adapter in self.adapters:
+            try:
+                adapter.cancel()
+            except Exception:
+                _logger.exception("Could not cancel query: ")
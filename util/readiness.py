@@ -0,0 +1,137 @@
+import socket
+import threading
+import time
+import logging
+from collections import deque
+
+"""
+Readiness probes for the database containers
+"""
+
+_logger = logging.getLogger(__name__)
+
+
+class ReadinessTimeoutException(Exception):
+    """Raised when a container does not become ready in time"""
+    pass
+
+
+def tcp_probe(host, port, timeout=1.0):
+    """Returns True if a TCP connection to host:port can be opened"""
+    try:
+        with socket.create_connection((host, int(port)), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def postgis_probe(host, port, user, password, dbname="postgres"):
+    """pg_isready style check: the server accepts a connection and answers a query"""
+    import psycopg2
+    if not tcp_probe(host, port):
+        return False
+    try:
+        connection = psycopg2.connect(host=host, port=port, user=user, password=password,
+                                      dbname=dbname, connect_timeout=2)
+    except psycopg2.OperationalError:
+        return False
+    try:
+        cursor = connection.cursor()
+        cursor.execute("SELECT 1")
+        return cursor.fetchone() == (1,)
+    finally:
+        connection.close()
+
+
+def mysql_probe(host, port, user, password):
+    """Handshake with the server and ping it"""
+    import mysql.connector
+    if not tcp_probe(host, port):
+        return False
+    try:
+        connection = mysql.connector.connect(host=host, port=port, user=user, password=password,
+                                             connection_timeout=2)
+    except mysql.connector.Error:
+        return False
+    try:
+        connection.ping()
+        return True
+    except mysql.connector.Error:
+        return False
+    finally:
+        connection.close()
+
+
+class LogFollower:
+    """Streams container logs in a background thread instead of re-reading them"""
+
+    def __init__(self, container, max_lines=200):
+        self.container = container
+        self.lines = deque(maxlen=max_lines)
+        self._lock = threading.Lock()
+        self._stream = None
+        self._thread = threading.Thread(target=self._follow, daemon=True)
+
+    def start(self):
+        self._stream = self.container.logs(stream=True, follow=True,
+                                           since=int(time.time()))
+        self._thread.start()
+        return self
+
+    def _follow(self):
+        buffer = b""
+        try:
+            for chunk in self._stream:
+                buffer += chunk
+                *complete, buffer = buffer.split(b"\n")
+                with self._lock:
+                    self.lines.extend(line.decode("utf-8", "replace")
+                                      for line in complete)
+        except Exception:
+            # The stream is closed when the follower is stopped
+            pass
+
+    def stop(self):
+        if self._stream is not None:
+            try:
+                self._stream.close()
+            except Exception:
+                pass
+
+    def tail(self, count=20):
+        with self._lock:
+            return list(self.lines)[-count:]
+
+
+def wait_until_ready(probe, description, container=None, timeout=300,
+                     initial_delay=0.05, max_delay=2.0, backoff=2.0):
+    """Calls probe with exponential backoff until it returns True.
+    Returns the time in seconds until the probe succeeded."""
+    follower = None
+    if container is not None:
+        follower = LogFollower(container).start()
+    start = time.perf_counter()
+    delay = initial_delay
+    attempt = 0
+    try:
+        while True:
+            attempt += 1
+            if probe():
+                time_to_ready = time.perf_counter() - start
+                _logger.info(
+                    f"{description} ready after {time_to_ready:.3f} seconds ({attempt} probes)")
+                return time_to_ready
+            if container is not None:
+                container.reload()
+                if container.status in ("exited", "dead"):
+                    raise ReadinessTimeoutException(
+                        f"{description} container stopped during startup: {container.logs(tail=20)}")
+            if time.perf_counter() - start + delay > timeout:
+                logs = follower.tail() if follower is not None else []
+                raise ReadinessTimeoutException(
+                    f"{description} not ready after {timeout} seconds: {logs}")
+            time.sleep(delay)
+            delay = min(delay * backoff, max_delay)
+    finally:
+        if follower is not None:
+            follower.stop()
@@ -0,0 +1,79 @@
+import itertools
+from array import array
+import numpy as np
+
+"""
+Compact containers for query results
+"""
+
+
+class IntegerColumns:
+    """Result whose values are all integers, such as the ID pairs of a join, stored as one
+    array('q') per column: 8 bytes per value instead of a tuple and int objects per row.
+    Filled one batch of rows at a time, e.g. as the result handler of an adapter.
+    If a value is not an integer (or does not fit in 64 bits) it falls back to a list of rows."""
+
+    def __init__(self):
+        self.columns = None
+        self.rows = None
+        self.count = 0
+
+    def is_compact(self):
+        return self.rows is None
+
+    def update(self, rows):
+        if not rows:
+            return
+        if self.rows is not None:
+            self.rows.extend(rows)
+            self.count += len(rows)
+            return
+        if self.columns is None:
+            self.columns = [array('q') for _ in rows[0]]
+        width = len(self.columns)
+        try:
+            values = array('q', itertools.chain.from_iterable(rows))
+        except (TypeError, OverflowError):
+            values = None
+        if values is None or len(values) != width * len(rows):
+            self.rows = list(self)
+            self.columns = None
+            self.update(rows)
+            return
+        for idx, column in enumerate(self.columns):
+            column.extend(values[idx::width])
+        self.count += len(rows)
+
+    def __len__(self):
+        return self.count
+
+    def __iter__(self):
+        if self.rows is not None:
+            return iter(self.rows)
+        if self.columns is None:
+            return iter(())
+        return zip(*self.columns)
+
+    def get_nbytes(self):
+        if self.columns is None:
+            return 0
+        return sum(column.itemsize * len(column) for column in self.columns)
+
+    def to_numpy(self):
+        """Array of shape (count, columns) sharing no memory with the columns"""
+        if self.columns is None:
+            return np.empty((0, 0), dtype=np.int64)
+        return np.column_stack([np.frombuffer(column, dtype=np.int64) for column in self.columns])
+
+    def iter_sorted(self, batch_size=100000):
+        """Yields the rows as tuples in lexicographic order"""
+        if self.rows is not None:
+            yield from sorted(self.rows)
+            return
+        if self.columns is None:
+            return
+        data = self.to_numpy()
+        # np.lexsort sorts by the last key first
+        order = np.lexsort(data.T[::-1])
+        for start in range(0, len(order), batch_size):
+            yield from map(tuple, data[order[start:start + batch_size]].tolist())
@@ -0,0 +1,289 @@
+import logging
+import mmap
+import os
+import struct
+import numpy as np
+
+"""
+Memory-mapped reader of ESRI shapefiles (.shp, .shx, .dbf) for in-process pipelines.
+Geometries are exposed as NumPy coordinate, part offset and geometry offset arrays with bounding boxes,
+and attribute columns are decoded lazily from a record view of the .dbf, so a layer can be read
+without GDAL and without copying the files into Python objects.
+"""
+
+_logger = logging.getLogger(__name__)
+
+FILE_CODE = 9994
+HEADER_LENGTH = 100
+# Record header: big-endian record number and content length in 16-bit words
+RECORD_HEADER_LENGTH = 8
+
+NULL_SHAPE = 0
+POINT_TYPES = {1, 11, 21}
+MULTIPOINT_TYPES = {8, 18, 28}
+MULTIPATCH = 31
+
+DBF_HEADER_LENGTH = 32
+DBF_HEADER_TERMINATOR = 0x0D
+DBF_FIELD_DESCRIPTOR_LENGTH = 32
+DBF_DELETED = ord('*')
+
+
+def _map_file(path):
+    with open(path, 'rb') as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return None
+        return mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+class DbfField:
+    def __init__(self, name, field_type, length, decimal_count, offset):
+        self.name = name
+        self.field_type = field_type
+        self.length = length
+        self.decimal_count = decimal_count
+        self.offset = offset
+
+    def __repr__(self):
+        return f"{self.name} {self.field_type}({self.length},{self.decimal_count})"
+
+
+class DbfReader:
+    """Attribute table of a shapefile. records is a zero-copy view of the fixed width records;
+    columns are decoded on first access and cached."""
+
+    def __init__(self, path, encoding=None):
+        self.path = path
+        self.encoding = encoding if encoding is not None else self._read_encoding()
+        self._mmap = _map_file(path)
+        record_count, header_length, record_length = struct.unpack_from('<IHH', self._mmap, 4)
+        self.fields = []
+        offset = 1  # Deletion flag
+        position = DBF_HEADER_LENGTH
+        while self._mmap[position] != DBF_HEADER_TERMINATOR:
+            name, field_type, length, decimal_count = struct.unpack_from(
+                '<11sc4xBB', self._mmap, position)
+            self.fields.append(DbfField(name.split(b'\x00')[0].decode('ascii'), field_type.decode('ascii'),
+                                        length, decimal_count, offset))
+            offset += length
+            position += DBF_FIELD_DESCRIPTOR_LENGTH
+        self.records = np.ndarray((record_count, record_length), dtype=np.uint8,
+                                  buffer=self._mmap, offset=header_length)
+        self._columns = {}
+
+    def _read_encoding(self):
+        cpg_path = f"{os.path.splitext(self.path)[0]}.cpg"
+        if os.path.exists(cpg_path):
+            with open(cpg_path, 'r') as file:
+                return file.read().strip() or "utf-8"
+        return "utf-8"
+
+    def __len__(self):
+        return len(self.records)
+
+    def get_field_names(self):
+        return [field.name for field in self.fields]
+
+    def get_field(self, name):
+        field = next((field for field in self.fields if field.name == name), None)
+        if field is None:
+            raise KeyError(f"{self.path} has no field {name}")
+        return field
+
+    def get_deleted(self):
+        return self.records[:, 0] == DBF_DELETED
+
+    def get_raw_column(self, name):
+        """Zero-copy view of the bytes of a column, one fixed width bytes value per record"""
+        field = self.get_field(name)
+        return self.records[:, field.offset:field.offset + field.length].view(f'S{field.length}')[:, 0]
+
+    def get_column(self, name):
+        """Decoded column: numeric fields as float64 (NaN for blanks), logical fields as bool
+        and other fields as an object array of stripped strings"""
+        if name not in self._columns:
+            self._columns[name] = self._decode(self.get_field(name), self.get_raw_column(name))
+        return self._columns[name]
+
+    def _decode(self, field, raw):
+        if field.field_type in ('N', 'F'):
+            stripped = np.char.strip(raw)
+            values = np.full(len(raw), np.nan)
+            filled = (stripped != b'') & (np.char.find(stripped, b'*') < 0)
+            values[filled] = stripped[filled].astype(np.float64)
+            return values
+        if field.field_type == 'L':
+            return np.isin(raw, [b'T', b't', b'Y', b'y'])
+        return np.array([value.decode(self.encoding, errors='replace').strip() for value in raw.tolist()],
+                        dtype=object)
+
+    def close(self):
+        self.records = None
+        self._columns = {}
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                _logger.warning(f"Columns of {self.path} are still referenced, leaving the file mapped")
+            self._mmap = None
+
+
+class ShapefileReader:
+    """Reads a shapefile through memory maps of its files.
+    Geometries use XY coordinates only; Z and M values are ignored.
+    - coordinates: (point count, 2) float64 array of every vertex of every geometry
+    - part_offsets: index in coordinates of the first vertex of each part, plus the total point count
+    - geometry_offsets: index in part_offsets of the first part of each geometry, plus the total part count
+    - bounds: (record count, 4) xmin, ymin, xmax, ymax of each geometry (NaN for null shapes)
+    For point layers the coordinates are a strided view of the .shp file when every record has the same length."""
+
+    def __init__(self, path, encoding=None):
+        stem = os.path.splitext(path)[0]
+        self.path = path
+        self._mmap = _map_file(f"{stem}.shp")
+        file_code, = struct.unpack_from('>i', self._mmap, 0)
+        if file_code != FILE_CODE:
+            raise ValueError(f"{path} is not a shapefile")
+        self.shape_type, = struct.unpack_from('<i', self._mmap, 32)
+        self.extent = struct.unpack_from('<4d', self._mmap, 36)
+        self.record_offsets, self.content_lengths = self._read_index(f"{stem}.shx")
+        self.dbf = DbfReader(f"{stem}.dbf", encoding=encoding) if os.path.exists(f"{stem}.dbf") else None
+        self._geometry = None
+
+    def _read_index(self, shx_path):
+        """Byte offsets of the record contents (after the record headers) and their lengths,
+        from the .shx if there is one, otherwise by walking the records of the .shp"""
+        if os.path.exists(shx_path):
+            with open(shx_path, 'rb') as file:
+                index = np.frombuffer(file.read(), dtype='>i4', offset=HEADER_LENGTH).reshape(-1, 2)
+            return index[:, 0].astype(np.int64) * 2 + RECORD_HEADER_LENGTH, index[:, 1].astype(np.int64) * 2
+        _logger.info(f"{shx_path} not found, scanning the records of {self.path}")
+        offsets = []
+        lengths = []
+        position = HEADER_LENGTH
+        while position + RECORD_HEADER_LENGTH <= len(self._mmap):
+            _, length = struct.unpack_from('>ii', self._mmap, position)
+            offsets.append(position + RECORD_HEADER_LENGTH)
+            lengths.append(length * 2)
+            position += RECORD_HEADER_LENGTH + length * 2
+        return np.array(offsets, dtype=np.int64), np.array(lengths, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.record_offsets)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def _gather(self, offsets, dtype, count):
+        """count values of dtype at the given byte offsets of every record"""
+        item_size = np.dtype(dtype).itemsize * count
+        data = np.frombuffer(self._mmap, dtype=np.uint8)
+        indexes = offsets[:, np.newaxis] + np.arange(item_size)
+        return data[indexes].view(dtype).reshape(len(offsets), count)
+
+    @property
+    def shape_types(self):
+        if len(self) == 0:
+            return np.zeros(0, dtype=np.int32)
+        return self._gather(self.record_offsets, '<i4', 1)[:, 0]
+
+    def _read_points(self, shape_types):
+        record_count = len(self)
+        if record_count and (np.all(self.content_lengths == self.content_lengths[0])
+                             and np.all(np.diff(self.record_offsets) == self.content_lengths[0] + RECORD_HEADER_LENGTH)
+                             and np.all(shape_types != NULL_SHAPE)):
+            # Every record has the same length: a view with the record length as stride
+            coordinates = np.ndarray((record_count, 2), dtype='<f8', buffer=self._mmap,
+                                     offset=int(self.record_offsets[0]) + 4,
+                                     strides=(int(self.content_lengths[0]) + RECORD_HEADER_LENGTH, 8))
+        else:
+            coordinates = np.full((record_count, 2), np.nan)
+            valid = shape_types != NULL_SHAPE
+            coordinates[valid] = self._gather(self.record_offsets[valid] + 4, '<f8', 2)
+        part_offsets = np.arange(record_count + 1, dtype=np.int64)
+        return coordinates, part_offsets, part_offsets.copy(), np.hstack((coordinates, coordinates))
+
+    def _read_records(self, shape_types):
+        record_count = len(self)
+        bounds = np.full((record_count, 4), np.nan)
+        coordinates = []
+        part_counts = np.zeros(record_count, dtype=np.int64)
+        part_offsets = []
+        point_count = 0
+        for idx, (offset, shape_type) in enumerate(zip(self.record_offsets.tolist(), shape_types.tolist())):
+            if shape_type == NULL_SHAPE:
+                continue
+            bounds[idx] = np.frombuffer(self._mmap, dtype='<f8', count=4, offset=offset + 4)
+            if shape_type in MULTIPOINT_TYPES:
+                num_points, = struct.unpack_from('<i', self._mmap, offset + 36)
+                num_parts = num_points
+                parts = np.arange(num_points, dtype=np.int64)
+                points_offset = offset + 40
+            else:
+                num_parts, num_points = struct.unpack_from('<ii', self._mmap, offset + 36)
+                parts = np.frombuffer(self._mmap, dtype='<i4', count=num_parts, offset=offset + 44)
+                points_offset = offset + 44 + 4 * num_parts
+                if shape_type == MULTIPATCH:
+                    points_offset += 4 * num_parts
+            part_counts[idx] = num_parts
+            part_offsets.append(parts + point_count)
+            coordinates.append(np.frombuffer(self._mmap, dtype='<f8', count=2 * num_points,
+                                             offset=points_offset).reshape(-1, 2))
+            point_count += num_points
+        geometry_offsets = np.zeros(record_count + 1, dtype=np.int64)
+        np.cumsum(part_counts, out=geometry_offsets[1:])
+        part_offsets.append(np.array([point_count], dtype=np.int64))
+        coordinates = np.concatenate(coordinates) if coordinates else np.zeros((0, 2))
+        return coordinates, np.concatenate(part_offsets).astype(np.int64), geometry_offsets, bounds
+
+    def _read_geometry(self):
+        if self._geometry is None:
+            shape_types = self.shape_types
+            if self.shape_type in POINT_TYPES:
+                self._geometry = self._read_points(shape_types)
+            else:
+                self._geometry = self._read_records(shape_types)
+        return self._geometry
+
+    @property
+    def coordinates(self):
+        return self._read_geometry()[0]
+
+    @property
+    def part_offsets(self):
+        return self._read_geometry()[1]
+
+    @property
+    def geometry_offsets(self):
+        return self._read_geometry()[2]
+
+    @property
+    def bounds(self):
+        return self._read_geometry()[3]
+
+    def get_geometry(self, idx):
+        """Parts of a geometry as views of coordinates"""
+        coordinates, part_offsets, geometry_offsets, _ = self._read_geometry()
+        return [coordinates[part_offsets[part]:part_offsets[part + 1]]
+                for part in range(geometry_offsets[idx], geometry_offsets[idx + 1])]
+
+    def get_column(self, name):
+        if self.dbf is None:
+            raise KeyError(f"{self.path} has no attribute table")
+        return self.dbf.get_column(name)
+
+    def close(self):
+        # Views of the mapped files have to be released before the maps are closed
+        self._geometry = None
+        self.record_offsets = None
+        if self.dbf is not None:
+            self.dbf.close()
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                _logger.warning(f"Arrays of {self.path} are still referenced, leaving the file mapped")
+            self._mmap = None
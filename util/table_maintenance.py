@@ -0,0 +1,210 @@
+import fcntl
+import json
+import logging
+import os
+import time
+from mysqlutils.mysqladapter import MySQLAdapter
+from postgis_docker_wrapper.postgisadapter import PostgisAdapter
+from util import instance
+from util.index_manager import MYSQL_SCHEMA, POSTGIS_GEOMETRY_COLUMN, get_dataset_tables
+
+"""
+Post-load maintenance of the dataset tables, run by init() once the datasets are imported so that the
+first benchmark runs do not depend on when autovacuum or InnoDB get to gather statistics.
+Each step is timed. Steps that do not apply to a database are skipped:
+- vacuum: VACUUM (PostGIS)
+- optimize: OPTIMIZE TABLE, which rebuilds the table (MySQL)
+- cluster: CLUSTER on the GIST index, which orders the table by the index (PostGIS)
+- analyze: ANALYZE (PostGIS) / ANALYZE TABLE (MySQL)
+- histograms: ANALYZE TABLE ... UPDATE HISTOGRAM on the columns without an index (MySQL)
+"""
+
+_logger = logging.getLogger(__name__)
+
+# In execution order: the statistics are gathered after the tables are rewritten
+MAINTENANCE_STEPS = ["vacuum", "optimize", "cluster", "analyze", "histograms"]
+# Steps run by init() unless SDB_MAINTENANCE (a comma separated list of steps, or none) says otherwise
+DEFAULT_MAINTENANCE = "analyze"
+HISTOGRAM_BUCKETS = 100
+MYSQL_SPATIAL_TYPES = ["geometry", "point", "linestring", "polygon", "multipoint", "multilinestring",
+                       "multipolygon", "geomcollection", "geometrycollection"]
+
+
+def parse_steps(value):
+    """Comma separated steps; none or an empty string disables the maintenance"""
+    if value is None or value.strip().lower() in ("", "none"):
+        return []
+    steps = [step.strip().lower() for step in value.split(',')]
+    unknown = set(steps) - set(MAINTENANCE_STEPS)
+    if unknown:
+        raise ValueError(f"Unknown maintenance steps {', '.join(sorted(unknown))}")
+    return steps
+
+
+def get_default_steps():
+    return parse_steps(os.environ.get("SDB_MAINTENANCE", DEFAULT_MAINTENANCE))
+
+
+class PostgisMaintenance:
+    """Maintenance and planner statistics of PostGIS tables"""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.adapter = PostgisAdapter(
+            user="postgres", password="root-password", persist=True)
+
+    def close(self):
+        self.adapter.close()
+
+    def get_cluster_index(self, table):
+        rows = self.adapter.execute(
+            "SELECT indexname FROM pg_indexes WHERE schemaname = 'public' AND tablename = %s "
+            "AND indexdef LIKE %s",
+            (table, f"%USING gist ({POSTGIS_GEOMETRY_COLUMN})%"))
+        return rows[0][0] if rows else None
+
+    def run_step(self, step, table):
+        """Returns False if the step does not apply to the table"""
+        if step == "vacuum":
+            self.adapter.execute_nontransaction(f"VACUUM {table}")
+        elif step == "cluster":
+            index = self.get_cluster_index(table)
+            if index is None:
+                # SP-GiST and BRIN indexes cannot be clustered on
+                return False
+            self.adapter.execute(f"CLUSTER {table} USING {index}")
+        elif step == "analyze":
+            self.adapter.execute(f"ANALYZE {table}")
+        else:
+            return False
+        return True
+
+    def reset_statistics(self):
+        """Removes the statistics of the tables and keeps autovacuum from gathering them again,
+        so the planner sees the tables as if they had just been loaded"""
+        for table in self.tables:
+            self.adapter.execute(f"ALTER TABLE {table} SET (autovacuum_enabled = false)")
+            self.adapter.execute(f"DELETE FROM pg_statistic WHERE starelid = '{table}'::regclass")
+            self.adapter.execute(
+                f"UPDATE pg_class SET reltuples = 0, relpages = 0 WHERE oid = '{table}'::regclass")
+
+    def restore(self):
+        """Lets autovacuum gather the statistics again"""
+        for table in self.tables:
+            self.adapter.execute(f"ALTER TABLE {table} RESET (autovacuum_enabled)")
+
+
+class MysqlMaintenance:
+    """Maintenance and optimizer statistics of MySQL tables"""
+
+    def __init__(self, tables):
+        self.tables = tables
+        self.adapter = MySQLAdapter("root", "root-password")
+
+    def close(self):
+        self.adapter.close()
+
+    def get_histogram_columns(self, table):
+        """Columns a histogram can be built on: no geometries and no indexed columns,
+        whose statistics come from the index"""
+        return [row[0] for row in self.adapter.execute(
+            "SELECT COLUMN_NAME FROM information_schema.COLUMNS "
+            "WHERE TABLE_SCHEMA = %s AND TABLE_NAME = %s AND COLUMN_KEY = '' "
+            f"AND DATA_TYPE NOT IN ({', '.join(['%s'] * len(MYSQL_SPATIAL_TYPES))})",
+            (MYSQL_SCHEMA, table, *MYSQL_SPATIAL_TYPES))]
+
+    def get_histograms(self, table):
+        return [row[0] for row in self.adapter.execute(
+            "SELECT COLUMN_NAME FROM information_schema.COLUMN_STATISTICS "
+            "WHERE SCHEMA_NAME = %s AND TABLE_NAME = %s", (MYSQL_SCHEMA, table))]
+
+    def run_step(self, step, table):
+        """Returns False if the step does not apply to the table"""
+        if step == "optimize":
+            self.adapter.execute(f"OPTIMIZE TABLE {MYSQL_SCHEMA}.{table}")
+        elif step == "analyze":
+            self.adapter.execute(f"ANALYZE TABLE {MYSQL_SCHEMA}.{table}")
+        elif step == "histograms":
+            columns = self.get_histogram_columns(table)
+            if not columns:
+                return False
+            self.adapter.execute(
+                f"ANALYZE TABLE {MYSQL_SCHEMA}.{table} UPDATE HISTOGRAM ON "
+                f"{', '.join(f'`{column}`' for column in columns)} WITH {HISTOGRAM_BUCKETS} BUCKETS")
+        else:
+            return False
+        return True
+
+    def reset_statistics(self):
+        """Drops the histograms and the persistent InnoDB statistics of the tables.
+        InnoDB always has some estimate: without persistent statistics it samples the table when it is opened."""
+        for table in self.tables:
+            histograms = self.get_histograms(table)
+            if histograms:
+                self.adapter.execute(
+                    f"ANALYZE TABLE {MYSQL_SCHEMA}.{table} DROP HISTOGRAM ON "
+                    f"{', '.join(f'`{column}`' for column in histograms)}")
+            for stats_table in ("innodb_table_stats", "innodb_index_stats"):
+                self.adapter.execute(
+                    f"DELETE FROM mysql.{stats_table} WHERE database_name = %s AND table_name = %s",
+                    (MYSQL_SCHEMA, table))
+            self.adapter.commit()
+            self.adapter.execute(f"FLUSH TABLES {MYSQL_SCHEMA}.{table}")
+
+    def restore(self):
+        """InnoDB recalculates its statistics on its own, there is nothing to restore"""
+        pass
+
+
+def create_table_maintenance(db, tables):
+    """db is 'mysql' or 'pg'"""
+    if db == 'mysql':
+        return MysqlMaintenance(tables)
+    return PostgisMaintenance(tables)
+
+
+def run_maintenance(maintenance, steps):
+    """Runs the steps on every table of a PostgisMaintenance or MysqlMaintenance.
+    Returns {step: {table: seconds}} of the steps that applied."""
+    step_times = {}
+    for step in [step for step in MAINTENANCE_STEPS if step in steps]:
+        for table in maintenance.tables:
+            start = time.perf_counter()
+            if maintenance.run_step(step, table):
+                step_times.setdefault(step, {})[table] = time.perf_counter() - start
+                _logger.info(f"{step} of {table} took {step_times[step][table]} seconds")
+    return step_times
+
+
+def save_maintenance_timings(output_file, steps, timings):
+    """Merges the timings of this instance's databases into output_file under a lock, keyed by
+    instance (SDB_INSTANCE) and database, so concurrent and per-database inits keep each other's entries"""
+    os.makedirs(os.path.dirname(output_file), exist_ok=True)
+    with open(f"{output_file}.lock", 'w') as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        data = {}
+        if os.path.exists(output_file):
+            with open(output_file, 'r') as file:
+                data = json.loads(file.read())
+        instance_data = data.setdefault(f"instance_{instance.INSTANCE_ID}", {})
+        for backend, backend_timings in timings.items():
+            instance_data[backend] = {"timestamp": time.time(), "steps": steps, **backend_timings}
+        with open(output_file, 'w') as file:
+            file.write(json.dumps(data, indent=4))
+
+
+def run_post_load_maintenance(steps, import_gcs=False, db='both', output_file="results/maintenance.json"):
+    """The maintenance stage of init(): runs the steps on the dataset tables of each database
+    and merges their times into output_file, see save_maintenance_timings"""
+    timings = {}
+    for backend in (['mysql', 'pg'] if db == 'both' else [db]):
+        maintenance = create_table_maintenance(backend, get_dataset_tables(import_gcs=import_gcs))
+        try:
+            start = time.perf_counter()
+            timings[backend] = {"step_times": run_maintenance(maintenance, steps),
+                                "total": time.perf_counter() - start}
+        finally:
+            maintenance.close()
+        _logger.info(f"Post-load maintenance of {backend} took {timings[backend]['total']} seconds")
+    save_maintenance_timings(output_file, steps, timings)
+    return timings
@@ -0,0 +1,124 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+"""
+Workload runners that keep many queries in flight: a thread pool of blocking adapters and an
+asyncio runner that multiplexes the queries over the connection pool of an async adapter.
+A workload is a list of (query, params) tuples.
+"""
+
+
+def percentile(values, fraction):
+    """Nearest rank percentile of a sorted list"""
+    if not values:
+        return None
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+
+def summarize_workload(latencies, wall_time, cpu_time, errors=0):
+    latencies = sorted(latencies)
+    return {
+        "queries": len(latencies),
+        "errors": errors,
+        "wall_time": wall_time,
+        # Client side CPU time spent to drive the workload
+        "cpu_time": cpu_time,
+        "throughput": len(latencies) / wall_time if wall_time > 0 else None,
+        "latency": {
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+            "p50": percentile(latencies, 0.5),
+            "p95": percentile(latencies, 0.95),
+            "p99": percentile(latencies, 0.99),
+        },
+    }
+
+
+def run_thread_pool_workload(create_adapter, workload, threads):
+    """Runs the workload on a pool of threads, each with its own blocking adapter (and connection).
+    At most one query per thread is in flight. The latency of a query starts when it is submitted,
+    so it includes the wait for a free thread, as in run_asyncio_workload.
+    The adapters are closed once the pool has shut down."""
+    local = threading.local()
+    adapters = []
+    adapters_lock = threading.Lock()
+
+    def get_adapter():
+        if getattr(local, "adapter", None) is None:
+            local.adapter = create_adapter()
+            with adapters_lock:
+                adapters.append(local.adapter)
+        return local.adapter
+
+    def run_query(query, params, submitted):
+        get_adapter().execute(query, params)
+        return time.perf_counter() - submitted
+
+    latencies = []
+    errors = 0
+    try:
+        # Connect every thread before the clock starts
+        with ThreadPoolExecutor(max_workers=threads) as executor:
+            barrier = threading.Barrier(threads)
+
+            def connect():
+                get_adapter()
+                barrier.wait()
+            for future in [executor.submit(connect) for _ in range(threads)]:
+                future.result()
+
+            cpu_start = time.process_time()
+            start = time.perf_counter()
+            futures = [executor.submit(run_query, query, params, time.perf_counter())
+                       for query, params in workload]
+            for future in futures:
+                try:
+                    latencies.append(future.result())
+                except Exception:
+                    errors += 1
+            wall_time = time.perf_counter() - start
+            cpu_time = time.process_time() - cpu_start
+    finally:
+        for adapter in adapters:
+            adapter.close()
+    return summarize_workload(latencies, wall_time, cpu_time, errors)
+
+
+async def _run_asyncio_workload(adapter, workload, in_flight):
+    semaphore = asyncio.Semaphore(in_flight)
+    latencies = []
+    errors = 0
+
+    async def run_query(query, params):
+        nonlocal errors
+        # The wait for the semaphore is part of the latency, as in run_thread_pool_workload
+        start = time.perf_counter()
+        async with semaphore:
+            try:
+                await adapter.execute(query, params)
+            except Exception:
+                errors += 1
+                return
+            latencies.append(time.perf_counter() - start)
+
+    cpu_start = time.process_time()
+    start = time.perf_counter()
+    await asyncio.gather(*[run_query(query, params) for query, params in workload])
+    wall_time = time.perf_counter() - start
+    cpu_time = time.process_time() - cpu_start
+    return summarize_workload(latencies, wall_time, cpu_time, errors)
+
+
+def run_asyncio_workload(create_adapter, workload, in_flight):
+    """Runs the workload on one event loop with up to in_flight queries awaiting at the same time.
+    create_adapter is a coroutine function returning an async adapter, whose connection pool
+    size bounds the queries running on the server; the others wait for a free connection.
+    The latency of a query includes that wait and the wait for the in_flight limit."""
+    async def run():
+        adapter = await create_adapter()
+        try:
+            return await _run_asyncio_workload(adapter, workload, in_flight)
+        finally:
+            await adapter.close()
+    return asyncio.run(run())